@@ -21,6 +21,14 @@ import sys
 import re
 import subprocess
 import time
+import threading
+import multiprocessing
+import hashlib
+import json
+import pipes
+import fcntl
+import glob
+import traceback
 from time import  strftime
 from configobj import ConfigObj
 import argparse
@@ -31,12 +39,15 @@ COPYRIGHT = "Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China
 
 SGESetting = subprocess.check_output('if [ -f "$SGE_ROOT/default/common/settings.sh" ]; then echo -n "$SGE_ROOT/default/common/settings.sh"; else echo -n ""; fi', shell=True)
 
+# the same order as orderedEnzymes in scripts/util.sh
+enzymeOrder = ['BSPQI', 'BSSSI', 'BBVCI', 'BSMI', 'BSRDI', 'BSECI', 'HAMHI', 'DLE1']
+
 singleThreadModule = {
 	'main'			: 1,
 	'inputor'		: 1,
 	'cmapconvertor'	: 1, 
 	'cmapaligner'	: 0,
-	'cmapresolver'	: 1,
+	'cmapresolver'	: 0,
 	'scaffolder'	: 0,
 	'sandwichscaff'	: 1,
 	'bngaligner'	: 0,
@@ -117,6 +128,10 @@ def processArgs():
 	parser.add_argument('--cluster', dest='sge', action='store_true', help='--run in a SGE cluster', required=False)
 	parser.add_argument('-t', dest='num_threads', type=int, default=8, help='--number of threads (default: 8)', required=False)
 	parser.add_argument('--conf', dest='conf', default=None, help='--designated configuration file', required=False)
+	parser.add_argument('--profile', dest='profile', action='store_true', help='--record the resource usage of every step and tool', required=False)
+	parser.add_argument('--store', dest='store', default=None, help='--shared folder of finished steps, a step identical to a stored one is linked from it instead of being run', required=False)
+	parser.add_argument('--store-size', dest='store_size', type=float, default=0, help='--size (in GB) of the store, beyond which the least recently used steps are evicted (default: 0, unlimited)', required=False)
+	parser.add_argument('--incremental', dest='incremental', action='store_true', help='--add enzyme channel(s) to an existing output folder, reusing the results of the existing channels', required=False)
 	parser.add_argument('--version', action='version', version='%(prog)s {version}'.format(version=__version__))
 	args = parser.parse_args()
 	inputs = [args.fasta] + args.cmaps;
@@ -154,6 +169,12 @@ def showWelcomeInfo(args):
 		dicts['Run in a SGE cluster (--cluster)'] = 'yes'
 	if args.conf != None:
 		dicts['Configuration (--conf)'] = args.conf
+	if args.profile:
+		dicts['Profile resource usage (--profile)'] = 'yes'
+	if args.store != None:
+		dicts['Store of finished steps (--store)'] = args.store
+		if args.store_size > 0:
+			dicts['Size of the store in GB (--store-size)'] = args.store_size
 
 	intLength = 0
 	for k in dicts.keys():
@@ -169,19 +190,19 @@ def showWelcomeInfo(args):
 		print "%s: %s"%(k.rjust(intLength), v)
 	sys.stdout.flush();
 
-def writeQueueScript(queueName, dictVars, submit=True):
+def writeQueueScript(queueName, dictVars, submit=True, template=None):
 	'''
-	Generate scripts for publishing SGE jobs
+	Generate scripts for publishing SGE jobs, from the template of the queue or the given one
 	'''
 
 	cfg = Queue(queueName)
 	workPath = os.path.abspath(dictVars['WORKDIR']) if dictVars.has_key('WORKDIR') else args.output
 	tempPath = "%s/scripts/queue"%os.path.dirname(os.path.abspath(sys.argv[0]))
-	tempName = "%s.sh"%queueName
+	tempName = "%s.sh"%(template if template != None else queueName)
 	inFile = "%s/%s"%(tempPath, tempName)
 	if not os.path.exists(inFile):
 		inFile = "%s/default.sh"%tempPath
-	outFile = "%s/%s.sh"%(workPath, cfg.sname)
+	outFile = "%s/%s.sh"%(workPath, cfg.sname if template == None else "%s.%s"%(cfg.sname, template))
 
 	pubVars = {
 		'WORKDIR'	: workPath,
@@ -189,8 +210,8 @@ def writeQueueScript(queueName, dictVars, submit=True):
 		'QUEUE'		: cfg.queue,
 		'JOBNAME'	: cfg.jname,
 		'PENAME'	: cfg.pe,
-		'SLOTS'		: 1 if singleThreadModule.has_key(queueName) and singleThreadModule[queueName]==1 else cfg.slots,
-		'MEM'		: cfg.mem,
+		'SLOTS'		: dictVars['SLOTS'] if dictVars.has_key('SLOTS') else 1 if singleThreadModule.has_key(queueName) and singleThreadModule[queueName]==1 else cfg.slots,
+		'MEM'		: dictVars['MEM'] if dictVars.has_key('MEM') else cfg.mem,
 		'PRIORITY'	: cfg.priority
 	}
 
@@ -213,7 +234,8 @@ def writeQueueScript(queueName, dictVars, submit=True):
 		f.write(temp)
 
 	if submit:
-		os.system("source %s; qsub -e /dev/null %s"%(Config.sgesetting, outFile));
+		return Queue.submit(outFile)
+	return None
 
 #### Classes
 class Util:
@@ -221,9 +243,9 @@ class Util:
 	The class for Utilities
 	'''
 	@staticmethod
-	def run(cmd):
+	def run(cmd, step=None, level='command'):
 		Message.run_info(cmd);
-		retcode = os.system(cmd);
+		retcode = Profiler.run(cmd, step, level);
 		if retcode != 0:
 			Message.error("Error occurs!");
 			sys.exit()
@@ -261,6 +283,7 @@ class Config:
 	spath = PATH + "/" + paths['scripts.dir'];
 	apath = PATH + "/" + paths['aligner.dir'];
 	xmldir = paths['xml.dir'] if 'xml.dir' in paths else "";
+	cachedir = os.path.abspath(paths['cache.dir']) if 'cache.dir' in paths and paths['cache.dir'] != "" else "";
 
 	infasta = os.path.abspath(args.fasta)
 	incmaps = args.cmaps
@@ -268,7 +291,16 @@ class Config:
 		incmaps[i] = os.path.abspath(incmaps[i])
 
 	nthreads = args.num_threads
+	maxjobs = int(parameters['parallel.maxEnzymes']) if parameters.has_key('parallel.maxEnzymes') else 1
+	alignShards = int(parameters['parallel.alignShards']) if parameters.has_key('parallel.alignShards') else 1
+	arrayJobs = int(parameters['parallel.arrayJobs']) if parameters.has_key('parallel.arrayJobs') else 1
+	bestimate = int(parameters['queue.estimate']) if parameters.has_key('queue.estimate') else 1
+	margin = float(parameters['queue.margin']) if parameters.has_key('queue.margin') else 1.5
+	maxmem = parameters['queue.maxmem'] if parameters.has_key('queue.maxmem') else '0'
+	bcompress = int(parameters['output.compress']) if parameters.has_key('output.compress') else 0
+	compressor = "pigz -1 -f" if subprocess.call("which pigz >/dev/null 2>&1", shell=True) == 0 else "gzip -1 -f"
 	bforce = int(args.force.lower() == 'yes')
+	bincremental = args.incremental
 	bqueue = args.sge
 	outpath = os.path.abspath(args.output)
 	fasta_prefix = re.sub("\..*$", "", os.path.basename(infasta))
@@ -282,10 +314,90 @@ class Config:
 	paths = config['paths']
 	sgesetting = subprocess.check_output('if [ -f "%s" ]; then echo -n "%s"; else echo -n ""; fi'%(paths['sge.setting'], paths['sge.setting']), shell=True)
 
+class Profiler:
+	'''
+	The class for recording the wall time, CPU time, peak memory and I/O of the commands
+	'''
+	sys.path.insert(0, Config.spath)
+	tool = __import__('profiler')
+	script = "%s/profiler.py"%(Config.spath)
+	path = "%s/profile.jsonl"%(Config.outpath) if args.profile else ""
+	report = "%s/profile.json"%(Config.outpath)
+
+	@staticmethod
+	def run(cmd, step, level):
+		if Profiler.path == "":
+			return os.system(cmd)
+		status, record = Profiler.tool.measure(cmd, step if step != None else 'main', level)
+		Profiler.tool.append(Profiler.path, record)
+		return status
+
+	@staticmethod
+	def reset():
+		if Profiler.path != "" and os.path.isfile(Profiler.path):
+			os.remove(Profiler.path)
+
+	@staticmethod
+	def size(nbytes):
+		for unit in ['', 'k', 'm', 'g']:
+			if nbytes < 1024:
+				break
+			nbytes /= 1024.0
+		return "%.1f%s"%(nbytes, unit) if unit != '' else "%d"%(nbytes)
+
+	@staticmethod
+	def summarize(steps):
+		'''
+		Aggregate the records of the run into profile.json and print a summary table
+		'''
+		if Profiler.path == "":
+			return
+		records = []
+		if os.path.isfile(Profiler.path):
+			with open(Profiler.path, 'r') as f:
+				records = [json.loads(line) for line in f if line.strip() != ""]
+		summary = []
+		for prog in steps:
+			name = os.path.basename(prog.outdir)
+			owned = [r for r in records if r['step'] == name]
+			main = [r for r in owned if r['level'] == 'step']
+			tools = [r for r in owned if r['level'] == 'tool']
+			if not main:
+				summary.append({'step': name, 'cached': True})
+				continue
+			summary.append({
+				'step'		: name,
+				'cached'	: False,
+				'wall'		: sum([r['wall'] for r in main]),
+				'user'		: sum([r['user'] for r in main]),
+				'sys'		: sum([r['sys'] for r in main]),
+				'maxrss'	: max([r['maxrss'] for r in main + tools]),
+				'read'		: sum([r['read'] for r in main]),
+				'written'	: sum([r['written'] for r in main]),
+				'tools'		: len(tools),
+				'slots'		: prog.nthreads
+			})
+		with open(Profiler.report, 'w') as f:
+			json.dump({'steps': summary, 'records': records}, f, indent=1, sort_keys=True)
+
+		Message.subtitle("Resource usage (details in %s)"%(Profiler.report))
+		width = max([len(item['step']) for item in summary] + [4])
+		print "%s %9s %9s %9s %9s %9s %9s %6s"%("Step".ljust(width), "Wall(s)", "User(s)", "Sys(s)", "PeakRSS", "Read", "Written", "Tools")
+		for item in summary:
+			if item['cached']:
+				print "%s %9s"%(item['step'].ljust(width), "cached")
+				continue
+			print "%s %9.1f %9.1f %9.1f %9s %9s %9s %6d"%(item['step'].ljust(width), item['wall'], item['user'], item['sys'],
+					Profiler.size(item['maxrss'] * 1024), Profiler.size(item['read']), Profiler.size(item['written']), item['tools'])
+		sys.stdout.flush()
+
 class Queue:
 	'''
 	The class for queue configuration
 	'''
+	maxDelay = 30
+	# the consecutive failures of qstat after which a job is taken as gone
+	maxMisses = 10
 	def __init__(self, typeName):
 		config_file = "%s/queue.conf"%Util.abs_dirname(sys.argv[0])
 		config = ConfigObj(config_file)
@@ -296,7 +408,372 @@ class Queue:
 		self.pe			= cfg['pe'] if cfg.has_key('pe') else ''
 		self.slots		= Config.nthreads if Config.nthreads>0 else cfg['slots']
 		self.mem		= cfg['mem'] if cfg.has_key('mem') else '1g'
+		self.taskSlots	= cfg['task_slots'] if cfg.has_key('task_slots') else self.slots
+		self.taskMem	= cfg['task_mem'] if cfg.has_key('task_mem') else self.mem
 		self.priority	= cfg['priority'] if cfg.has_key('priority') and cfg.has_key('priority')>-1024 and cfg.has_key('priority')<=1024 else 0
+		# the model sizing the jobs by their inputs, see Estimator
+		self.memBase	= cfg['mem_base'] if cfg.has_key('mem_base') else '1g'
+		self.memPerMLabel	= cfg['mem_per_mlabel'] if cfg.has_key('mem_per_mlabel') else None
+		self.memPerGBase	= cfg['mem_per_gbase'] if cfg.has_key('mem_per_gbase') else None
+		self.labelsPerSlot	= int(cfg['labels_per_slot']) if cfg.has_key('labels_per_slot') else 0
+		self.maxMem		= cfg['max_mem'] if cfg.has_key('max_mem') else Config.maxmem
+
+	@staticmethod
+	def bytes(size):
+		'''
+		Convert a memory size such as 10g into bytes
+		'''
+		match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)", str(size), re.I)
+		if match == None:
+			return 0
+		return int(float(match.group(1)) * 1024 ** ' kmgt'.index(match.group(2).lower() or ' '))
+
+	@staticmethod
+	def size(nbytes):
+		'''
+		Convert bytes into a memory size in whole gigabytes, or megabytes below one gigabyte
+		'''
+		if nbytes < 1024 ** 3:
+			return "%dm"%(max(1, -(-nbytes // 1024 ** 2)))
+		return "%dg"%(-(-nbytes // 1024 ** 3))
+
+	def memory(self):
+		'''
+		The memory requested by this type of job in bytes
+		'''
+		return Queue.bytes(self.mem)
+
+	def options(self, slots=None, mem=None):
+		'''
+		The qsub options requesting the resources of this type of job, or the given slots and memory
+		'''
+		slots = self.slots if slots == None else slots
+		mem = self.mem if mem == None else mem
+		opts = "-l vf=%s"%(mem)
+		if self.pe != '':
+			opts = "-pe %s %s %s"%(self.pe, slots, opts)
+		if self.queue != '':
+			opts = "-q %s %s"%(self.queue, opts)
+		return opts
+
+	@staticmethod
+	def command(cmd):
+		return ". %s; %s"%(Config.sgesetting, cmd) if Config.sgesetting != '' else cmd
+
+	@staticmethod
+	def submit(script):
+		'''
+		Submit a job script and return its job ID, or None if qsub refused it
+		'''
+		try:
+			output = subprocess.check_output(Queue.command("qsub -terse -e /dev/null %s"%(script)), shell=True)
+		except subprocess.CalledProcessError:
+			return None
+		match = re.match(r"\s*(\d+)", output)
+		return match.group(1) if match else None
+
+	@staticmethod
+	def isAlive(jobid):
+		'''
+		Whether a job is still known to the scheduler and not stuck in the error state,
+		or None if qstat failed for another reason (e.g. the qmaster is not reachable)
+		'''
+		proc = subprocess.Popen(Queue.command("qstat -j %s"%(jobid)), shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+		output = proc.communicate()[0]
+		if proc.returncode != 0:
+			if re.search(r"jobs? do(es)? not exist", output, re.I):
+				return False
+			return None
+		return re.search(r"^error reason", output, re.M) == None
+
+class Cache:
+	'''
+	The class for content-addressed step results
+	'''
+	manifest = "manifest.json"
+	ignored = re.compile(r"^(status(\.\d+)?\.txt|manifest\.json|start\w+(\.array)?\.sh|.*\.log|.*\.idx|.*\.stats)$")
+	digests = {}
+	lock = threading.Lock()
+	toolsDigest = None
+
+	@staticmethod
+	def digest(path, known=None):
+		'''
+		Return the md5 checksum, size and modification time of a file, reusing a known record if the file is untouched
+		'''
+		path = os.path.realpath(path)
+		st = os.stat(path)
+		stamp = (path, st.st_size, int(st.st_mtime))
+		with Cache.lock:
+			if Cache.digests.has_key(stamp):
+				return Cache.digests[stamp]
+		if known != None and known['size'] == st.st_size and known['mtime'] == int(st.st_mtime):
+			md5 = known['md5']
+		else:
+			h = hashlib.md5()
+			with open(path, 'rb') as f:
+				for chunk in iter(lambda: f.read(1 << 20), b''):
+					h.update(chunk)
+			md5 = h.hexdigest()
+		record = {'md5': md5, 'size': st.st_size, 'mtime': int(st.st_mtime)}
+		with Cache.lock:
+			Cache.digests[stamp] = record
+		return record
+
+	@staticmethod
+	def tools():
+		'''
+		The checksum of what the step scripts run besides themselves: the Perl tools, util.sh,
+		the default RefAligner parameter files and RefAligner itself
+		'''
+		with Cache.lock:
+			if Cache.toolsDigest != None:
+				return Cache.toolsDigest
+		files = ["%s/util.sh"%(Config.spath), "%s/RefAligner"%(Config.apath)]
+		for top in ["%s/perl"%(Config.spath), "%s/bionano/xml"%(Config.spath)]:
+			for root, dirs, fls in os.walk(top):
+				dirs.sort()
+				files += [os.path.join(root, fl) for fl in sorted(fls) if re.search(r"\.(pl|pm|xml)$", fl)]
+		signature = [(os.path.relpath(fl, Config.PATH), Cache.digest(fl)['md5']) for fl in files if os.path.isfile(fl)]
+		digest = hashlib.md5(json.dumps(signature)).hexdigest()
+		with Cache.lock:
+			Cache.toolsDigest = digest
+		return digest
+
+	@staticmethod
+	def stamp(path):
+		'''
+		Return the size and modification time of a file
+		'''
+		st = os.stat(path)
+		return {'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+	@staticmethod
+	def same(current, record):
+		'''
+		Whether a file is unchanged since it was recorded, by its checksum if known or else by its size and modification time
+		'''
+		if current == None:
+			return False
+		if record.has_key('md5'):
+			return current.get('md5') == record['md5']
+		return current['size'] == record['size'] and current['mtime'] == record['mtime']
+
+	@staticmethod
+	def collect(outdir):
+		'''
+		Return the size and modification time of all result files under a step directory; their contents are covered
+		by the key of the step, so they are not hashed
+		'''
+		outputs = {}
+		for root, dirs, files in os.walk(outdir):
+			for fl in files:
+				path = os.path.join(root, fl)
+				rel = os.path.relpath(path, outdir)
+				if Cache.ignored.match(rel) or not os.path.isfile(path):
+					continue
+				outputs[rel] = Cache.stamp(path)
+		return outputs
+
+	@staticmethod
+	def enzymes(rel):
+		'''
+		Return the enzyme channels named in the relative path of a file
+		'''
+		return set([token for token in re.split(r"[/_.\-]", rel) if token in enzymeOrder])
+
+	@staticmethod
+	def read(outdir):
+		path = "%s/%s"%(outdir, Cache.manifest)
+		if not os.path.isfile(path):
+			return None
+		try:
+			with open(path, 'r') as f:
+				return json.load(f)
+		except ValueError:
+			return None
+
+	@staticmethod
+	def write(outdir, manifest):
+		path = "%s/%s"%(outdir, Cache.manifest)
+		with open("%s.tmp"%path, 'w') as f:
+			json.dump(manifest, f, indent=1, sort_keys=True)
+		os.rename("%s.tmp"%path, path)
+
+	@staticmethod
+	def verify(outdir, manifest):
+		'''
+		Check that the recorded result files are still present and untouched
+		'''
+		for rel, record in manifest['outputs'].iteritems():
+			path = "%s/%s"%(outdir, rel)
+			if not os.path.isfile(path):
+				return False
+			st = os.stat(path)
+			if st.st_size != record['size'] or int(st.st_mtime) != record['mtime']:
+				return False
+		return True
+
+class Estimator:
+	'''
+	The class for sizing the SGE jobs of the steps by the statistics of their inputs
+	'''
+	stats = {}
+
+	@staticmethod
+	def inspect(path):
+		'''
+		Return the number of maps and labels of a CMAP file, or of contigs and bases of a FASTA file, from the summary
+		of map_stats.pl, which is computed in one pass and kept in a sidecar of the file if it is in the output folder;
+		the labels leave out the end of every map (LabelChannel 0)
+		'''
+		st = os.stat(path)
+		stamp = (path, st.st_size, st.st_mtime)
+		if not Estimator.stats.has_key(stamp):
+			stats = {'maps': 0, 'labels': 0, 'bases': 0}
+			if re.search(r"\.(cmap|fa|fasta|fna)(\.gz)?$", path):
+				try:
+					output = subprocess.check_output("MOMS_OUTPUT=%s perl %s/perl/map_stats.pl %s"%(pipes.quote(Config.outpath), Config.spath, pipes.quote(path)), shell=True)
+				except subprocess.CalledProcessError:
+					output = ""
+				for line in output.splitlines():
+					fields = line.split("\t")
+					if len(fields) == 2 and stats.has_key(fields[0]) and fields[1].isdigit():
+						stats[fields[0]] = int(fields[1])
+			Estimator.stats[stamp] = stats
+		return Estimator.stats[stamp]
+
+	@staticmethod
+	def collect(prog):
+		'''
+		Sum up the labels of the inputs of a step by enzyme channel, the labels of the files shared by the channels
+		and the bases of the FASTA inputs; the results are taken from the top of the dependency folders
+		'''
+		files = list(prog.inputs())
+		for dep in prog.depends:
+			files += ["%s/%s"%(dep.outdir, rel) for rel in sorted(dep.manifest['outputs'].keys()) if "/" not in rel]
+		channels = {}
+		shared = 0
+		bases = 0
+		for fl in set(files):
+			if not os.path.isfile(fl):
+				continue
+			stats = Estimator.inspect(fl)
+			enzymes = Cache.enzymes(os.path.basename(fl))
+			if len(enzymes) == 1:
+				enzyme = list(enzymes)[0]
+				channels[enzyme] = channels.get(enzyme, 0) + stats['labels']
+			else:
+				shared += stats['labels']
+			bases += stats['bases']
+		return channels, shared, bases
+
+	@staticmethod
+	def fit(prog, cfg, slots, mem, task=False):
+		'''
+		Size the slots and memory of a job to those predicted for the inputs of the step (the whole step,
+		or its largest enzyme channel for a task of an array job) with a safety margin; the slots are at most
+		those of the queue, while the memory may grow beyond its mem up to max_mem (no limit if 0)
+		'''
+		if cfg.memPerMLabel == None and cfg.memPerGBase == None and cfg.labelsPerSlot <= 0:
+			return slots, mem
+		channels, shared, bases = Estimator.collect(prog)
+		labels = shared + (max(channels.values()) if task and channels else sum(channels.values()))
+		if cfg.labelsPerSlot > 0:
+			slots = max(1, min(slots, -(-labels // cfg.labelsPerSlot)))
+		if cfg.memPerMLabel != None or cfg.memPerGBase != None:
+			predicted = Queue.bytes(cfg.memBase)
+			if cfg.memPerMLabel != None:
+				predicted += Queue.bytes(cfg.memPerMLabel) * labels / 1e6
+			if cfg.memPerGBase != None:
+				predicted += Queue.bytes(cfg.memPerGBase) * bases / 1e9
+			predicted *= Config.margin
+			if Queue.bytes(cfg.maxMem) > 0:
+				predicted = min(predicted, Queue.bytes(cfg.maxMem))
+			mem = Queue.size(int(predicted))
+		return slots, mem
+
+class Store:
+	'''
+	The class for finished steps shared between runs, such as the pipelines of a batch, under their cache keys
+	'''
+	path = os.path.abspath(args.store) if args.store else ""
+	size = int(args.store_size * 1024 ** 3)
+
+	@staticmethod
+	def lock(key):
+		'''
+		Hold the key while the step is fetched or computed, a run needing the same step waits for it
+		'''
+		Util.mkdir(Store.path)
+		fd = open("%s/%s.lock"%(Store.path, key), 'w')
+		fcntl.flock(fd, fcntl.LOCK_EX)
+		return fd
+
+	@staticmethod
+	def link(src, dest):
+		'''
+		Hard link the files of a folder into a new one, or copy them if the two are on different file systems
+		'''
+		Util.run("cp -alL %s %s 2>/dev/null || (rm -rf %s && cp -aL %s %s)"%(src, dest, dest, src, dest))
+
+	@staticmethod
+	def fetch(prog):
+		'''
+		Link a stored step into the output folder of the step, and return its manifest
+		'''
+		path = "%s/%s"%(Store.path, prog.key)
+		manifest = Cache.read(path)
+		if manifest == None or not Cache.verify(path, manifest):
+			return None
+		Util.rmdir(prog.outdir)
+		Util.mkdir(os.path.dirname(prog.outdir))
+		Store.link(path, prog.outdir)
+		# the entries are evicted in the order of their last use
+		os.utime(path, None)
+		return manifest
+
+	@staticmethod
+	def publish(prog):
+		'''
+		Link a finished step into the store, the links into other steps are replaced by the files they point to;
+		an entry whose files were changed through another link is replaced
+		'''
+		path = "%s/%s"%(Store.path, prog.key)
+		manifest = Cache.read(path)
+		if manifest == None or not Cache.verify(path, manifest):
+			Util.run("rm -rf %s.tmp"%(path))
+			Store.link(prog.outdir, "%s.tmp"%(path))
+			Util.run("rm -rf %s && mv %s.tmp %s"%(path, path, path))
+		Store.evict()
+
+	@staticmethod
+	def evict():
+		'''
+		Remove the least recently used steps until the store fits in its size, skipping the steps in use by other runs
+		'''
+		if Store.size <= 0:
+			return
+		fd = open("%s/.evict.lock"%(Store.path), 'w')
+		fcntl.flock(fd, fcntl.LOCK_EX)
+		try:
+			total = int(subprocess.check_output("du -sb %s | cut -f1"%(Store.path), shell=True))
+			entries = [path for path in glob.glob("%s/*"%(Store.path)) if os.path.isdir(path) and not path.endswith(".tmp")]
+			for path in sorted(entries, key=os.path.getmtime):
+				if total <= Store.size:
+					break
+				lock = open("%s.lock"%(path), 'w')
+				try:
+					fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+				except IOError:
+					lock.close()
+					continue
+				total -= int(subprocess.check_output("du -sb %s | cut -f1"%(path), shell=True))
+				Message.info("Evict %s from the store"%(path))
+				Util.rmdir(path)
+				lock.close()
+		finally:
+			fd.close()
 
 class Program:
 	'''
@@ -304,6 +781,13 @@ class Program:
 	'''
 	steps = []
 	cnt = 0
+	queue = 'main'
+	threaded = False
+	perEnzyme = False
+	params = []
+	# the tools of the step write their alignments, FASTA, TSVs and logs gzipped when the outputs are compressed,
+	# the CMAPs read by RefAligner and the results of the final steps stay plain
+	compressed = False
 	def __init__(self, name, desc, description, depends):
 		Program.steps.append(self)
 		Program.cnt += 1
@@ -312,6 +796,13 @@ class Program:
 		self.desc = desc
 		self.description = description
 		self.depends = depends
+		self.nthreads = Config.nthreads
+		self.njobs = 1
+		self.key = None
+		self.manifest = None
+		self.jobid = None
+		self.join = None
+		self.request = None
 		assert(Config.outpath != "")
 		self.outdir = "%s/Step-%02d_%s"%(Config.outpath, self.no, desc.replace(" ", "_"))
 		self.status = "%s/status.txt"%self.outdir
@@ -320,16 +811,140 @@ class Program:
 	def config(self):
 		print "invoked config() from Class %s" % self.__class__.__name__
 
+	def isSingleThread(self):
+		return not self.threaded
+
+	def fanout(self):
+		'''
+		The number of independent units (enzyme channels) inside the step
+		'''
+		return len(Config.incmaps) if self.perEnzyme else 1
+
+	def isArray(self):
+		'''
+		Whether the enzyme channels of the step are submitted as the tasks of an SGE array job
+		'''
+		return Config.bqueue and Config.arrayJobs != 0 and self.perEnzyme and self.fanout() > 1
+
+	def threadArgs(self):
+		cmd = ""
+		if self.nthreads != 0:
+			cmd += " %d"%self.nthreads
+			if Config.xmldir:
+				cmd += " %s"%Config.xmldir
+		else:
+			if Config.xmldir:
+				cmd += " 0 %s"%Config.xmldir
+		return cmd
+
+	def resources(self):
+		'''
+		The slots and memory requested by the job of the step, or by each task of its array job
+		'''
+		cfg = Queue(self.queue)
+		if self.isArray():
+			slots, mem = cfg.taskSlots, cfg.taskMem
+		elif self.isSingleThread():
+			slots, mem = self.njobs, cfg.mem
+		elif self.nthreads > 0:
+			slots, mem = self.nthreads, cfg.mem
+		else:
+			slots, mem = cfg.slots, cfg.mem
+		if Config.bestimate:
+			return Estimator.fit(self, cfg, int(slots), mem, self.isArray())
+		return int(slots), mem
+
+	def submit(self, cmd):
+		# the tools keep the sidecars of the files they read under the output folder only
+		env = "MOMS_JOBS=%d MOMS_OUTPUT=%s"%(self.njobs, pipes.quote(Config.outpath))
+		if Profiler.path != "":
+			env += " MOMS_STEP=%s MOMS_PROFILE=%s"%(os.path.basename(self.outdir), Profiler.path)
+		if Config.bcompress and self.compressed:
+			env += " MOMS_COMPRESS=%s"%pipes.quote(Config.compressor)
+		if Config.alignShards > 1:
+			env += " MOMS_ALIGN_SHARDS=%d"%Config.alignShards
+			if Config.bqueue:
+				# each shard is a task requesting the task_slots and task_mem of [alignshard], whatever -t is,
+				# and RefAligner is told to stay within that request
+				shard = Queue('alignshard')
+				env += " MOMS_ALIGN_GRID=%s"%pipes.quote(shard.options(shard.taskSlots, shard.taskMem))
+				env += " MOMS_ALIGN_GRID_THREADS=%s MOMS_ALIGN_GRID_MEM=%d"%(shard.taskSlots, max(1, Queue.bytes(shard.taskMem) // 1024 ** 3))
+		if Config.bqueue:
+			command = "%s bash %s"%(env, cmd)
+			if Profiler.path != "":
+				command = "%s python %s --step %s"%(env, Profiler.script, pipes.quote("bash %s"%(cmd)))
+			dictVars = {'WORKDIR': self.outdir, 'COMMAND': command, 'SLOTS': self.request[0], 'MEM': self.request[1]}
+			template = None
+			if self.isArray():
+				# every task requests the resources of a single enzyme, so does the join run submitted after them
+				self.join = dict(dictVars)
+				dictVars['TASKS'] = self.fanout()
+				template = 'array'
+			self.jobid = writeQueueScript(self.queue, dictVars, template=template)
+			if self.jobid == None:
+				Message.error("Error: failed to submit the job of step %d"%(self.no))
+				sys.exit()
+		else:
+			Util.run("%s %s"%(env, cmd), os.path.basename(self.outdir), 'step')
+
 	def preprocess(self):
 		pass
 
+	def taskStatus(self, task):
+		return "%s/status.%d.txt"%(self.outdir, task)
+
+	def isFinished(self, status=None):
+		'''
+		Whether the step script, or the given task of its array job, has reported its final status
+		'''
+		status = self.status if status == None else status
+		if not os.path.isfile(status):
+			return False
+		with open(status, 'r') as f:
+			return re.search(r"done|error", f.read(), re.I) != None
+
+	def tasksFinished(self):
+		return all([self.isFinished(self.taskStatus(i)) for i in range(1, self.fanout() + 1)])
+
+	def poll(self, finished):
+		'''
+		Wait until finished() holds, backing off between checks, and give up as soon as the job is gone without a status
+		'''
+		delay = 1
+		misses = 0
+		while not finished():
+			alive = Queue.isAlive(self.jobid) if self.jobid != None else True
+			# a failing qstat is retried, the job is only taken as gone after too many failures in a row
+			misses = misses + 1 if alive == None else 0
+			if alive == False or misses >= Queue.maxMisses:
+				if finished():
+					break
+				Message.error("Error: job %s of step %d disappeared without finishing"%(self.jobid, self.no))
+				sys.exit()
+			time.sleep(delay)
+			delay = min(delay * 2, Queue.maxDelay)
+
 	def waiting(self):
+		'''
+		Wait for the submitted job; an array job is joined by a run of the whole step once all its tasks are done
+		'''
 		if Config.bqueue:
-			while True:
-				status = int(subprocess.check_output("grep -iE 'done|error' %s 2>/dev/null | wc -l"%(self.status), shell=True))
-				if status > 0:
-					break
-				time.sleep(1)
+			if self.join != None:
+				self.poll(self.tasksFinished)
+				for i in range(1, self.fanout() + 1):
+					with open(self.taskStatus(i), 'r') as f:
+						report = f.read()
+					if re.search(r"done", report, re.I) == None:
+						# the failed task decides the status of the step
+						with open(self.status, 'w') as f:
+							f.write(report)
+						return
+				self.jobid = writeQueueScript(self.queue, self.join)
+				self.join = None
+				if self.jobid == None:
+					Message.error("Error: failed to submit the join job of step %d"%(self.no))
+					sys.exit()
+			self.poll(self.isFinished)
 
 	def isDone(self):
 		print "invoked isDone() from Class %s" % self.__class__.__name__
@@ -337,27 +952,154 @@ class Program:
 	def process(self):
 		print "invoked process() from Class %s" % self.__class__.__name__
 
+	def inputs(self):
+		'''
+		The input files of the step which are not produced by its dependencies
+		'''
+		return []
+
+	def cacheKey(self, previous=None):
+		'''
+		Hash the step script, the tools it runs, its parameters, the contents of its input files and the keys of its dependencies
+		'''
+		known = previous['inputs'] if previous != None and previous.has_key('inputs') else {}
+		inputs = {}
+		files = self.inputs()
+		if Config.xmldir and os.path.isdir(Config.xmldir):
+			files += ["%s/%s"%(Config.xmldir, fl) for fl in sorted(os.listdir(Config.xmldir)) if fl.endswith(".xml")]
+		for fl in files:
+			inputs[fl] = Cache.digest(fl, known.get(fl))
+		# the results of a dependency are determined by its key, their records only tell which channels changed
+		for dep in self.depends:
+			for rel, record in dep.manifest['outputs'].iteritems():
+				inputs["%s/%s"%(os.path.basename(dep.outdir), rel)] = record
+		self.inputDigests = inputs
+		params = dict([(k, Config.parameters[k]) for k in self.params if Config.parameters.has_key(k)])
+		signature = [self.__class__.__name__, __version__, Cache.digest(self.program)['md5'], Cache.tools(), params,
+				sorted([(fl, inputs[fl]['md5']) for fl in files]),
+				sorted([(os.path.basename(dep.outdir), dep.key) for dep in self.depends])]
+		return hashlib.md5(json.dumps(signature, sort_keys=True)).hexdigest()
+
+	def isCached(self, previous):
+		return previous != None and previous.get('key') == self.key and Cache.verify(self.outdir, previous)
+
+	def isStale(self, previous):
+		return previous != None and not self.isCached(previous)
+
+	def isReusable(self, rel, enzymes):
+		'''
+		Whether a result file belongs to a single enzyme channel, and can be kept when other channels are added
+		'''
+		return len(enzymes) == 1
+
+	def invalidChannels(self, previous):
+		'''
+		The enzyme channels whose inputs changed since the previous run, or None if the step has to be run from scratch
+		'''
+		if previous == None or previous.get('program') != Cache.digest(self.program)['md5'] or previous.get('version') != __version__:
+			return None
+		if previous.get('tools') != Cache.tools():
+			return None
+		if previous.get('parameters') != dict([(k, Config.parameters[k]) for k in self.params if Config.parameters.has_key(k)]):
+			return None
+		invalid = set()
+		for path, record in previous['inputs'].iteritems():
+			if Cache.same(self.inputDigests.get(path), record):
+				continue
+			if os.path.isabs(path):
+				# an input file given by the user changed or went away
+				return None
+			enzymes = Cache.enzymes(path)
+			if len(enzymes) == 1:
+				invalid |= enzymes
+		return invalid
+
+	def prune(self, invalid):
+		'''
+		Keep the results of the unchanged enzyme channels in the output folder, everything else is computed again
+		'''
+		Message.info("Reuse the results of the existing enzyme channels in %s"%(self.outdir))
+		for root, dirs, files in os.walk(self.outdir):
+			for fl in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+				path = os.path.join(root, fl)
+				rel = os.path.relpath(path, self.outdir)
+				enzymes = Cache.enzymes(rel)
+				if not self.isReusable(rel, enzymes) or enzymes & invalid:
+					os.remove(path)
+		# the scripts take an existing folder of a channel or pair as its finished results
+		for root, dirs, files in os.walk(self.outdir, topdown=False):
+			if root != self.outdir and not os.listdir(root):
+				os.rmdir(root)
+
+	def writeManifest(self):
+		self.manifest = {
+			'step'		: self.__class__.__name__,
+			'key'		: self.key,
+			'version'	: __version__,
+			'program'	: Cache.digest(self.program)['md5'],
+			'tools'		: Cache.tools(),
+			'parameters': dict([(k, Config.parameters[k]) for k in self.params if Config.parameters.has_key(k)]),
+			'inputs'	: self.inputDigests,
+			'outputs'	: Cache.collect(self.outdir),
+			'time'		: strftime("%Y-%m-%d %H:%M:%S")
+		}
+		Cache.write(self.outdir, self.manifest)
+
 	def run(self):
 		Message.info("Step %d: %s"%(self.no, self.description))
 		self.preprocess()
-		if not self.isDone() or Config.bforce:
-			if Config.bforce and os.path.exists(self.outdir):
-				Util.rmdir(self.outdir)
+		previous = Cache.read(self.outdir)
+		self.key = self.cacheKey(previous)
+		if not Config.bforce and self.isCached(previous) and self.isDone():
+			self.manifest = previous
+			return
+		lock = Store.lock(self.key) if Store.path != "" else None
+		try:
+			if lock != None and not Config.bforce:
+				self.manifest = Store.fetch(self)
+				if self.manifest != None:
+					Message.info("Step %d is copied from %s/%s"%(self.no, Store.path, self.key))
+					return
+			if os.path.exists(self.outdir) and (Config.bforce or self.isStale(previous)):
+				invalid = self.invalidChannels(previous) if Config.bincremental and not Config.bforce else None
+				if invalid != None:
+					self.prune(invalid)
+				else:
+					Util.rmdir(self.outdir)
 			Util.mkdir(self.outdir)
+			if self.isArray():
+				# each task of the array job processes one enzyme
+				self.njobs = 1
+			if Config.bqueue:
+				# the step runs on the slots requested for it
+				self.request = self.resources()
+				if not self.isSingleThread() and (self.isArray() or self.nthreads > 0):
+					self.nthreads = self.request[0]
 			self.process()
 			self.waiting()
 			if not self.isDone():
 				Message.error("Not finished");
 				sys.exit()
-			Message.time()
+			self.writeManifest()
+			if lock != None:
+				Store.publish(self)
+		finally:
+			if lock != None:
+				lock.close()
+		Message.time()
 
 class Inputor(Program):
 	'''
 	The base class for input files preparation
 	'''
+	queue = 'inputor'
+
 	def config(self):
 		self.fasta = Config.infasta
 		self.cmaps = ','.join(Config.incmaps)
+
+	def inputs(self):
+		return [self.fasta] + Config.incmaps
 	
 	def isDone(self):
 		num1 = int(subprocess.check_output("ls -1 %s/contig-length.txt %s 2>/dev/null | wc -l"%(self.outdir, self.fasta), shell=True));
@@ -367,20 +1109,23 @@ class Inputor(Program):
 	
 	def process(self):
 		cmd=("%s %s %s %s")%(self.program, self.fasta, self.cmaps, self.outdir);
-		if Config.bqueue:
-			writeQueueScript('inputor', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class CmapConvertor(Program):
 	'''
 	The base class for FASTA to CMAP convertor
 	'''
+	queue = 'cmapconvertor'
+	# all enzyme channels are digested in one pass over the assembly, so the step is a single unit
+	# instead of a fan-out of one encoder per enzyme; fa2cmap.sh still caches the cmap of every channel
+	params = ['fa2cmap.minLabels', 'fa2cmap.minLength']
+
 	def config(self):
 		self.indir = self.depends[0].outdir
 		self.fasta = Util.basename(self.depends[0].fasta)
 		self.minnicks = int(Config.parameters['fa2cmap.minLabels']);
 		self.minklen = int(Config.parameters['fa2cmap.minLength']);
+		self.cachesize = int(Config.parameters['fa2cmap.cacheSize']) if Config.parameters.has_key('fa2cmap.cacheSize') else 0;
 
 	def preprocess(self):
 		enzyme_file = ("%s/enzymes.txt")%(self.indir);
@@ -393,20 +1138,27 @@ class CmapConvertor(Program):
 
 	def process(self):
 		cmd=("%s %s/%s %s %s")%(self.program, self.indir, self.fasta, self.enzymes, self.outdir)
-		if (self.minnicks > 0) or (self.minklen > 0):
+		if Config.cachedir:
+			cmd += " %d %d %s %d"%(self.minnicks, self.minklen, Config.cachedir, self.cachesize)
+		elif (self.minnicks > 0) or (self.minklen > 0):
 			cmd += " %d"%self.minnicks
 			if self.minklen > 0:
 				cmd += " %d"%self.minklen
 		
-		if Config.bqueue:
-			writeQueueScript('cmapconvertor', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class CmapRescaler(Program):
 	'''
 	The base class for rescaling BNG cmap
 	'''
+	queue = 'cmapaligner'
+	threaded = True
+	perEnzyme = True
+	# the BNG CMAPs are rescaled by the error parameters of their alignment to the NGS CMAPs, so the key of the step
+	# covers both and a stored step is shared by the runs of the same assembly and BNG CMAPs only
+	params = ['parallel.alignShards']
+	compressed = True
+
 	def config(self):
 		self.refdir = self.depends[0].outdir; # cmapconvertor
 		self.refpre = Config.fasta_prefix;
@@ -422,23 +1174,20 @@ class CmapRescaler(Program):
 
 	def process(self):
 		cmd = ("%s %s/%s %s/%s %s")%(self.program, self.refdir, self.refpre, self.qrydir, self.qrypre, self.outdir);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('cmapaligner', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class ChimeraResolver(Program):
 	'''
 	The base class for Chimaeral cmap resolver
 	'''
+	queue = 'cmapresolver'
+	threaded = True
+	perEnzyme = True
+	params = ['parallel.alignShards']
+	compressed = True
+
 	def config(self):
 		self.refdir = self.depends[0].outdir; # cmapconvertor
 		self.refpre = Config.fasta_prefix
@@ -455,23 +1204,20 @@ class ChimeraResolver(Program):
 
 	def process(self):
 		cmd = ("%s %s/%s %s/%s %s")%(self.program, self.refdir, self.refpre, self.qrydir, self.qrypre, self.outdir);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('cmapresolver', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class HybridScaffolder(Program):
 	'''
 	The base class for Hybrid Scaffolder
 	'''
+	queue = 'scaffolder'
+	threaded = True
+	perEnzyme = True
+	params = ['scaffold.single.fillgap', 'parallel.alignShards']
+	compressed = True
+
 	def config(self):
 		self.indir = self.depends[0].indir; # cmapconvertor
 		self.fasta = self.depends[0].fasta; # cmapconvertor
@@ -485,28 +1231,23 @@ class HybridScaffolder(Program):
 	def isDone(self):
 		num1 = int(subprocess.check_output("ls -1 %s/*.%s.cmap 2>/dev/null | wc -l"%(self.outdir, Config.scaffold_suffix), shell=True));
 		num2 = int(subprocess.check_output("ls -1 %s/*.agp 2>/dev/null | wc -l"%(self.outdir), shell=True));
-		num3 = int(subprocess.check_output("ls -1 %s/*.fasta 2>/dev/null | wc -l"%(self.outdir), shell=True));
+		num3 = int(subprocess.check_output("ls -1 %s/*.fasta %s/*.fasta.gz 2>/dev/null | wc -l"%(self.outdir, self.outdir), shell=True));
 		return (num1 == len(Config.incmaps)) and (num2 == len(Config.incmaps)) and (num3 == len(Config.incmaps))
 
 	def process(self):
 		cmd = ("%s %s/%s %s/%s %s/%s %s/%s %s %d")%(self.program, self.resdir, self.ngspre, self.resdir, self.bngpre, self.indir, self.fasta, self.encdir, self.encpre, self.outdir, self.bfillgap);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('scaffolder', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class SandwichScaffolder(Program):
 	'''
 	The base class for Sandwich Scaffolder
 	'''
+	queue = 'sandwichscaff'
+	threaded = True
+	compressed = True
+
 	def config(self):
 		self.scfdir = self.depends[0].outdir; # scaffolder
 		self.scfsuf = Config.scaffold_suffix
@@ -517,18 +1258,34 @@ class SandwichScaffolder(Program):
 		num = int(subprocess.check_output("ls -1 %s/multicolors.cmap 2>/dev/null | wc -l"%(self.outdir), shell=True));
 		return (num == 1)
 
+	def fanout(self):
+		'''
+		The enzyme pairs are associated independently
+		'''
+		n = len(Config.incmaps)
+		return max(1, n * (n - 1) / 2)
+
+	def isReusable(self, rel, enzymes):
+		'''
+		The association of an enzyme pair is kept when other channels are added
+		'''
+		return rel.startswith("sandwich/") and len(enzymes) == 2
+
 	def process(self):
 		cmd = ("%s %s %s %s/%s %s")%(self.program, self.scfdir, self.scfsuf, self.resdir, self.ngspre, self.outdir);
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('sandwichscaff', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class BNGAligner(Program):
 	'''
 	The base class for BNG data to scaffolds aligner
 	'''
+	queue = 'bngaligner'
+	threaded = True
+	perEnzyme = True
+	params = ['scaffold.mono.fillgap', 'parallel.alignShards']
+
 	def config(self):
 		self.refdir = ("%s")%(self.depends[0].outdir); # sandwichScaff
 		self.qrydir = self.depends[1].outdir; # cmapresolver
@@ -548,23 +1305,18 @@ class BNGAligner(Program):
 
 	def process(self):
 		cmd = ("%s %s %s/%s %s %s %d")%(self.program, self.refdir, self.qrydir, self.qrypre, self.qrysuf, self.outdir, self.bfillgap);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('bngaligner', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class NGSAlignerUni(Program):
 	'''
 	The base class for NGS sequences to scaffolds aligner
 	'''
+	queue = 'ngsaligner'
+	threaded = True
+	params = ['parallel.alignShards']
+
 	def config(self):
 		self.refdir = ("%s")%(self.depends[0].outdir); # bngaligner
 		self.qrydir = self.depends[1].outdir; # chimeraresolver
@@ -585,23 +1337,18 @@ class NGSAlignerUni(Program):
 
 	def process(self):
 		cmd = ("%s %s %s/%s %s %s %s %s %s")%(self.program, self.refdir, self.qrydir, self.qrypre, self.qrysuf, self.fasta, self.enzymes, self.encdir, self.outdir);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('ngsaligner', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class NGSAligner(Program):
 	'''
 	The base class for NGS sequences to scaffolds aligner
 	'''
+	queue = 'ngsaligner'
+	threaded = True
+	params = ['parallel.alignShards']
+
 	def config(self):
 		self.refdir = ("%s")%(self.depends[0].outdir); # bngaligner
 		self.qrydir = self.depends[1].outdir; # cmapresolver
@@ -614,23 +1361,16 @@ class NGSAligner(Program):
 
 	def process(self):
 		cmd = ("%s %s %s/%s %s %s")%(self.program, self.refdir, self.qrydir, self.qrypre, self.qrysuf, self.outdir);
-		if Config.nthreads != 0:
-			cmd += " %d"%Config.nthreads
-			if Config.xmldir:
-				cmd += " %s"%Config.xmldir
-		else:
-			if Config.xmldir:
-				cmd += " 0 %s"%Config.xmldir
+		cmd += self.threadArgs()
 
-		if Config.bqueue:
-			writeQueueScript('ngsaligner', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class SeqReporter(Program):
 	'''
 	The base class for final scaffolds reporter
 	'''
+	queue = 'reporter'
+
 	def config(self):
 		self.alndir = self.depends[0].outdir; # ngsaligner
 		self.alnfile = "combined.xmap";
@@ -650,15 +1390,14 @@ class SeqReporter(Program):
 		cmd = ("%s %s/%s %s/%s %s/%s %s/%s %s/%s")%(self.program, self.alndir, self.alnfile, self.fadir, self.fafile,
 				 self.cmapdir, self.cmapfile, self.encdir, self.encpre, self.outdir, self.outpre);
 
-		if Config.bqueue:
-			writeQueueScript('reporter', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 class Validator(Program):
 	'''
 	The base class for validate reporter
 	'''
+	queue = 'cmapresolver'
+
 	def config(self):
 		self.encdir = self.depends[0].outdir; # cmapconvertor
 		self.resdir = self.depends[1].outdir; # cmapresolver
@@ -666,23 +1405,119 @@ class Validator(Program):
 
 	def process(self):
 		cmd = ("%s %s %s")%(self.program, self.encdir, self.resdir);
-		if Config.bqueue:
-			writeQueueScript('cmapresolver', {'WORKDIR': self.outdir, 'COMMAND': "bash %s"%cmd})
-		else:
-			Util.run(cmd)
+		self.submit(cmd)
 
 	def run(self):
 		Message.info("Step %d: %s"%(self.no, self.description))
+		if Config.bqueue:
+			self.request = self.resources()
 		self.process()
 		self.waiting()
 		Message.time()
 
+class Scheduler:
+	'''
+	The class for running steps concurrently according to their dependencies
+	'''
+	def __init__(self, steps, nthreads, pool=None):
+		self.steps = steps
+		self.pool = pool
+		self.budget = nthreads if nthreads > 0 else multiprocessing.cpu_count()
+		self.free = self.budget
+		self.finished = []
+		self.running = {}
+		self.memory = {}
+		self.failed = False
+		self.cond = threading.Condition()
+
+	def available(self):
+		'''
+		The free threads, which are shared with the other pipelines of a batch
+		'''
+		return self.pool.free() if self.pool != None else self.free
+
+	def isReady(self, prog):
+		for dep in prog.depends:
+			if dep not in self.finished:
+				return False
+		return True
+
+	def allocate(self, prog, nmulti):
+		'''
+		Share the free threads among the ready steps, a single-threaded step takes one thread per independent unit
+		'''
+		if prog.isSingleThread():
+			return max(1, min(prog.fanout(), Config.maxjobs, self.available()))
+		return max(1, self.available() / nmulti)
+
+	def execute(self, prog):
+		bSuccess = False
+		try:
+			prog.run()
+			bSuccess = True
+		except SystemExit:
+			pass
+		except Exception:
+			# any other failure of a step stops the run as well, instead of leaving it marked as running
+			Message.error("Step %d failed:\n%s"%(prog.no, traceback.format_exc()))
+		finally:
+			self.cond.acquire()
+			try:
+				ncores = self.running.pop(prog)
+				self.free += ncores
+				if self.pool != None:
+					self.pool.release(ncores, self.memory.pop(prog))
+				if bSuccess:
+					self.finished.append(prog)
+				else:
+					self.failed = True
+				self.cond.notify()
+			finally:
+				self.cond.release()
+
+	def run(self):
+		pending = list(self.steps)
+		workers = []
+		self.cond.acquire()
+		while (pending or self.running) and not self.failed:
+			ready = [prog for prog in pending if self.isReady(prog)]
+			nmulti = len([prog for prog in ready if not prog.isSingleThread()])
+			for prog in ready:
+				if self.available() < 1:
+					break
+				ncores = self.allocate(prog, nmulti)
+				if self.pool != None:
+					# the memory of a step is estimated by the request of its queue
+					memory = Queue(prog.queue).memory()
+					if not self.pool.acquire(ncores, memory):
+						break
+					self.memory[prog] = memory
+				if not prog.isSingleThread():
+					nmulti -= 1
+				self.free -= ncores
+				self.running[prog] = ncores
+				if Config.nthreads > 0:
+					prog.nthreads = ncores
+				prog.njobs = max(1, min(prog.fanout(), ncores, Config.maxjobs))
+				pending.remove(prog)
+				worker = threading.Thread(target=self.execute, args=(prog,))
+				worker.daemon = True
+				worker.start()
+				workers.append(worker)
+			self.cond.wait(1)
+		self.cond.release()
+		for worker in workers:
+			while worker.isAlive():
+				worker.join(1)
+		return not self.failed
+
 # MAIN ENTRY POINT
-def main():
+def main(pool=None):
 	'''
-	The main function.
+	The main function, the pipelines of a batch share the threads and memory of the pool
 	'''
-	if(not os.path.exists(Config.apath + "/RefAligner")):
+	# the batch checks the setup once for all its pipelines
+	if(pool == None and not os.path.exists(Config.apath + "/RefAligner")):
 		cmd=("%s/setup.sh")%(Config.spath);
 		Util.run(cmd);
 		if(not os.path.exists(Config.apath + "/RefAligner")):
@@ -693,6 +1528,7 @@ def main():
 	showWelcomeInfo(args);
 	if(not os.path.exists(Config.outpath)):
 		Util.mkdir(Config.outpath)
+	Profiler.reset()
 
 # prepare modules for running
 	inputor = Inputor("prepare-input.sh", "Input", "Prepare input files", [])
@@ -713,16 +1549,31 @@ def main():
 		validator = Validator("conflictReport.sh", "Conflict report", "Report the statistics of conflicts between NGS contigs and BNG cmaps", [cmapconvertor, chimeraresolver]);
 
 # start running individual steps
-	for prog in Program.steps:
-		prog.run()
+	scheduler = Scheduler(Program.steps, Config.nthreads, pool)
+	bSuccess = scheduler.run()
+	Profiler.summarize(Program.steps)
+	if not bSuccess:
+		Message.error("Not finished");
+	return bSuccess
 
 # for direct script invoking
 if __name__ == "__main__":
-	if Config.bqueue:
+	if Config.bqueue and not os.environ.has_key('JOB_ID'):
 		if Config.sgesetting == '':
 			Message.error('Error: SGE initialization script "settings.sh" doesn\'t exist, please check the file "queue.conf".')
 			sys.exit()
-		cmd = "python %s -i %s -b %s -o %s -t %d -c auto"%(os.path.abspath(sys.argv[0]), Config.infasta, ' '.join(Config.incmaps), Config.outpath, Config.nthreads)
-		writeQueueScript('main', {'WORKDIR': Config.outpath, 'COMMAND': cmd})
+		cmd = "python %s -i %s -b %s -o %s -t %d --cluster"%(os.path.abspath(sys.argv[0]), Config.infasta, ' '.join(Config.incmaps), Config.outpath, Config.nthreads)
+		if args.profile:
+			cmd += " --profile"
+		if Store.path != "":
+			cmd += " --store %s --store-size %g"%(Store.path, args.store_size)
+		if Config.bincremental:
+			cmd += " --incremental"
+		jobid = writeQueueScript('main', {'WORKDIR': Config.outpath, 'COMMAND': cmd})
+		if jobid == None:
+			Message.error('Error: failed to submit the pipeline job')
+		else:
+			Message.info('The pipeline has been submitted as job %s'%(jobid))
 		sys.exit();
-	main()
+	if not main():
+		sys.exit(1)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+'''
+python program for running the MOMS pipelines of many assemblies under one budget of threads and memory
+
+Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+MOMS is licensed under the Mulan PSL v1.
+You can use this software according to the terms and conditions of the Mulan PSL v1.
+You may obtain a copy of Mulan PSL v1 at:
+    http://license.coscl.org.cn/MulanPSL
+THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND, EITHER EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR
+PURPOSE.
+See the Mulan PSL v1 for more details.
+'''
+
+import os
+import sys
+import time
+import shlex
+import subprocess
+import multiprocessing
+import argparse
+from configobj import ConfigObj
+
+PATH = os.path.dirname(os.path.abspath(sys.argv[0]))
+
+class Pool:
+	'''
+	The threads and memory shared by the pipelines of a batch
+	'''
+	def __init__(self, nthreads, memory, npipelines):
+		self.lock = multiprocessing.Lock()
+		self.threads = multiprocessing.Value('i', nthreads, lock=False)
+		self.memory = multiprocessing.Value('d', memory, lock=False)
+		self.used = multiprocessing.Value('d', 0, lock=False)
+		# the share held by every pipeline, so that the share of a pipeline which died can be taken back
+		self.heldThreads = multiprocessing.Array('i', npipelines, lock=False)
+		self.heldMemory = multiprocessing.Array('d', npipelines, lock=False)
+		self.slot = None
+
+	def free(self):
+		with self.lock:
+			return self.threads.value
+
+	def acquire(self, nthreads, memory):
+		'''
+		Take the resources of a step, a step needing more memory than the whole budget still runs alone
+		'''
+		with self.lock:
+			if self.threads.value < nthreads:
+				return False
+			if self.memory.value > 0 and self.used.value > 0 and self.used.value + memory > self.memory.value:
+				return False
+			self.threads.value -= nthreads
+			self.used.value += memory
+			if self.slot != None:
+				self.heldThreads[self.slot] += nthreads
+				self.heldMemory[self.slot] += memory
+			return True
+
+	def release(self, nthreads, memory):
+		with self.lock:
+			self.threads.value += nthreads
+			self.used.value -= memory
+			if self.slot != None:
+				self.heldThreads[self.slot] -= nthreads
+				self.heldMemory[self.slot] -= memory
+
+	def reclaim(self, slot):
+		'''
+		Take back whatever a pipeline still holds, nothing is left once it released all its share
+		'''
+		with self.lock:
+			self.threads.value += self.heldThreads[slot]
+			self.used.value -= self.heldMemory[slot]
+			nthreads = self.heldThreads[slot]
+			self.heldThreads[slot] = 0
+			self.heldMemory[slot] = 0
+			return nthreads
+
+def processArgs():
+	parser = argparse.ArgumentParser(description="Run the MOMS pipelines of many assemblies, sharing the threads, the memory and the identical steps")
+	parser.add_argument('-l', dest='manifest', help='--file listing the moms.py arguments of one assembly per line, e.g. "-i hap1.fasta -b bspqi.cmap bsssi.cmap -o hap1"', required=True)
+	parser.add_argument('-t', dest='num_threads', type=int, default=multiprocessing.cpu_count(), help='--number of threads shared by all pipelines (default: all cores)', required=False)
+	parser.add_argument('-M', dest='memory', type=float, default=0, help='--memory (in GB) shared by all pipelines, estimated by the mem of queue.conf for every step (default: 0, unlimited)', required=False)
+	parser.add_argument('-j', dest='num_jobs', type=int, default=0, help='--number of pipelines running at the same time (default: 0, all)', required=False)
+	parser.add_argument('-s', dest='store', default=None, help='--shared folder of finished steps, so that identical steps of the pipelines are computed once (default: none)', required=False)
+	parser.add_argument('-S', dest='store_size', type=float, default=0, help='--size (in GB) of the store, beyond which the least recently used steps are evicted (default: 0, unlimited)', required=False)
+	args = parser.parse_args()
+	if not os.path.exists(args.manifest):
+		print "Manifest file \"%s\" does not exist"%(args.manifest)
+		sys.exit(1)
+	return args
+
+def readManifest(path):
+	'''
+	Read the argument lists of the pipelines, skipping blank lines and comments
+	'''
+	pipelines = []
+	with open(path) as fh:
+		for line in fh:
+			line = line.strip()
+			if line == '' or line.startswith('#'):
+				continue
+			pipelines.append(shlex.split(line))
+	return pipelines
+
+def outputOf(argv):
+	parser = argparse.ArgumentParser(add_help=False)
+	parser.add_argument('-o', dest='output', required=True)
+	return parser.parse_known_args(argv)[0].output
+
+def runPipeline(slot, argv, pool, store, size):
+	'''
+	Run one pipeline in a child process, logging to moms.log of its output folder
+	'''
+	pool.slot = slot
+	outdir = outputOf(argv)
+	if not os.path.exists(outdir):
+		os.makedirs(outdir)
+	log = open("%s/moms.log"%(outdir), 'a')
+	os.dup2(log.fileno(), sys.stdout.fileno())
+	os.dup2(log.fileno(), sys.stderr.fileno())
+	sys.argv = ["%s/moms.py"%(PATH)] + argv
+	if store != None:
+		sys.argv += ['--store', store, '--store-size', str(size)]
+	sys.path.insert(0, PATH)
+	bSuccess = False
+	try:
+		import moms
+		bSuccess = moms.main(pool)
+	except SystemExit:
+		pass
+	finally:
+		# the threads of the steps still running when the pipeline stopped go back to the other pipelines
+		pool.reclaim(slot)
+	sys.stdout.flush()
+	sys.exit(0 if bSuccess else 1)
+
+def checkSetup(pipelines):
+	'''
+	Install RefAligner once for all the pipelines
+	'''
+	for argv in pipelines:
+		parser = argparse.ArgumentParser(add_help=False)
+		parser.add_argument('--conf', dest='conf', default=None)
+		conf = parser.parse_known_args(argv)[0].conf
+		config = ConfigObj(conf if conf != None else "%s/moms.conf"%(PATH))
+		apath = "%s/%s"%(PATH, config['paths']['aligner.dir'])
+		if not os.path.exists(apath + "/RefAligner"):
+			subprocess.call("%s/%s/setup.sh"%(PATH, config['paths']['scripts.dir']), shell=True)
+			if not os.path.exists(apath + "/RefAligner"):
+				print "RefAligner is not installed in %s"%(apath)
+				sys.exit(1)
+
+def main():
+	args = processArgs()
+	pipelines = readManifest(args.manifest)
+	checkSetup(pipelines)
+	pool = Pool(args.num_threads, args.memory * 1024 ** 3, len(pipelines))
+	store = os.path.abspath(args.store) if args.store != None else None
+	njobs = args.num_jobs if args.num_jobs > 0 else len(pipelines)
+
+	pending = list(enumerate(pipelines))
+	running = []
+	failed = []
+	while pending or running:
+		while pending and len(running) < njobs:
+			i, argv = pending.pop(0)
+			proc = multiprocessing.Process(target=runPipeline, args=(i, argv, pool, store, args.store_size))
+			proc.start()
+			running.append((i, proc))
+			print "[%s] Started pipeline %d: %s"%(time.strftime("%H:%M:%S"), i + 1, ' '.join(argv))
+			sys.stdout.flush()
+		for i, proc in list(running):
+			if proc.is_alive():
+				continue
+			running.remove((i, proc))
+			# a pipeline killed or crashed before releasing its share still holds it
+			if pool.reclaim(i) > 0:
+				print "[%s] Took back the threads and memory held by pipeline %d"%(time.strftime("%H:%M:%S"), i + 1)
+			if proc.exitcode != 0:
+				failed.append(i)
+			print "[%s] Pipeline %d %s, see %s/moms.log"%(time.strftime("%H:%M:%S"), i + 1, "failed" if proc.exitcode != 0 else "finished", outputOf(pipelines[i]))
+			sys.stdout.flush()
+		time.sleep(1)
+	if failed:
+		print "%d of %d pipelines failed"%(len(failed), len(pipelines))
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()
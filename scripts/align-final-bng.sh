@@ -27,7 +27,7 @@ qrypath=$2
 suffix=$3
 outdir=$4
 bfill=$(echo $5 | egrep '^[0-9]+$');
-stfile="$outdir/status.txt"
+stfile=$(task_status $outdir)
 
 nthreads=0
 alignconf=""
@@ -57,11 +57,16 @@ fi
 alndir="$outdir/single"
 echo -e "Beginning alignment of BNG contigs to the final scaffold ... ";
 stime=$(ntime)
-i=0;
 for refmap in `ls -1 $refdir/mono/*.cmap`; do
 	name=${refmap##*/};
 	name=${name%.cmap};
 	names+=($name);
+done
+# the enzymes processed by this run, a single one in a task of an array job
+declare -a tasknames=($(task_enzymes ${names[@]}))
+i=0;
+for name in ${tasknames[@]}; do
+	refmap="$refdir/mono/$name.cmap";
 	mkdir -p  "$alndir/$name";
 	if [ ! -f $alndir/$name/$name.xmap ]; then
 		qrymap="$qrydir/${qrypre}_${name}_$suffix.cmap";
@@ -79,7 +84,7 @@ for refmap in `ls -1 $refdir/mono/*.cmap`; do
 	fi
 done
 etime=$(ntime)
-if [ $i -lt ${#names[@]} ]; then
+if [ $i -lt ${#tasknames[@]} ]; then
 	echo 'Error 2' > $stfile
 	exit 1;
 fi
@@ -92,7 +97,7 @@ if [ $bfill -ne 0 ]; then
 	echo  -e "Beginning to fill gaps using non-aligned BNG contigs ... ";
 	stime=$(ntime)
 	i=0;
-	for name in ${names[@]}; do
+	for name in ${tasknames[@]}; do
 		if [ ! -f $filldir/$name.filled.cmap ]; then
 			check "grep -v \"^#\" $alndir/$name.xmap | cut -f2 | sort | uniq | $cmapfilter -c $qrydir/${qrypre}_${name}_$suffix.cmap -i - -exclude -o $filldir/$name.non_used > $filldir/$name.nonused.log";
 			check "$gapfiller -i $refdir/mono/$name.cmap -a $filldir/$name.non_used.cmap --addonly -o $filldir/$name.filled $shareparams > $filldir/$name.filled.log";
@@ -102,12 +107,15 @@ if [ $bfill -ne 0 ]; then
 		fi
 	done
 	etime=$(ntime)
-	if [ $i -lt ${#names[@]} ]; then
+	if [ $i -lt ${#tasknames[@]} ]; then
 		echo 'Error 3' > $stfile
 		exit 1;
 	fi
 	echo -e "Gap-filling completed in $(duration $stime $etime) s.\n";
+fi
+end_task $stfile
 
+if [ $bfill -ne 0 ]; then
 	eval "rm -rf $outdir/mono";
 	mkdir -p "$outdir/mono";
 	for name in ${names[@]}; do
@@ -74,12 +74,14 @@ function count_cmaps(){
 }
 
 function count_xmaps(){
-	infile=${1/\\*/*}
-	local result=$(grep '^[^#]' $infile 2>/dev/null| cut -f$2 | sort -n | uniq | wc -l)
+	# the files, then the column
+	local result=$(gzip -dcf ${@:1:$#-1} 2>/dev/null | grep '^[^#]' | cut -f${@: -1} | sort -n | uniq | wc -l)
 	echo "$result"
 }
 
-sEnzymes=( $( ls -1 $qrydir/*.xmap | sed 's/^.*\///' | sed 's/\..*$//' | tr '\n' ' ' ) )
+# the alignments of the conflicts, which are gzipped if the resolution step compresses its outputs
+xmaps=$(ls -1 $qrydir/*.xmap $qrydir/*.xmap.gz 2>/dev/null)
+sEnzymes=( $( echo "$xmaps" | sed 's/^.*\///' | sed 's/\..*$//' | tr '\n' ' ' ) )
 for e in ${sEnzymes[@]}
 do
 	if [ -z $nContigs ]; then
@@ -98,13 +100,14 @@ right=$( expr $len - $left )
 title=$( printf "$offset|%${left}s\033[33m$title\033[0m%${right}s|" )
 
 echo -e "\n$horizontal\n$title\n$horizontal"
-nConflictContigs=$(count_xmaps "$qrydir/*.xmap" 3)
-nConflicts=$( for f in `ls -1 $qrydir/*.xmap`; do grep -v '^#' $f | cut -f3 | sort -n; echo; done | awk 'BEGIN{id="";total=0}{if($1!=id){if(id!="")printf("%s\t%d\n", id, cnt); id=$1; cnt=1} else{cnt++}}' | sort -k1,1n | awk 'BEGIN{id="";total=0}{if($1!=id){if(id!="")total+=max; id=$1; max=$2}else{if($2>max)max=$2}}END{if(id!="")total+=max; print total}' )
+nConflictContigs=$(count_xmaps $xmaps 3)
+nConflicts=$( for f in $xmaps; do gzip -dcf $f | grep -v '^#' | cut -f3 | sort -n; echo; done | awk 'BEGIN{id="";total=0}{if($1!=id){if(id!="")printf("%s\t%d\n", id, cnt); id=$1; cnt=1} else{cnt++}}' | sort -k1,1n | awk 'BEGIN{id="";total=0}{if($1!=id){if(id!="")total+=max; id=$1; max=$2}else{if($2>max)max=$2}}END{if(id!="")total+=max; print total}' )
 formatLine " $nConflicts conflicts in $nConflictContigs / $nContigs contigs were flagged as conflicting; of these:"
 for e in ${sEnzymes[@]}
 do
-	count=$( grep -v '^#' $qrydir/$e.xmap | wc -l )
-	count2=$(count_xmaps $qrydir/$e.xmap 3)
+	xmap=$(ls -1 $qrydir/$e.xmap $qrydir/$e.xmap.gz 2>/dev/null | sed -n '1p')
+	count=$( gzip -dcf $xmap | grep -v '^#' | wc -l )
+	count2=$(count_xmaps $xmap 3)
 	formatLine "   $count in $count2 contigs were supported by enzyme $e"
 done
 
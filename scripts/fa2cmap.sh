@@ -10,11 +10,12 @@
 # See the Mulan PSL v1 for more details.
 
 if [ $# -lt 3 ]; then
-	echo "Usage: $0 input.fa enzymes outdir [minNicks [minKlen]]";
+	echo "Usage: $0 input.fa enzymes outdir [minNicks [minKlen [cachedir [cachesize]]]]";
 	exit;
 fi
 
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+source "$DIR/util.sh"
 fa2cmap="$DIR/perl/fa2cmap_multi_color.pl"
 
 infasta=$1
@@ -25,14 +26,60 @@ stfile="$outdir/status.txt"
 
 minnicks=0
 minklen=0
+cachedir=""
+cachesize=0
 if [ $# -ge 4 ]; then
 	minnicks=$(echo $4 | egrep '^[0-9]+$');
 	if [ $# -ge 5 ]; then
 		minklen=$(echo $5 | egrep '^[0-9]+$');
+		if [ $# -ge 6 ]; then
+			cachedir=$6
+			if [ $# -ge 7 ]; then
+				cachesize=$(echo $7 | egrep '^[0-9]+$');
+			fi
+		fi
 	fi
 fi
 
-convert(){
+# checksum of the fasta file, remembered by path, size and modification time
+fasta_checksum(){
+	local stamp="$(readlink -f $1) $(stat -L -c '%s %Y' $1)"
+	local index="$cachedir/checksums.txt"
+	local md5=$(grep -F "$stamp " $index 2>/dev/null | tail -n 1 | awk '{print $NF}')
+	if [[ -z "$md5" ]]; then
+		md5=$(md5sum < $1 | cut -d' ' -f1)
+		( flock 9; echo "$stamp $md5" >> $index ) 9>$cachedir/.lock
+	fi
+	echo "$md5"
+}
+
+# remove the least recently used entries until the cache fits in $cachesize MB, and forget the checksums
+# of the assemblies no entry is left for; readers hold the lock shared while they copy an entry
+evict_cache(){
+	if [[ -z "$cachesize" || $cachesize -le 0 ]]; then
+		return 0
+	fi
+	(
+		flock 9
+		local total=$(du -sm $cachedir | cut -f1)
+		local entry
+		for entry in `ls -1trd $cachedir/*/ 2>/dev/null`; do
+			if [ $total -le $cachesize ]; then
+				break
+			fi
+			total=$(( total - $(du -sm $entry | cut -f1) ))
+			rm -rf $entry
+		done
+		local index="$cachedir/checksums.txt"
+		if [[ -f "$index" ]]; then
+			# each entry names the checksum of its assembly in .done, the last record of a file wins
+			cat $cachedir/*/.done 2>/dev/null | awk 'NR==FNR{live[$1]=1; next} ($NF in live){stamp=$0; sub(/ [^ ]+$/, "", stamp); last[stamp]=$0} END{for(stamp in last) print last[stamp]}' - $index > $index.tmp
+			mv -f $index.tmp $index
+		fi
+	) 9>$cachedir/.lock
+}
+
+encode(){
 	params="-i $1 -e $2"
 	if [ $3 -gt 0 ]; then
 		params+=" -m $3"
@@ -41,29 +88,102 @@ convert(){
 		params+=" -M $4"
 	fi
 	params+=" -o $5"
+	if [[ -n "$single" ]]; then
+		params+=" $single"
+	fi
 
 	cmd="$fa2cmap $params";
 	echo "$cmd"
 	eval "($cmd)"
-	result=$?
-	if [ "$result" -ne 0 ]; then
-		echo 'Error 1' > $stfile
-		exit $result
+}
+
+# the cmap files of the encoder for the enzyme names joined by '_'
+unit_files(){
+	local prefix=${infasta##*/}
+	prefix=${prefix%.gz}
+	prefix="${prefix%.*}_$1"
+	if [ $minnicks -gt 0 -o $minklen -gt 0 ]; then
+		prefix+="_${minklen}kb_${minnicks}labels"
 	fi
+	echo "$prefix.cmap ${prefix}_key.txt ${prefix}_summary.txt"
+}
+
+# the cache key of one cmap, from the assembly, its enzyme channels and the filters
+unit_key(){
+	echo -n "$checksum ${infasta##*/} $1 $minnicks $minklen" | md5sum | cut -d' ' -f1
+}
+
+# copy the cached cmaps into the output folder, and list the ones still to be encoded
+fetch_units(){
+	missing=()
+	local i entry
+	exec 9>$cachedir/.lock
+	# an entry can not be evicted while it is looked up and copied
+	flock -s 9
+	for i in ${!specs[@]}; do
+		entry="$cachedir/$(unit_key "${specs[$i]}")"
+		if [[ -f "$entry/.done" ]] && cp -f $entry/* $outdir/; then
+			echo "Reuse the cached encoding of ${tags[$i]} in $entry"
+			touch $entry
+		else
+			missing+=($i)
+		fi
+	done
+	flock -u 9
+	exec 9>&-
+}
+
+# store the freshly encoded cmaps in the cache, each under its own key
+publish_units(){
+	local i key tmpdir fl
+	for i in ${missing[@]}; do
+		key=$(unit_key "${specs[$i]}")
+		tmpdir=$(mktemp -d $cachedir/.$key.XXXXXX)
+		for fl in $(unit_files ${tags[$i]}); do
+			cp -f $outdir/$fl $tmpdir/ || { rm -rf $tmpdir; continue 2; }
+		done
+		echo "$checksum" > $tmpdir/.done
+		mv -T $tmpdir $cachedir/$key 2>/dev/null || rm -rf $tmpdir
+	done
+	evict_cache
 }
 
-echo "Encoding with all enzyme channels ..."
-convert $infasta "$enzymes" $minnicks $minklen $outdir
+checksum=""
+if [[ -n "$cachedir" ]]; then
+	mkdir -p $cachedir $outdir
+	checksum=$(fasta_checksum $infasta)
+fi
 
+# the multi-color cmap, followed by the single enzyme channels, which are encoded in the same pass
+specs=("$enzymes")
+tags=(`for i in ${!array[@]}; do echo ${array[$i]} | cut -d: -f2; done | paste -sd_`)
+single=""
 if [ ${#array[@]} -gt 1 ]; then
-	echo "Encoding with single enzyme channels ..."
+	single="-s"
 	for i in ${!array[@]}; do
-		str=$(echo ${array[$i]} | cut -d: -f2,3);
-		enzyme="$str 1";
-		convert $infasta "$enzyme" $minnicks $minklen $outdir
+		specs+=("$(echo ${array[$i]} | cut -d: -f2,3) 1")
+		tags+=($(echo ${array[$i]} | cut -d: -f2))
 	done
 fi
 
+missing=(${!specs[@]})
+if [[ -n "$checksum" ]]; then
+	fetch_units
+fi
+
+if [ ${#missing[@]} -gt 0 ]; then
+	echo "Encoding with all enzyme channels ..."
+	encode $infasta "$enzymes" $minnicks $minklen $outdir
+	result=$?
+	if [ "$result" -ne 0 ]; then
+		echo 'Error 1' > $stfile
+		exit $result
+	fi
+	if [[ -n "$checksum" ]]; then
+		publish_units
+	fi
+fi
+
 echo "100% done" > $stfile
 
 exit 0
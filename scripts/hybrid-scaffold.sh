@@ -35,7 +35,7 @@ inpath=$3
 enpath=$4
 outdir=$5
 bfill=$(echo $6 | egrep '^[0-9]+$');
-stfile="$outdir/status.txt"
+stfile=$(task_status $outdir)
 
 nthreads=0
 alignconf=""
@@ -127,6 +127,8 @@ for name in ${ordered[@]}; do
 		fi
 	fi
 done
+# the enzymes processed by this run, a single one in a task of an array job
+declare -a tasknames=($(task_enzymes ${names[@]}))
 
 mkdir -p $outdir
 cmapdir="$outdir/CMAPs"
@@ -136,14 +138,14 @@ ancdir="$outdir/anchor"
 echo -e "Beginning to merge NGS cmaps and BN cmaps to construct single-enzyme scaffolds ...";
 stime=$(ntime)
 mkdir -p $cmapdir
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	errbin="$alndir/$name.errbin";
 	ngscmap="$ngsdir/${ngspre}_${name}_$ngssuf.cmap";
 	bngcmap="$bngdir/${bngpre}_${name}_$bngsuf.cmap";
 	if [[ ! -f "$cmapdir/$name.hybrid.cmap" ]]; then
 		mkdir -p $cmapdir/$name
 		if [[ ! -f "$cmapdir/$name/step2.hybrid.cmap" ]]; then
-			check "$merger -f $ngscmap -s $bngcmap -e $errbin -o $cmapdir/$name$mergeconf $shareparams > $cmapdir/$name/cmap_merge.stdout";
+			check "$merger -f $ngscmap -s $bngcmap -e $errbin -o $cmapdir/$name$mergeconf $shareparams $(log_to $cmapdir/$name/cmap_merge.stdout)";
 		fi
 		if [[ -f "$cmapdir/$name/step2.hybrid.cmap" ]]; then
 # get the used IDs
@@ -169,7 +171,7 @@ for name in ${names[@]}; do
 			if [ $bfill -eq 0 ]; then
 				eval "(ln -sf $name/step2.hybrid.cmap $cmapdir/$name.hybrid.cmap)";
 			else
-				eval "$gapfiller -i $cmapdir/$name/step2.hybrid.cmap -a $cmapdir/$name/${bngpre}_${name}.non_used.cmap -o $cmapdir/$name.hybrid -t $nthreads > $cmapdir/$name.filled.log";
+				eval "($gapfiller -i $cmapdir/$name/step2.hybrid.cmap -a $cmapdir/$name/${bngpre}_${name}.non_used.cmap -o $cmapdir/$name.hybrid -t $nthreads $(log_to $cmapdir/$name.filled.log))";
 			fi
 		fi
 	fi
@@ -182,22 +184,23 @@ echo -e "Single-enzyme scaffolds construction completed in $(duration $stime $et
 echo -e "Beginning alignment of NGS cmap to Hybrid CMAP ...";
 stime=$(ntime)
 mkdir -p $ancdir
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	scaffold="$cmapdir/$name.hybrid.cmap";
 	ngscmap="$ngsdir/${ngspre}_${name}_$ngssuf.cmap";
-	if [[ ! -f "$ancdir/$name/$name-NGS.xmap" ]]; then
+	if ! has_file "$ancdir/$name/$name-NGS.xmap"; then
 		mkdir -p $ancdir/$name
-		check "$ngsaligner -r $scaffold -q $ngscmap -o $ancdir/$name/$name-NGS $shareparams$alignconf > $ancdir/$name/$name-NGS-align.log";
+		check "$ngsaligner -r $scaffold -q $ngscmap -o $ancdir/$name/$name-NGS $shareparams$alignconf $(log_to $ancdir/$name/$name-NGS-align.log)";
 	fi
-	if [[ -f "$ancdir/$name/$name-NGS.xmap" ]]; then
-		nhits=`grep -c '^[^#]' $ancdir/$name/$name-NGS.xmap 2>/dev/null | tr -d '\n'`;
+	if has_file "$ancdir/$name/$name-NGS.xmap"; then
+		nhits=`gzip -dcf $(input_files $ancdir/$name/$name-NGS.xmap) 2>/dev/null | grep -c '^[^#]' | tr -d '\n'`;
 		if [[ -n "$nhits" ]]; then
 			refhits=$(count_xmaps $ancdir/$name/$name-NGS.xmap 3);
 			qryhits=$(count_xmaps $ancdir/$name/$name-NGS.xmap 2);
 			printf "%8s alignments found for enzyme $name between %6s NGS contigs and %6s super-contigs.\n" $nhits $qryhits $refhits
 		fi
-		if [[ ! -f "$ancdir/$name.xmap" ]]; then
-			eval "ln -sf $name/$name-NGS.xmap $ancdir/$name.xmap"
+		if ! has_file "$ancdir/$name.xmap"; then
+			xmap=$(basename $(input_files $ancdir/$name/$name-NGS.xmap))
+			eval "ln -sf $name/$xmap $ancdir/$name.${xmap#$name-NGS.}"
 		fi
 	fi
 done
@@ -207,15 +210,15 @@ echo -e "align sequences to hybrid scaffolds completed in $(duration $stime $eti
 echo -e "Beginning alignment of BNG cmap to Hybrid CMAP ...";
 stime=$(ntime)
 mkdir -p $ancdir
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	scaffold="$cmapdir/$name.hybrid.cmap";
 	bngcmap="$bngdir/${bngpre}_${name}_$bngsuf.cmap";
-	if [[ ! -f "$ancdir/$name/$name-BNG.xmap" ]]; then
+	if ! has_file "$ancdir/$name/$name-BNG.xmap"; then
 		mkdir -p $ancdir/$name
-		check "$bngaligner -r $scaffold -q $bngcmap -o $ancdir/$name/$name-BNG $shareparams$alignconf > $ancdir/$name/$name-BNG-align.log";
+		check "$bngaligner -r $scaffold -q $bngcmap -o $ancdir/$name/$name-BNG $shareparams$alignconf $(log_to $ancdir/$name/$name-BNG-align.log)";
 	fi
-	if [[ -f "$ancdir/$name/$name-BNG.xmap" ]]; then
-		nhits=`grep -c '^[^#]' $ancdir/$name/$name-BNG.xmap 2>/dev/null | tr -d '\n'`;
+	if has_file "$ancdir/$name/$name-BNG.xmap"; then
+		nhits=`gzip -dcf $(input_files $ancdir/$name/$name-BNG.xmap) 2>/dev/null | grep -c '^[^#]' | tr -d '\n'`;
 		if [[ -n "$nhits" ]]; then
 			refhits=$(count_xmaps $ancdir/$name/$name-BNG.xmap 3);
 			qryhits=$(count_xmaps $ancdir/$name/$name-BNG.xmap 2);
@@ -228,47 +231,53 @@ echo -e "align Bionano genome maps to hybrid scaffolds completed in $(duration $
 
 echo -e "Merging Hybrid CMAP with NGS not participated in the hybrid scaffold ...";
 stime=$(ntime)
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	scaffold="$cmapdir/$name.hybrid.cmap";
 	ngscmap="$cmapdir/$name/${ngspre}_${name}.non_used.cmap"
-	check "$joiner -f $scaffold -s $ngscmap -o $cmapdir/$name/step2.hybrid-NGS-non_used"
+	if ! has_file "$cmapdir/$name/step2.hybrid-NGS-non_used.cmap"; then
+		check "$joiner -f $scaffold -s $ngscmap -o $cmapdir/$name/step2.hybrid-NGS-non_used"
+	fi
 done
 etime=$(ntime)
 echo -e "Merging Hybrid CMAP with naive NGS CMAP complete in $(duration $stime $etime) s.\n";
 
 echo -e "Merging Hybrid CMAP with BNG CMAP not participated in the hybrid scaffold ...";
 stime=$(ntime)
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	scaffold="$cmapdir/$name.hybrid.cmap";
 	bngcmap="$cmapdir/$name/${bngpre}_${name}.non_used.cmap"
-	check "$joiner -f $scaffold -s $bngcmap -o $cmapdir/$name/step2.hybrid-BNG-non_used"
+	if ! has_file "$cmapdir/$name/step2.hybrid-BNG-non_used.cmap"; then
+		check "$joiner -f $scaffold -s $bngcmap -o $cmapdir/$name/step2.hybrid-BNG-non_used"
+	fi
 done
 etime=$(ntime)
 echo -e "Merging Hybrid CMAP with naive NGS CMAP complete in $(duration $stime $etime) s.\n";
 
 echo -e "Beginning construction of AGP and FASTA file of the scaffolded and unscaffolded sequences ...";
 stime=$(ntime)
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	xmap="$ancdir/$name/$name-NGS.xmap";
 	cmap="$ancdir/$name/$name-NGS_r.cmap";
 	fasta="$indir/$infile";
 	map="$encdir/${encpre}_${name}_key.txt";
 	coord="$ngsdir/${name}_auto_cut_NGS_coord_translation.txt";
-	if [[ ! -f "$fastadir/$name/$name.agp" || ! -f "$fastadir/$name/$name.fasta" ]]; then
+	if [[ ! -f "$fastadir/$name/$name.agp" ]] || ! has_file "$fastadir/$name/$name.fasta"; then
 		mkdir -p $fastadir/$name
-		check "$exporter -i $xmap -c $cmap -s $fasta -m $map -t $coord -o $fastadir/$name/$name > $fastadir/$name/export.log";
+		check "$exporter -i $xmap -c $cmap -s $fasta -m $map -t $coord -o $fastadir/$name/$name $(log_to $fastadir/$name/export.log)";
 	fi
 	if [ -f $fastadir/$name/$name.agp ]; then
 		eval "ln -sf $name/$name.agp $fastadir/$name.agp"
 	fi
-	if [ -f $fastadir/$name/$name.fasta ]; then
-		eval "ln -sf $name/$name.fasta $fastadir/$name.fasta"
+	# the sequences are gzipped when the step compresses its outputs
+	if has_file $fastadir/$name/$name.fasta; then
+		seqs=$(basename $(input_files $fastadir/$name/$name.fasta))
+		eval "ln -sf $name/$seqs $fastadir/$seqs"
 	fi
 done
 etime=$(ntime)
 echo -e "AGP and FASTA generation complete in $(duration $stime $etime) s.\n";
 
-for name in ${names[@]}; do
+for name in ${tasknames[@]}; do
 	if [ ! -f "$cmapdir/$name.hybrid.cmap" ]; then
 		echo 'Error 6' > $stfile
 		exit 1;
@@ -279,11 +288,11 @@ for name in ${names[@]}; do
 		exit 1;
 	fi
 	eval "ln -sf FASTAs/$name.agp $outdir";
-	if [ ! -f $fastadir/$name.fasta ]; then
+	if ! has_file $fastadir/$name.fasta; then
 		echo 'Error 8' > $stfile
 		exit 1;
 	fi
-	eval "ln -sf FASTAs/$name.fasta $outdir";
+	eval "ln -sf FASTAs/$(basename $(input_files $fastadir/$name.fasta)) $outdir";
 done
 
 echo 'Done' > $stfile
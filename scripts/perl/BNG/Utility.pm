@@ -2,8 +2,11 @@ package BNG::Utility;
 
 use strict;
 use Cwd qw(abs_path);
+use File::Basename qw(dirname);
 use POSIX qw[strftime ceil];
 use List::Util qw[min max];
+use Storable qw(nfreeze thaw);
+use Time::HiRes ();
 
 BEGIN{
 	use Exporter ();
@@ -18,6 +21,8 @@ BEGIN{
 			countOverhangLabels
 			readXMap
 			writeXMapFile
+			splitCMapFile
+			mergeAlignmentShards
 			parsingFastMrgStdOut
 			writeAllFastMrgPairs
 			parseConfig
@@ -27,8 +32,22 @@ BEGIN{
 			alignGappedDP
 			compareScore
 			locate
+			makeIntervalIndex
+			searchOverlaps
+			lowerBound
+			upperBound
+			buildSeedIndex
+			searchSeeds
 			calculateLinearParams
 			getPerfectLinearParams
+			inputFile
+			openInput
+			outputFile
+			openOutput
+			spoolFasta
+			readSpooled
+			summarizeFile
+			summarizeLengths
 				);
 	@EXPORT_OK	 = qw();
 	%EXPORT_TAGS = ();
@@ -36,16 +55,185 @@ BEGIN{
 	$VERSION	 = 0.01;
 }
 
+# leading bytes of the binary sidecars of a CMAP/XMAP/FASTA file
+my $INDEX_MAGIC = "MOMSIDX1";
+# the output folder of the pipeline, the only place where sidecars are kept
+my $SIDECAR_DIR;
+
+##
+# path of a binary sidecar of a file: idx indexing its maps, stats keeping its summary; only the files under
+# the output folder of the pipeline ($MOMS_OUTPUT) have sidecars, so that the folders of the inputs given
+# by the user are never written to, and the files elsewhere are parsed without one
+##
+sub sidecarFile
+{
+	my ($file, $kind) = @_;
+	return undef if($ENV{MOMS_NO_INDEX} or !$ENV{MOMS_OUTPUT} or $file eq "-");
+	$SIDECAR_DIR = abs_path($ENV{MOMS_OUTPUT}) unless(defined $SIDECAR_DIR);
+	my $dir = abs_path(dirname($file));
+	return undef unless(defined $SIDECAR_DIR and defined $dir and index("$dir/", "$SIDECAR_DIR/") == 0);
+	return "$file.$kind";
+}
+
+##
+# remove the sidecars of a file which is written again
+##
+sub removeSidecars
+{
+	my ($file) = @_;
+	unlink(grep { defined $_ } map { sidecarFile($file, $_) } ("idx", "stats"));
+}
+
+##
+# identity of a file, a sidecar is only valid for the exact file it was built from
+##
+sub fileStamp
+{
+	my ($file) = @_;
+	my @st = Time::HiRes::stat($file);
+	return (@st) ? join(":", @st[0, 1, 7, 9]) : "";
+}
+
+##
+# open a sidecar of a file and return its handle and metadata, or nothing if it is missing, stale or of another type
+##
+sub openSidecar
+{
+	my ($file, $kind, $type) = @_;
+	my $path = sidecarFile($file, $kind);
+	return () unless(defined $path and -f $path);
+	my $fh;
+	open($fh, "<:mmap", $path) or open($fh, "<:raw", $path) or return ();
+	my $buf = "";
+	if(read($fh, $buf, 16) != 16){
+		close $fh;
+		return ();
+	}
+	my ($magic, $pos) = unpack("a8 Q<", $buf);
+	my $meta;
+	if($magic eq $INDEX_MAGIC and seek($fh, $pos, 0)){
+		local $/;
+		$buf = <$fh>;
+		$meta = eval { thaw($buf) };
+	}
+	unless(defined $meta and $meta->{type} eq $type and $meta->{stamp} eq fileStamp($file)){
+		close $fh;
+		return ();
+	}
+	return ($fh, $meta);
+}
+
+##
+# write a sidecar of a file: the frozen records, if any, followed by the metadata with the index of their offsets
+##
+sub writeSidecar
+{
+	my ($file, $kind, $type, $stamp, $meta, $ids, $records) = @_;
+	my $path = sidecarFile($file, $kind);
+	return 0 if(!defined $path or $stamp eq "");
+	my $tmp = "$path.$$";
+	open(my $fh, ">:raw", $tmp) or return 0;
+	print $fh pack("a8 Q<", $INDEX_MAGIC, 0);
+	my $pos = 16;
+	my %offsets = ();
+	foreach my $id (@{$ids || []}){
+		next if(exists $offsets{$id});
+		my $data = nfreeze($records->{$id});
+		print $fh $data;
+		$offsets{$id} = [$pos, length($data)];
+		$pos += length($data);
+	}
+	$meta->{type} = $type;
+	$meta->{stamp} = $stamp;
+	$meta->{offsets} = \%offsets;
+	print $fh nfreeze($meta);
+	seek($fh, 0, 0);
+	print $fh pack("a8 Q<", $INDEX_MAGIC, $pos);
+	if(close($fh) and rename($tmp, $path)){
+		return 1;
+	}
+	unlink $tmp;
+	return 0;
+}
+
+##
+# open the index of the maps of a file and return its handle and metadata, or nothing if it is missing or stale
+##
+sub openMapIndex
+{
+	my ($file, $type) = @_;
+	return openSidecar($file, "idx", $type);
+}
+
+##
+# fetch one record of a sidecar by its offset and length
+##
+sub readMapRecord
+{
+	my ($fh, $loc) = @_;
+	my $buf = "";
+	seek($fh, $loc->[0], 0);
+	read($fh, $buf, $loc->[1]) == $loc->[1] or die("ERROR: truncated index record\n");
+	return thaw($buf);
+}
+
+##
+# write the index of the maps of a file
 ##
-# read a CMAP file
+sub writeMapIndex
+{
+	my ($file, $type, $stamp, $meta, $ids, $records) = @_;
+	return writeSidecar($file, "idx", $type, $stamp, $meta, $ids, $records);
+}
+
+##
+# tell whether a map id is selected by a set of ids in include or exclude mode
+##
+sub isSelected
+{
+	my ($id, $ids, $flag) = @_;
+	return 1 unless(defined $ids);
+	return ($flag =~ /excl/) ? !$ids->{$id} : $ids->{$id};
+}
+
+##
+# read a CMAP file, optionally only the maps whose ids are included in (or excluded from) the given ones
 ##
 sub readCMap
 {
-	my ($cmap_file) = @_;
+	my ($cmap_file, $ids, $flag) = @_;
+	$cmap_file = inputFile($cmap_file);
+	$flag = "include" unless(defined $flag);
+	if (ref $ids eq "ARRAY") {
+		my %ids = map { $_ => 1 } @$ids;
+		$ids = \%ids;
+	}
+	my ($idx, $meta) = openMapIndex($cmap_file, "cmap");
+	if(defined $meta){
+		# only thaw the maps asked for from the sidecar
+		my $cmap = {};
+		$cmap->{"FileName"} = abs_path($cmap_file);
+		foreach my $field (keys %{$meta->{fields}}){
+			$cmap->{$field} = $meta->{fields}->{$field};
+		}
+		my $numcontig = 0;
+		my @contigLength = ();
+		for (my $i = 0; $i < scalar(@{$meta->{ids}}); $i++){
+			my $id = $meta->{ids}->[$i];
+			next unless(isSelected($id, $ids, $flag));
+			$cmap->{contigs}->{$id} = readMapRecord($idx, $meta->{offsets}->{$id}) unless(exists $cmap->{contigs}->{$id});
+			$numcontig += 1;
+			push(@contigLength, $meta->{lengths}->[$i]);
+		}
+		close $idx;
+		$cmap->{nContigs} = $numcontig;
+		return ($cmap, $numcontig, \@contigLength);
+	}
+	my $stamp = fileStamp($cmap_file);
 	# read cmap file (first time to see if there is the keyword "ChimQuality")
-	open(IN, "$cmap_file") or die ("ERROR: Unable to read in file $cmap_file: $!\n");
+	my $in = openInput($cmap_file);
 	my $foundChimQuality = 0;
-	while (my $line = <IN>)	{
+	while (my $line = <$in>)	{
 		chomp $line;	$line =~ s/\r//g;
 		if ($line =~ /^#/)	{
 			# header line
@@ -55,13 +243,14 @@ sub readCMap
 			}
 		} # if line
 	} # while line
-	close IN;
+	close $in;
 	# then read it again, will read in according whether ChimQuality is there or not
 	
 	my $cmap={};
 	my $c_cmapId = 0;
 	my $numcontig = 0;
 	my @contigLength = ();
+	my @contigIds = ();
 	$cmap->{"FileName"} = abs_path($cmap_file);
 	my @header = ();
 	my @data_name = ();
@@ -69,9 +258,9 @@ sub readCMap
 	my $cmap_version = "";
 	my $nchannels;
 	my %channels = ();
-	open(IN, "$cmap_file") or die ("ERROR: Unable to read in file $cmap_file: $!\n");
+	$in = openInput($cmap_file);
 	my $NUM_C_LIMITED = ($foundChimQuality == 1) ? (10) : (9);	# assumption: column 10 has ChimQuality, if it is present
-	while (my $line = <IN>)	{
+	while (my $line = <$in>)	{
 		chomp $line;	$line =~ s/\r//g;
 		if ($line =~ /^#/)	{
 			# header line
@@ -127,6 +316,7 @@ sub readCMap
 			# ContigLength:
 			$cmap->{contigs}->{$c_cmapId}->{$data_name[1]} = $d_items[1];
 			push(@contigLength, $d_items[1]);
+			push(@contigIds, $c_cmapId);
 			# NumSites:
 			$cmap->{contigs}->{$c_cmapId}->{$data_name[2]} = $d_items[2];
 			
@@ -142,7 +332,24 @@ sub readCMap
 			} # for i
 		} # if same cmap id
 	} # while line
-	close IN;
+	close $in;
+	# keep the parsed maps in a sidecar, so that the following readers can skip the text
+	my %fields = map { $_ => $cmap->{$_} } grep { exists $cmap->{$_} } qw(headers dataName dataType channels version);
+	writeMapIndex($cmap_file, "cmap", $stamp, {fields => \%fields, ids => \@contigIds, lengths => \@contigLength}, \@contigIds, $cmap->{contigs});
+	if(defined $ids){
+		my @selected = ();
+		$numcontig = 0;
+		for (my $i = 0; $i < scalar(@contigIds); $i++){
+			if(isSelected($contigIds[$i], $ids, $flag)){
+				$numcontig += 1;
+				push(@selected, $contigLength[$i]);
+			}
+			else{
+				delete $cmap->{contigs}->{$contigIds[$i]};
+			}
+		}
+		@contigLength = @selected;
+	}
 	$cmap->{nContigs} = $numcontig;
 	return ($cmap, $numcontig, \@contigLength);
 }
@@ -168,6 +375,7 @@ sub writeCMapFile
 	#print "   write a cmap file $cmap_file ...\n";
 	
 	open CMF, ">$cmap_file" or die ("ERROR: Unable to write to file " + $cmap_file + " - " + $!);	
+	removeSidecars($cmap_file);
 	
 	my @data_name = @{ $cmap->{dataName} };
 	my @cmapIds = sort {$a <=> $b} keys %{ $cmap->{contigs} };
@@ -218,6 +426,7 @@ sub writeCMapFile
 
 ##
 # create a new cmap with some cmap ids are excluded:
+# the cmap may also be given as a file name, then only the selected maps are read
 ##
 sub getSubsetCMap
 {
@@ -228,6 +437,9 @@ sub getSubsetCMap
 		my %givenCMapID = map { $_ => 1 } @$givenCMapID_href;
 		$givenCMapID_href = \%givenCMapID;
 	}
+	if (ref $cmap ne "HASH") {
+		($cmap) = readCMap($cmap, $givenCMapID_href, $flag);
+	}
     my $allEID = join(",", keys %{$givenCMapID_href});	
 	my $sCMap={};
 	# - no header - $sCMap->{headers}
@@ -342,13 +554,25 @@ sub shiftCMapIds
 sub readXMap
 {
 	my ($xmap_file) = @_;
+	$xmap_file = inputFile($xmap_file) unless($xmap_file eq "-");
+	my ($idx, $meta) = openMapIndex($xmap_file, "xmap");
+	if(defined $meta){
+		my $xmap = {};
+		$xmap->{"FileName"} = abs_path($xmap_file);
+		foreach my $field (keys %{$meta->{fields}}){
+			$xmap->{$field} = $meta->{fields}->{$field};
+		}
+		$xmap->{hits} = readMapRecord($idx, $meta->{offsets}->{hits});
+		close $idx;
+		return ($xmap);
+	}
+	my $stamp = fileStamp($xmap_file);
 	my $in;
 	if($xmap_file eq "-"){
 		$in = \*STDIN;
 	}
 	else{
-		open XMF, "<$xmap_file" or die ("ERROR: Unable to read in file " + $xmap_file + " - " + $!);
-		$in = \*XMF;
+		$in = openInput($xmap_file);
 	}
 	my $xmap={};
 	$xmap->{"FileName"} = abs_path($xmap_file);
@@ -419,6 +643,9 @@ sub readXMap
 	}
 	$xmap->{totalHits} = $numm;
 	close $in;
+	# the alignments are walked as whole columns by every reader, so they are kept as a single record
+	my %fields = map { $_ => $xmap->{$_} } qw(headers dataName dataType version nchannels totalHits);
+	writeMapIndex($xmap_file, "xmap", $stamp, {fields => \%fields}, ["hits"], {hits => $xmap->{hits}}) if(defined $xmap->{hits});
 
 	return ($xmap);	
 }
@@ -434,8 +661,7 @@ sub writeXMapFile
 
 	my $out;
 	if(defined $xmap_file){
-		open XMF, ">$xmap_file" or die ("ERROR: Unable to write in file " + $xmap_file + " - " + $!);
-		$out = \*XMF;
+		$out = openOutput($xmap_file);
 	}
 	else{
 		$out = \*STDOUT;
@@ -472,6 +698,150 @@ sub writeXMapFile
 	close $out;
 }
 
+##
+# split a CMAP file into shards of whole maps balanced by their number of labels,
+# the shards are written to ${prefix}_<i>.cmap with the header lines of the source
+##
+sub splitCMapFile
+{
+	my ($cmap_file, $nshards, $prefix) = @_;
+
+	my @headers = ();
+	my %lines = ();
+	my %nsites = ();
+	my @ids = ();
+	open(IN, "$cmap_file") or die ("ERROR: Unable to read in file $cmap_file: $!\n");
+	while (my $line = <IN>)	{
+		if ($line =~ /^#/)	{
+			push(@headers, $line);
+			next;
+		}
+		next if ($line !~ /^\s*(\d+)\s/);
+		my $id = $1;
+		push(@ids, $id) unless(exists $lines{$id});
+		push(@{$lines{$id}}, $line);
+		$nsites{$id}++;
+	}
+	close IN;
+	$nshards = scalar(@ids) if($nshards > scalar(@ids));
+	$nshards = 1 if($nshards < 1);
+
+	# the largest maps first, each to the least loaded shard
+	my @loads = (0) x $nshards;
+	my @members = map { [] } (1..$nshards);
+	foreach my $id (sort { $nsites{$b} <=> $nsites{$a} or $a <=> $b } @ids){
+		my $k = 0;
+		for (my $i = 1; $i < $nshards; $i++)	{
+			$k = $i if($loads[$i] < $loads[$k]);
+		}
+		push(@{$members[$k]}, $id);
+		$loads[$k] += $nsites{$id};
+	}
+	my @files = ();
+	for (my $i = 0; $i < $nshards; $i++)	{
+		my $file = "${prefix}_" . ($i + 1) . ".cmap";
+		open(OUT, ">$file") or die ("ERROR: Unable to write in file $file: $!\n");
+		print OUT @headers;
+		print OUT @{$lines{$_}} foreach (sort { $a <=> $b } @{$members[$i]});
+		close OUT;
+		removeSidecars($file);
+		push(@files, $file);
+	}
+	return \@files;
+}
+
+##
+# merge the .xmap, _r.cmap and _q.cmap files of the alignments against the shards of a reference
+# into those of a single alignment against the whole reference; the maps are ordered by their IDs,
+# the alignments by their reference IDs and renumbered, and if $bestRef is set only the alignments
+# of each query to its best reference (by confidence) are kept; this approximates -BestRef 1 of an
+# unsharded RefAligner run, whose choice among the references of different shards (and its ties)
+# can differ, as can the alignments found against a smaller reference
+##
+sub mergeAlignmentShards
+{
+	my ($prefixes, $outprefix, $bestRef) = @_;
+
+	my (@headers, @hits);
+	my %rmaps = ();
+	my %qmaps = ();
+	my ($rheaders, $qheaders);
+	foreach my $prefix (@{$prefixes}){
+		open(IN, "$prefix.xmap") or die ("ERROR: Unable to read in file $prefix.xmap: $!\n");
+		my @lines = <IN>;
+		close IN;
+		my @shardHeaders = grep { /^#/ } @lines;
+		@headers = @shardHeaders unless(@headers);
+		push(@hits, map { [split(/\t/, $_, 4)] } grep { /^\s*\d/ } @lines);
+		foreach my $type ("r", "q"){
+			my $maps = ($type eq "r") ? \%rmaps : \%qmaps;
+			my %seen = ();
+			# a shard without any alignment may come without its maps
+			next unless(-f "${prefix}_$type.cmap");
+			open(IN, "${prefix}_$type.cmap") or die ("ERROR: Unable to read in file ${prefix}_$type.cmap: $!\n");
+			my @mapHeaders = ();
+			while (my $line = <IN>)	{
+				if ($line =~ /^#/)	{
+					push(@mapHeaders, $line);
+					next;
+				}
+				next if ($line !~ /^\s*(\d+)\s/);
+				# a query map aligned in several shards is kept once
+				next if (exists $maps->{$1} and not $seen{$1});
+				$seen{$1} = 1;
+				push(@{$maps->{$1}}, $line);
+			}
+			close IN;
+			if ($type eq "r")	{
+				$rheaders = \@mapHeaders unless(defined $rheaders);
+			}
+			else	{
+				$qheaders = \@mapHeaders unless(defined $qheaders);
+			}
+		}
+	}
+	if ($bestRef)	{
+		my %best = ();
+		foreach my $hit (@hits){
+			my $confidence = (split(/\t/, $hit->[3]))[5];
+			$best{$hit->[1]} = [$hit->[2], $confidence] if(!exists $best{$hit->[1]} or $confidence > $best{$hit->[1]}->[1]);
+		}
+		@hits = grep { $_->[2] == $best{$_->[1]}->[0] } @hits;
+		my %used = map { $_->[2] => 1 } @hits;
+		delete $rmaps{$_} foreach (grep { !$used{$_} } keys %rmaps);
+		%used = map { $_->[1] => 1 } @hits;
+		delete $qmaps{$_} foreach (grep { !$used{$_} } keys %qmaps);
+	}
+	# every reference map is in a single shard, so a stable sort keeps the order of its alignments
+	@hits = sort { $a->[2] <=> $b->[2] } @hits;
+
+	my $out = openOutput("$outprefix.xmap");
+	foreach my $line (@headers){
+		if ($line =~ /^#\s+Reference Maps From:/)	{
+			print $out "# Reference Maps From:\t${outprefix}_r.cmap\n";
+		} elsif ($line =~ /^#\s+Query Maps From:/)	{
+			print $out "# Query Maps From:\t${outprefix}_q.cmap\n";
+		} else	{
+			print $out $line;
+		}
+	}
+	for (my $i = 0; $i <= $#hits; $i++)	{
+		print $out join("\t", $i + 1, @{$hits[$i]}[1..3]);
+	}
+	close $out;
+	foreach my $type ("r", "q"){
+		my ($maps, $mapHeaders) = ($type eq "r") ? (\%rmaps, $rheaders) : (\%qmaps, $qheaders);
+		$out = openOutput("${outprefix}_$type.cmap");
+		foreach my $line (@{$mapHeaders}){
+			$line = "# Number of Consensus Maps:\t" . scalar(keys %{$maps}) . "\n" if($line =~ /^#\s+Number of Consensus Maps:/);
+			print $out $line;
+		}
+		print $out @{$maps->{$_}} foreach (sort { $a <=> $b } keys %{$maps});
+		close $out;
+	}
+	return scalar(@hits);
+}
+
 ##
 # count number of labels extending outside a region:
 ##
@@ -479,17 +849,11 @@ sub countOverhangLabels
 {
 	my ($cmap, $cmapId, $leftPosition, $rightPosition) = @_;
 
-	my ($numL, $numR) = (0, 0);
 	my $Position = $cmap->{contigs}->{$cmapId}->{Position};
 	my $totalNS = $cmap->{contigs}->{$cmapId}->{NumSites};
-	for (my $i=0; $i<$totalNS; $i++) { 
-		if ( $Position->[$i] < $leftPosition ) { 
-			$numL++;
-		};
-		if ( $Position->[$i] > $rightPosition ) { 
-			$numR++;
-		};
-	}
+	# the labels are sorted by position
+	my $numL = lowerBound($Position, $leftPosition, $totalNS);
+	my $numR = $totalNS - upperBound($Position, $rightPosition, $totalNS);
 	return ($numL, $numR);
 }
 
@@ -650,6 +1014,10 @@ sub makeParams
 	return join(" ", @array);
 }
 
+##
+# align two arrays of label positions by dynamic programming, the scores are kept in flat arrays
+# indexed by $i * ($n + 1) + $j and only the predecessors within the indel budget are visited
+##
 sub alignDP
 {
 	my ($positions1, $positions2, $bidirectional) = @_;
@@ -657,84 +1025,71 @@ sub alignDP
 	my $delta = 3; # number of successive label mismatches allowed
 	my $alpha = 0.05; # expected variation ratio of fragment lengths
 # initialization
-	my @scores = (); # three dimentional score including number of matched fragments, matching scores, and the number of indel
-	my ($i, $j, $k, $l);
+	my ($i, $j, $k, $l, $x);
 	my ($m, $n) = ($#{$positions1}, $#{$positions2});
 	my $maxIndel = max(ceil(min($m, $n) * $alpha), (defined $bidirectional ? 3 : 2));
-	$scores[0][0] = [0, 0, 0];
+	my $w = $n + 1;
+	my @nls = (); # number of matched fragments
+	my @scs = (); # matching scores
+	my @nis = (); # number of indels
+	my @bps = (); # back pointers as flat indices
+	($nls[0], $scs[0], $nis[0]) = (0, 0, 0);
+	my ($iRowVal, $iColVal) = (9**9, 0);
+	my $iColStart = $m + 1;
 	if(defined $bidirectional){
-		$j = 1;
-		my $iRowVal = ($bidirectional & 0x1) ? 0 : 9**9;
-		# first row
-		while($j <= $n - $m){
-			$scores[0][$j++] = [0, 0, 0];
-		}
-		while($j <= $n){
-			$scores[0][$j++] = [0, $iRowVal, 0];
-		}
-		my $iColVal= ($bidirectional & 0x2) ? 0 : 9**9;
-		# first column
-		$i = 1;
-		while($i <= $m - $n){
-			$scores[$i++][0] = [0, 0, 0];
-		}
-		while($i <= $m){
-			$scores[$i++][0] = [0, $iColVal, 0];
-		}
+		$iRowVal = ($bidirectional & 0x1) ? 0 : 9**9;
+		$iColVal = ($bidirectional & 0x2) ? 0 : 9**9;
+		$iColStart = $m - $n + 1;
 	}
-	else{
-		# first row
-		$j = 1;
-		while($j <= $n - $m){
-			 $scores[0][$j++] = [0, 0, 0];
-		}
-		while($j <= $n){
-			$scores[0][$j++] = [0, 9**9, 0];
-		}
-		# first column
-		for($i=1; $i<=$m; $i++){
-			$scores[$i][0] = [0, 0, 0];
-		}
+	# first row
+	for($j=1; $j<=$n; $j++){
+		($nls[$j], $scs[$j], $nis[$j]) = (0, ($j <= $n - $m) ? 0 : $iRowVal, 0);
+	}
+	# first column
+	for($i=1; $i<=$m; $i++){
+		($nls[$i*$w], $scs[$i*$w], $nis[$i*$w]) = (0, ($i < $iColStart) ? 0 : $iColVal, 0);
 	}
-	my @backPointer = ();
 	my ($q, $r);
 	my ($dev, $nl, $nid, $sc);
-	my $score;
+	my ($bnl, $bsc, $bni, $bbp);
 # fill the score matrix
 	for($i=1; $i<=$m; $i++){
+		my $kStart = max($i-$delta-1, $i-1-$maxIndel, 0);
 		for($j=1; $j<=$n; $j++){
-			$scores[$i][$j] = [0, 9**9, 0];
+			($bnl, $bsc, $bni, $bbp) = (0, 9**9, 0, undef);
 			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
-			for($k=max($i-$delta-1, 0); $k<=$i-1; $k++){
+			for($k=$kStart; $k<=$i-1; $k++){
 				$q = $positions1->[$i] - $positions1->[$k];
-				for($l=max($j-$delta-1, 0); $l<=$j-1; $l++){
-					$score = $scores[$k][$l];
+				for($l=max($j-$delta-1, $j-1-$maxIndel+($i-$k-1), 0); $l<=$j-1; $l++){
+					$x = $k * $w + $l;
 					$nid = ($i - $k - 1) + ($j - $l - 1);
-					next if($score->[2] + $nid > $maxIndel);
+					next if($nis[$x] + $nid > $maxIndel);
 					$r = $positions2->[$j] - $positions2->[$l];
 					$dev = abs(($q - $r) / ($q + $r));
-					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
-					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * $nid;
-					if(compareScore([$nl, $sc], $scores[$i][$j]) > 0){
-						$scores[$i][$j] = [$nl, $sc, $score->[2] + $nid];
-						$backPointer[$i][$j] = [$k, $l];
+					$nl = (($dev <= $alpha) ? ($nls[$x] + 1) : $nls[$x]);
+					$sc = $scs[$x] + ($dev / $alpha) ** 2 + $delta * $nid;
+					if($nl > $bnl or ($nl == $bnl and $sc < $bsc)){
+						($bnl, $bsc, $bni, $bbp) = ($nl, $sc, $nis[$x] + $nid, $x);
 					}
 				}
 			}
+			$x = $i * $w + $j;
+			($nls[$x], $scs[$x], $nis[$x]) = ($bnl, $bsc, $bni);
+			$bps[$x] = $bbp;
 		}
 	}
-	my $maxScore = $scores[$m][$n];
+	my $maxScore = [$nls[$m*$w+$n], $scs[$m*$w+$n]];
 	my $pointer = [$m, $n];
 	for($j=$n-1; $j>=0; $j--){
-		if(compareScore($maxScore, $scores[$m][$j]) < 0){
-			$maxScore = $scores[$m][$j];
+		if(compareScore($maxScore, [$nls[$m*$w+$j], $scs[$m*$w+$j]]) < 0){
+			$maxScore = [$nls[$m*$w+$j], $scs[$m*$w+$j]];
 			$pointer = [$m, $j];
 		}
 	}
 	if( ($m > $n) or ($bidirectional & 0x01) ){
 		for($i=$m-1; $i>=0; $i--){
-			if(compareScore($maxScore, $scores[$i][$n]) < 0){
-				$maxScore = $scores[$i][$n];
+			if(compareScore($maxScore, [$nls[$i*$w+$n], $scs[$i*$w+$n]]) < 0){
+				$maxScore = [$nls[$i*$w+$n], $scs[$i*$w+$n]];
 				$pointer = [$i, $n];
 			}
 		}
@@ -742,11 +1097,11 @@ sub alignDP
 	my @alignment = ();
 	my $score = 0;
 	if($maxScore->[0] > 0){
-		my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		my $prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 		my @subAlignments = ();
 		my $status = 0;
 		while(defined $prevPointer){
-			if($scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0]){
+			if($nls[($pointer->[0])*$w+($pointer->[1])] > $nls[($prevPointer->[0])*$w+($prevPointer->[1])]){
 				if($status == 0){
 					unshift(@subAlignments, [$pointer]);
 				}
@@ -757,10 +1112,10 @@ sub alignDP
 				$status = 0;
 			}
 			$pointer = $prevPointer;
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 		}
 # find the optimal sub-alignment first
-		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scores[$subAlignments[$a]->[-1]->[0]][$subAlignments[$a]->[-1]->[1]]->[1] - $scores[$subAlignments[$a]->[0]->[0]][$subAlignments[$a]->[0]->[1]]->[1] <=> $scores[$subAlignments[$b]->[-1]->[0]][$subAlignments[$b]->[-1]->[1]]->[1] - $scores[$subAlignments[$b]->[0]->[0]][$subAlignments[$b]->[0]->[1]]->[1] } 0..$#subAlignments;
+		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scs[($subAlignments[$a]->[-1]->[0])*$w+($subAlignments[$a]->[-1]->[1])] - $scs[($subAlignments[$a]->[0]->[0])*$w+($subAlignments[$a]->[0]->[1])] <=> $scs[($subAlignments[$b]->[-1]->[0])*$w+($subAlignments[$b]->[-1]->[1])] - $scs[($subAlignments[$b]->[0]->[0])*$w+($subAlignments[$b]->[0]->[1])] } 0..$#subAlignments;
 		@alignment = @{$subAlignments[$sorted[0]]};
 
 # then extend the optimal sub-alignment
@@ -769,11 +1124,11 @@ sub alignDP
 			my $subAlign = $subAlignments[$k];
 			my $safeGuardPointer = $subAlign->[-1];
 			$pointer = $alignment[0];
-			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			last if($scs[($pointer->[0])*$w+($pointer->[1])] - $scs[($safeGuardPointer->[0])*$w+($safeGuardPointer->[1])] > 16);
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 			while($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1]){
 				unshift(@alignment, $prevPointer);
-				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+				$prevPointer = pointerAt(\@bps, $w, $prevPointer->[0], $prevPointer->[1]);
 			}
 			unshift(@alignment, @{$subAlign});
 			$k--;
@@ -783,11 +1138,11 @@ sub alignDP
 			my @subAlign = @{$subAlignments[$k]};
 			my $safeGuardPointer = $alignment[-1];
 			$pointer = $subAlign[0];
-			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			last if($scs[($pointer->[0])*$w+($pointer->[1])] - $scs[($safeGuardPointer->[0])*$w+($safeGuardPointer->[1])] > 16);
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 			while($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1]){
 				unshift(@subAlign, $prevPointer);
-				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+				$prevPointer = pointerAt(\@bps, $w, $prevPointer->[0], $prevPointer->[1]);
 			}
 			push(@alignment, @subAlign);
 			$k++;
@@ -817,11 +1172,15 @@ sub alignDP
 				return ([], 0);
 			}
 		}
-		$score =  $scores[$alignment[-1]->[0]][$alignment[-1]->[1]]->[1] - $scores[$alignment[0]->[0]][$alignment[0]->[1]]->[1];
+		$score =  $scs[($alignment[-1]->[0])*$w+($alignment[-1]->[1])] - $scs[($alignment[0]->[0])*$w+($alignment[0]->[1])];
 	}
 	return (\@alignment, $score);
 }
 
+
+##
+# align two arrays of label positions for the longest chain of matched fragments, with the scores in flat arrays as alignDP
+##
 sub alignLCS
 {
 	my ($positions1, $positions2) = @_;
@@ -829,54 +1188,59 @@ sub alignLCS
 	my $delta = 3; # number of successive label mismatches allowed
 	my $alpha = 0.05; # maximum allowed deviation dominated by total length for a pair of fragments to be regarded as matching
 # initialization
-	my @scores = (); # two dimentional score including number of matched labels and matching scores
-	my ($i, $j, $k, $l);
+	my ($i, $j, $k, $l, $x);
 	my ($m, $n) = ($#{$positions1}, $#{$positions2});
+	my $w = $n + 1;
+	my @nls = (); # number of matched labels
+	my @scs = (); # matching scores
+	my @bps = (); # back pointers as flat indices
 	for($j=0; $j<=$n; $j++){ # first row
-		$scores[0][$j] = [0, 0];
+		($nls[$j], $scs[$j]) = (0, 0);
 	}
 	for($i=1; $i<=$m; $i++){ # first column
-		$scores[$i][0] = [0, 0];
+		($nls[$i*$w], $scs[$i*$w]) = (0, 0);
 	}
-	my @backPointer = ();
 	my ($q, $r);
 	my ($dev, $nl, $sc);
-	my $score;
+	my ($bnl, $bsc, $bbp);
 # fill the score matrix
 	for($i=1; $i<=$m; $i++){
+		my $kStart = max($i-$delta-1, 0);
 		for($j=1; $j<=$n; $j++){
-			$scores[$i][$j] = [0, 9**9];
+			($bnl, $bsc, $bbp) = (0, 9**9, undef);
 			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
-			for($k=max($i-$delta-1, 0); $k<=$i-1; $k++){
+			for($k=$kStart; $k<=$i-1; $k++){
 				$q = $positions1->[$i] - $positions1->[$k];
 				for($l=max($j-$delta-1, 0); $l<=$j-1; $l++){
+					$x = $k * $w + $l;
 					$r = $positions2->[$j] - $positions2->[$l];
 					$dev = abs(($q - $r) / ($q + $r));
-					$score = $scores[$k][$l];
-					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
-					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * (($i - $k - 1) + ($j - $l - 1));
-					if($sc < $scores[$i][$j]->[1]){
-						$scores[$i][$j] = [$nl, $sc];
-						$backPointer[$i][$j] = [$k, $l];
+					$nl = (($dev <= $alpha) ? ($nls[$x] + 1) : $nls[$x]);
+					$sc = $scs[$x] + ($dev / $alpha) ** 2 + $delta * (($i - $k - 1) + ($j - $l - 1));
+					if($sc < $bsc){
+						($bnl, $bsc, $bbp) = ($nl, $sc, $x);
 					}
 				}
 			}
+			$x = $i * $w + $j;
+			($nls[$x], $scs[$x]) = ($bnl, $bsc);
+			$bps[$x] = $bbp;
 		}
 	}
 	my @alignment = ();
 	my $k = 1;
-	my $maxScore = $scores[$m][$k];
+	my $maxScore = [$nls[$m*$w+$k], $scs[$m*$w+$k]];
 	for($j=2; $j<=$n; $j++){
-		if(compareScore($maxScore, $scores[$m][$j]) < 0){
+		if(compareScore($maxScore, [$nls[$m*$w+$j], $scs[$m*$w+$j]]) < 0){
 			$k = $j;
-			$maxScore = $scores[$m][$k];
+			$maxScore = [$nls[$m*$w+$k], $scs[$m*$w+$k]];
 		}
 	}
 	my $pointer = [$m, $k];
-	my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+	my $prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 	my $status = 0;
 	while(defined $prevPointer){
-		if($scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0]){
+		if($nls[($pointer->[0])*$w+($pointer->[1])] > $nls[($prevPointer->[0])*$w+($prevPointer->[1])]){
 			unshift(@alignment, $pointer) if($status == 0);
 			unshift(@alignment, $prevPointer);
 			$status++;
@@ -885,11 +1249,16 @@ sub alignLCS
 			$status = 0;
 		}
 		$pointer = $prevPointer;
-		$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 	}
 	return \@alignment;
 }
 
+
+##
+# align label positions to a gapped array of label positions whose gap starts before index $mi,
+# with the scores in flat arrays as alignDP
+##
 sub alignGappedDP
 {
 	my ($positions1, $positions2, $mi) = @_;
@@ -898,19 +1267,19 @@ sub alignGappedDP
 	my $alpha = 0.05; # expected variation ratio of fragment lengths
 	my $theta = 0.25; # expected variation ratio of gap size
 # initialization
-	my @scores = (); # three dimentional score including number of matched fragments, matching scores, and the number of indel
-	my ($i, $j, $k, $l);
+	my ($i, $j, $k, $l, $x, $y);
 	my ($m, $n1, $n) = ($#{$positions1}, $mi-1, $#{$positions2});
 	my $n2 = $n - $mi;
 	my $maxIndel = ceil(min($m, $n1) * $alpha); # POSITIVELY related to SENSITIVIEY
-	$scores[0][0] = [0, 0, 0];
+	my $w = $n + 1;
+	my @nls = (); # number of matched fragments
+	my @scs = (); # matching scores
+	my @nis = (); # number of indels
+	my @bps = (); # back pointers as flat indices
+	($nls[0], $scs[0], $nis[0]) = (0, 0, 0);
 	# first column
-	$i = 1;
-	while($i <= $m - $n1){
-		$scores[$i++][0] = [0, 0, 0];
-	}
-	while($i <= $m){
-		$scores[$i++][0] = [0, 9**9, 0];
+	for($i=1; $i<=$m; $i++){
+		($nls[$i*$w], $scs[$i*$w], $nis[$i*$w]) = (0, ($i <= $m - $n1) ? 0 : 9**9, 0);
 	}
 	my @rowIndex = (0);
 	my @rowScore = (0);
@@ -926,10 +1295,9 @@ sub alignGappedDP
 		$colIndex[$j] = $colIndex[$j-1] + countScore($fragSize);
 		$colScore[$j] = $colScore[$j-1] + sizeScore($fragSize);
 	}
-	my @backPointer = ();
 	my ($q, $r);
 	my ($dev, $nl, $nid, $sc, $rnid, $cnid);
-	my $score;
+	my ($bnl, $bsc, $bni, $bbp);
 	my $pointer;
 	my ($minI, $minJ, $default) = (1, 0, 0);
 # fill the score matrix
@@ -938,23 +1306,26 @@ sub alignGappedDP
 			$r = $positions2->[$mi] - $positions2->[$mi-1];
 			$minI = locate($positions1, $positions1->[0] + $r * (1 - $theta));
 			$minI = 1 if($minI < 1);
-			$scores[$minI-1][$j] = [0, 9**9, 0];
+			$x = ($minI-1) * $w + $j;
+			($nls[$x], $scs[$x], $nis[$x]) = (0, 9**9, 0);
 			for($i=$minI; $i<=$m; $i++){
-				$scores[$i][$mi] = [0, 9**9, 0];
+				($bnl, $bsc, $bbp) = (0, 9**9, undef);
 				my ($pos1, $pos2) = ($positions1->[$i] - $r * (1 + $theta), $positions1->[$i] - $r * (1 - $theta));
 				my $iStart = locate($positions1, $pos1);
 				my $iEnd = locate($positions1, $pos2);
 				for($k=$iStart; $k<=$iEnd; $k++){
-					$score = $scores[$k][$n1];
+					$y = $k * $w + $n1;
 					$q = $positions1->[$i] - $positions1->[$k];
 					$dev = abs(($q - $r) / ($q + $r));
-					$nl = $score->[0];
-					$sc = $score->[1] + ($dev / $alpha) ** 2;
-					if(specialCompareScore([$nl, $sc], $scores[$i][$mi]) > 0){
-						$scores[$i][$mi] = [$nl, $sc, 0];
-						$backPointer[$i][$mi] = [$k, $n1];
+					$nl = $nls[$y];
+					$sc = $scs[$y] + ($dev / $alpha) ** 2;
+					if(specialCompareScore([$nl, $sc], [$bnl, $bsc]) > 0){
+						($bnl, $bsc, $bbp) = ($nl, $sc, $y);
 					}
 				}
+				$x = $i * $w + $mi;
+				($nls[$x], $scs[$x], $nis[$x]) = ($bnl, $bsc, 0);
+				$bps[$x] = $bbp;
 			}
 			$default = 9**9;
 			$minJ = $mi;
@@ -962,44 +1333,47 @@ sub alignGappedDP
 			next;
 		}
 		else{
-			$scores[$minI-1][$j] = [0, $default, 0];
+			$x = ($minI-1) * $w + $j;
+			($nls[$x], $scs[$x], $nis[$x]) = (0, $default, 0);
 		}
 		for($i=$minI; $i<=$m; $i++){
-			$scores[$i][$j] = [0, 9**9, 0];
+			($bnl, $bsc, $bni, $bbp) = (0, 9**9, 0, undef);
 			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
 			for($k=max($i-$delta-1, $minI-1); $k<=$i-1; $k++){
 				$q = $positions1->[$i] - $positions1->[$k];
 				for($l=max($j-$delta-1, $minJ); $l<=$j-1; $l++){
-					$score = $scores[$k][$l];
+					$x = $k * $w + $l;
 					$rnid = (($rowIndex[$i] > $rowIndex[$k]) ? (($rowIndex[$i] - $rowIndex[$k] - 1) * max($rowScore[$i] - $rowScore[$k] - 1, 0)): 0) ;
 					$cnid = (($colIndex[$j] > $colIndex[$l]) ? (($colIndex[$j] - $colIndex[$l] - 1) * max($colScore[$j] - $colScore[$l] - 1, 0)): 0);
 					$nid = $rnid + $cnid;
-					next if($score->[2] + $nid > $maxIndel);
+					next if($nis[$x] + $nid > $maxIndel);
 					$r = $positions2->[$j] - $positions2->[$l];
 					$dev = abs(($q - $r) / ($q + $r));
-					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
-					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * $nid;
-					if(compareScore([$nl, $sc], $scores[$i][$j]) > 0){
-						$scores[$i][$j] = [$nl, $sc, $score->[2] + $nid];
-						$backPointer[$i][$j] = [$k, $l];
+					$nl = (($dev <= $alpha) ? ($nls[$x] + 1) : $nls[$x]);
+					$sc = $scs[$x] + ($dev / $alpha) ** 2 + $delta * $nid;
+					if($nl > $bnl or ($nl == $bnl and $sc < $bsc)){
+						($bnl, $bsc, $bni, $bbp) = ($nl, $sc, $nis[$x] + $nid, $x);
 					}
 				}
 			}
+			$x = $i * $w + $j;
+			($nls[$x], $scs[$x], $nis[$x]) = ($bnl, $bsc, $bni);
+			$bps[$x] = $bbp;
 		}
 	}
-	my $maxScore = $scores[$m][$n];
+	my $maxScore = [$nls[$m*$w+$n], $scs[$m*$w+$n]];
 	$pointer = [$m, $n];
 	for($j=$n-1; $j>=$mi; $j--){
-		if(compareScore($maxScore, $scores[$m][$j]) < 0){
-			$maxScore = $scores[$m][$j];
+		if(compareScore($maxScore, [$nls[$m*$w+$j], $scs[$m*$w+$j]]) < 0){
+			$maxScore = [$nls[$m*$w+$j], $scs[$m*$w+$j]];
 			$pointer = [$m, $j];
 		}
 	}
 	if($m > $n2){
 		$minI = $n2 if($n2 > $minI);
 		for($i=$m-1; $i>=$minI; $i--){
-			if(compareScore($maxScore, $scores[$i][$n]) < 0){
-				$maxScore = $scores[$i][$n];
+			if(compareScore($maxScore, [$nls[$i*$w+$n], $scs[$i*$w+$n]]) < 0){
+				$maxScore = [$nls[$i*$w+$n], $scs[$i*$w+$n]];
 				$pointer = [$i, $n];
 			}
 		}
@@ -1008,12 +1382,12 @@ sub alignGappedDP
 	my $score = [0, 9**9];
 	if($maxScore->[0] > 0){
 		my $lastPointer = $pointer;
-		my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		my $prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 		my @subAlignments = ();
 		my $status = 0;
 		while(defined $prevPointer){
-			if( $scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0] or
-				$pointer->[1] == $mi and ($scores[$pointer->[0]][$pointer->[1]]->[0] == 0 or $pointer->[0] == $m) ){
+			if( $nls[($pointer->[0])*$w+($pointer->[1])] > $nls[($prevPointer->[0])*$w+($prevPointer->[1])] or
+				$pointer->[1] == $mi and ($nls[($pointer->[0])*$w+($pointer->[1])] == 0 or $pointer->[0] == $m) ){
 				if($status == 0){
 					unshift(@subAlignments, [$pointer]);
 				}
@@ -1024,11 +1398,11 @@ sub alignGappedDP
 				$status = 0;
 			}
 			$pointer = $prevPointer;
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 		}
 		my $firstPointer = $pointer;
 # find the optimal sub-alignment first
-		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scores[$subAlignments[$a]->[-1]->[0]][$subAlignments[$a]->[-1]->[1]]->[1] - $scores[$subAlignments[$a]->[0]->[0]][$subAlignments[$a]->[0]->[1]]->[1] <=> $scores[$subAlignments[$b]->[-1]->[0]][$subAlignments[$b]->[-1]->[1]]->[1] - $scores[$subAlignments[$b]->[0]->[0]][$subAlignments[$b]->[0]->[1]]->[1] } 0..$#subAlignments;
+		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scs[($subAlignments[$a]->[-1]->[0])*$w+($subAlignments[$a]->[-1]->[1])] - $scs[($subAlignments[$a]->[0]->[0])*$w+($subAlignments[$a]->[0]->[1])] <=> $scs[($subAlignments[$b]->[-1]->[0])*$w+($subAlignments[$b]->[-1]->[1])] - $scs[($subAlignments[$b]->[0]->[0])*$w+($subAlignments[$b]->[0]->[1])] } 0..$#subAlignments;
 		@alignment = @{$subAlignments[$sorted[0]]};
 		my ($hits1, $hits2);
 		$hits1 = getHits1(\@alignment, $mi);
@@ -1091,11 +1465,11 @@ sub alignGappedDP
 			my $subAlign = $subAlignments[$k];
 			my $safeGuardPointer = $subAlign->[-1];
 			$pointer = $alignment[0];
-			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			last if($scs[($pointer->[0])*$w+($pointer->[1])] - $scs[($safeGuardPointer->[0])*$w+($safeGuardPointer->[1])] > 16);
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 			while(defined $prevPointer and ($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1])){
 				unshift(@alignment, $prevPointer);
-				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+				$prevPointer = pointerAt(\@bps, $w, $prevPointer->[0], $prevPointer->[1]);
 			}
 			unshift(@alignment, @{$subAlign});
 			$k--;
@@ -1105,11 +1479,11 @@ sub alignGappedDP
 			my @subAlign = @{$subAlignments[$k]};
 			my $safeGuardPointer = $alignment[-1];
 			$pointer = $subAlign[0];
-			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
-			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			last if($scs[($pointer->[0])*$w+($pointer->[1])] - $scs[($safeGuardPointer->[0])*$w+($safeGuardPointer->[1])] > 16);
+			$prevPointer = pointerAt(\@bps, $w, $pointer->[0], $pointer->[1]);
 			while(defined $prevPointer and ($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1])){
 				unshift(@subAlign, $prevPointer);
-				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+				$prevPointer = pointerAt(\@bps, $w, $prevPointer->[0], $prevPointer->[1]);
 			}
 			push(@alignment, @subAlign);
 			$k++;
@@ -1117,7 +1491,7 @@ sub alignGappedDP
 		if( $maxScore->[0] < max(0.7 * ($lastPointer->[1] - $firstPointer->[1]), 5) ){ # to reduce false positive hits
 			return ([], [0, 9**9]);
 		}
-		my $final_score = $maxScore->[1]; # $scores[$alignment[-1]->[0]][$alignment[-1]->[1]]->[1] - $scores[$alignment[0]->[0]][$alignment[0]->[1]]->[1];
+		my $final_score = $maxScore->[1]; # $scs[($alignment[-1]->[0])*$w+($alignment[-1]->[1])] - $scs[($alignment[0]->[0])*$w+($alignment[0]->[1])];
 		if( $final_score > getScoreThreshold(scalar(@alignment)) ){ # to reduce false positive hits
 			return ([], [0, 9**9]);
 		}
@@ -1126,6 +1500,17 @@ sub alignGappedDP
 	return (\@alignment, $score);
 }
 
+
+##
+# the back pointer of a cell in a flat matrix of width $w as [row, column], or undef
+##
+sub pointerAt
+{
+	my ($bps, $w, $i, $j) = @_;
+	my $x = $bps->[$i * $w + $j];
+	return (defined $x) ? [int($x / $w), $x % $w] : undef;
+}
+
 sub compareScore
 {
 	my ($score1, $score2) = @_;
@@ -1222,6 +1607,160 @@ sub locate
 	return ($left == $middle) ? $middle : $left;
 }
 
+##
+# build an index of intervals (or of points if no ends are given) for overlap queries: the intervals
+# are kept sorted by start in flat arrays, each position holds the largest end of the implicit
+# balanced subtree rooted at it
+##
+sub makeIntervalIndex
+{
+	my ($starts, $ends) = @_;
+	$ends = $starts unless(defined $ends);
+
+	my @order = sort { $starts->[$a] <=> $starts->[$b] or $a <=> $b } (0..$#{$starts});
+	my %index = (
+		idx   => \@order,
+		start => [map { $starts->[$_] } @order],
+		end   => [map { $ends->[$_] } @order],
+		max   => []
+	);
+	setMaxEnds(\%index, 0, scalar(@order));
+	return \%index;
+}
+
+sub setMaxEnds
+{
+	my ($index, $lo, $hi) = @_;
+	return undef if($lo >= $hi);
+	my $mid = ($lo + $hi) >> 1;
+	my $max = $index->{end}->[$mid];
+	foreach my $sub (setMaxEnds($index, $lo, $mid), setMaxEnds($index, $mid + 1, $hi)){
+		$max = $sub if(defined $sub and $sub > $max);
+	}
+	$index->{max}->[$mid] = $max;
+	return $max;
+}
+
+##
+# the indices (as given to makeIntervalIndex) of the intervals overlapping [$qStart, $qEnd], ordered by start
+##
+sub searchOverlaps
+{
+	my ($index, $qStart, $qEnd) = @_;
+	my @found = ();
+	my ($starts, $ends, $maxs) = ($index->{start}, $index->{end}, $index->{max});
+	my @stack = ([0, scalar(@{$starts})]);
+	# an in-order walk pruning the subtrees ending before $qStart or starting after $qEnd
+	while(@stack){
+		my $range = pop(@stack);
+		if(!ref($range)){
+			push(@found, $index->{idx}->[$range]);
+			next;
+		}
+		my ($lo, $hi) = @{$range};
+		next if($lo >= $hi);
+		my $mid = ($lo + $hi) >> 1;
+		next if($maxs->[$mid] < $qStart);
+		push(@stack, [$mid + 1, $hi]) if($starts->[$mid] <= $qEnd);
+		push(@stack, $mid) if($starts->[$mid] <= $qEnd and $ends->[$mid] >= $qStart);
+		push(@stack, [$lo, $mid]);
+	}
+	return \@found;
+}
+
+##
+# the first position of a sorted array (or of its first $n elements) whose value is not below/above $val
+##
+sub lowerBound
+{
+	my ($array, $val, $n) = @_;
+	my ($lo, $hi) = (0, (defined $n) ? $n : scalar(@{$array}));
+	while($lo < $hi){
+		my $mid = ($lo + $hi) >> 1;
+		if($array->[$mid] < $val){
+			$lo = $mid + 1;
+		}
+		else{
+			$hi = $mid;
+		}
+	}
+	return $lo;
+}
+
+sub upperBound
+{
+	my ($array, $val, $n) = @_;
+	my ($lo, $hi) = (0, (defined $n) ? $n : scalar(@{$array}));
+	while($lo < $hi){
+		my $mid = ($lo + $hi) >> 1;
+		if($array->[$mid] <= $val){
+			$lo = $mid + 1;
+		}
+		else{
+			$hi = $mid;
+		}
+	}
+	return $lo;
+}
+
+##
+# index the seeds of the maps (id => label positions), i.e. the runs of $k successive label intervals
+# bucketed on a log scale of width $width, in both orientations; the entries of a seed are a flat list
+# of (id, orientation, start position in the oriented map) triples
+##
+sub buildSeedIndex
+{
+	my ($maps, $k, $width) = @_;
+	my %seeds = ();
+	foreach my $id (keys %{$maps}){
+		my $positions = $maps->{$id};
+		my @reversed = map { $positions->[-1] - $_ } reverse(@{$positions});
+		foreach my $orient (0, 1){
+			my $pos = ($orient == 0) ? $positions : \@reversed;
+			my $buckets = getIntervalBuckets($pos, $width);
+			for(my $i=0; $i+$k<=scalar(@{$buckets}); $i++){
+				push(@{$seeds{join(",", @{$buckets}[$i..($i+$k-1)])}}, $id, $orient, $pos->[$i]);
+			}
+		}
+	}
+	return {seeds=>\%seeds, k=>$k, width=>$width};
+}
+
+##
+# look up the seeds of the labels $first..$last of a map (all by default) in the index, each interval
+# in its own bucket and the two adjacent ones to absorb the sizing errors; $visit is called with the
+# start position of the seed and the entries of every matching seed of the index
+##
+sub searchSeeds
+{
+	my ($index, $positions, $visit, $first, $last) = @_;
+	$first = 0 unless(defined $first);
+	my ($seeds, $k) = ($index->{seeds}, $index->{k});
+	my $buckets = getIntervalBuckets($positions, $index->{width}, $first, $last);
+	for(my $i=0; $i+$k<=scalar(@{$buckets}); $i++){
+		my @keys = ("");
+		foreach my $b (@{$buckets}[$i..($i+$k-1)]){
+			@keys = map { my $prefix = ($_ eq "") ? "" : "$_,"; ("$prefix" . ($b-1), "$prefix$b", "$prefix" . ($b+1)) } @keys;
+		}
+		foreach my $entries (grep { defined } @{$seeds}{@keys}){
+			$visit->($positions->[$first + $i], $entries);
+		}
+	}
+}
+
+sub getIntervalBuckets
+{
+	my ($positions, $width, $first, $last) = @_;
+	$first = 0 unless(defined $first);
+	$last = $#{$positions} unless(defined $last);
+	my @buckets = ();
+	for(my $i=$first+1; $i<=$last; $i++){
+		# intervals under 500bp are below the resolution of the labels
+		push(@buckets, int(log(max($positions->[$i] - $positions->[$i-1], 500)) / $width));
+	}
+	return \@buckets;
+}
+
 sub calculateLinearParams
 {
 	my ($xstart, $xend, $ystart, $yend) = @_;
@@ -1242,4 +1781,268 @@ sub getPerfectLinearParams
 	return ($slope, $intercept);
 }
 
+##
+# the gzipped copy of a file if only that one exists, e.g. an intermediate compressed at the end of its step
+##
+sub inputFile
+{
+	my ($file) = @_;
+	return (! -e $file and -e "$file.gz") ? "$file.gz" : $file;
+}
+
+##
+# open a file for reading, which is decompressed on the fly if it is gzipped
+##
+sub openInput
+{
+	my ($file) = @_;
+	$file = inputFile($file);
+	my $fh;
+	if($file =~ /\.gz$/){
+		die("ERROR: Unable to read in file $file: No such file or directory\n") unless(-r $file);
+		open($fh, "gzip -dc \"$file\" |") or die("ERROR: Unable to read in file $file: $!\n");
+	}
+	else{
+		open($fh, "<$file") or die("ERROR: Unable to read in file $file: $!\n");
+	}
+	return $fh;
+}
+
+##
+# the path a file is written to, i.e. <file>.gz when the step compresses its outputs (MOMS_COMPRESS holds the compressor)
+##
+sub outputFile
+{
+	my ($file) = @_;
+	return ($ENV{MOMS_COMPRESS}) ? "$file.gz" : $file;
+}
+
+##
+# open a file for writing, which is compressed on the fly into <file>.gz when the step compresses its outputs;
+# the other copy of the file is removed, as inputFile would pick the plain one
+##
+sub openOutput
+{
+	my ($file) = @_;
+	my $out = outputFile($file);
+	foreach my $fl ($file, "$file.gz"){
+		unlink($fl) if($fl ne $out and -e $fl);
+		removeSidecars($fl);
+	}
+	my $fh;
+	if($out ne $file){
+		open($fh, "| $ENV{MOMS_COMPRESS} > \"$out\"") or die("ERROR: Unable to write in file $out: $!\n");
+	}
+	else{
+		open($fh, ">$out") or die("ERROR: Unable to write in file $out: $!\n");
+	}
+	return $fh;
+}
+
+##
+# copy the sequences of a FASTA file (plain or gzipped) into a flat file without line breaks,
+# one line at a time, and return the [offset, length] of each sequence in it by name
+##
+sub spoolFasta
+{
+	my ($fasta_file, $spool_file) = @_;
+	my %spool = ();
+	my ($name, $offset, $len) = (undef, 0, 0);
+	my $in = openInput($fasta_file);
+	open(SPOOL, ">$spool_file") or die("ERROR: Unable to write to file $spool_file: $!\n");
+	while(my $line = <$in>){
+		chomp($line);
+		if($line =~ /^>(\S+)/){
+			$spool{$name} = [$offset, $len] if(defined $name and $len > 0);
+			($name, $offset, $len) = ($1, $offset + $len, 0);
+			next;
+		}
+		print SPOOL $line;
+		$len += length($line);
+	}
+	$spool{$name} = [$offset, $len] if(defined $name and $len > 0);
+	close SPOOL;
+	close $in;
+	return \%spool;
+}
+
+##
+# read a subsequence of a spooled sequence, clipped to its end like substr()
+##
+sub readSpooled
+{
+	my ($fh, $spooled, $offset, $len) = @_;
+	my $seq = "";
+	$len = $spooled->[1] - $offset if($offset + $len > $spooled->[1]);
+	return $seq if($len <= 0);
+	seek($fh, $spooled->[0] + $offset, 0);
+	read($fh, $seq, $len);
+	return $seq;
+}
+
+##
+# read the summary of a file from its sidecar, or nothing if it is missing or stale
+##
+sub readStats
+{
+	my ($file) = @_;
+	my ($fh, $meta) = openSidecar($file, "stats", "summary");
+	return undef unless(defined $fh);
+	close $fh;
+	return $meta->{summary};
+}
+
+##
+# write the summary of a file into its sidecar
+##
+sub writeStats
+{
+	my ($file, $stamp, $summary) = @_;
+	return writeSidecar($file, "stats", "summary", $stamp, {summary => $summary});
+}
+
+##
+# the summary statistics of a CMAP, XMAP or FASTA file (plain or gzipped) from a single pass over it:
+# the maps (or sequences), labels and lengths of a CMAP/FASTA file, and the alignments, the aligned
+# query and reference maps and the coverage of every reference map of an XMAP file;
+# the summary is kept in a sidecar, so that the following readers (util.sh included) skip the file
+##
+sub summarizeFile
+{
+	my ($file) = @_;
+	$file = inputFile($file);
+	my $stamp = fileStamp($file);
+	my $summary = readStats($file);
+	return $summary if(defined $summary);
+
+	(my $name = $file) =~ s/\.gz$//;
+	my $in = openInput($file);
+	if($name =~ /\.cmap$/i){
+		my ($idCol, $lenCol, $chCol) = (0, 1, 4);
+		my (@ids, @lengths);
+		my ($labels, $last) = (0, undef);
+		while(my $line = <$in>){
+			if($line =~ /^#h\s+/){
+				$line =~ s/^#h\s+//;
+				my @columns = split(/\s+/, $line);
+				for(my $i = 0; $i < scalar(@columns); $i++){
+					$idCol = $i if($columns[$i] eq "CMapId");
+					$lenCol = $i if($columns[$i] eq "ContigLength");
+					$chCol = $i if($columns[$i] eq "LabelChannel");
+				}
+				next;
+			}
+			next if($line =~ /^#/ or $line !~ /\S/);
+			$line =~ s/^\s+//;
+			my @d_items = split(/\s+/, $line);
+			if(!defined $last or $d_items[$idCol] ne $last){
+				$last = $d_items[$idCol];
+				push(@ids, $last);
+				push(@lengths, $d_items[$lenCol]);
+			}
+			$labels++ if(defined $d_items[$chCol] and $d_items[$chCol] != 0);
+		}
+		$summary = {type => "cmap", maps => scalar(@ids), labels => $labels, ids => \@ids, lengths => \@lengths};
+	}
+	elsif($name =~ /\.xmap$/i){
+		my ($nhits, %queries, %intervals);
+		$nhits = 0;
+		while(my $line = <$in>){
+			next if($line =~ /^#/ or $line !~ /\S/);
+			$line =~ s/^\s+//;
+			my ($qId, $refId, $qStart, $qEnd, $start, $end) = (split(/\s+/, $line))[1..6];
+			$nhits++;
+			$queries{$qId} = 1;
+			push(@{$intervals{$refId}}, [$start, $end]);
+		}
+		# the coverage of a reference map by all its alignments, and by their union
+		my %coverage = ();
+		foreach my $refId (keys %intervals){
+			my @sorted = sort { $a->[0] <=> $b->[0] } @{$intervals{$refId}};
+			my ($oStart, $oEnd) = @{$sorted[0]};
+			my ($sum, $nr) = (0, 0);
+			foreach my $interval (@sorted){
+				$sum += $interval->[1] - $interval->[0];
+				if($interval->[0] <= $oEnd){
+					$oEnd = $interval->[1] if($oEnd < $interval->[1]);
+				}
+				else{
+					$nr += $oEnd - $oStart;
+					($oStart, $oEnd) = @$interval;
+				}
+			}
+			$nr += $oEnd - $oStart;
+			$coverage{$refId} = [$sum, $nr];
+		}
+		$summary = {type => "xmap", alignments => $nhits, queries => scalar(keys %queries), refs => scalar(keys %intervals), coverage => \%coverage};
+	}
+	else{
+		my @lengths = ();
+		my $len;
+		while(my $line = <$in>){
+			if($line =~ /^>/){
+				push(@lengths, $len) if(defined $len);
+				$len = 0;
+				next;
+			}
+			chomp($line);	$line =~ s/\r//g;
+			$len += length($line);
+		}
+		push(@lengths, $len) if(defined $len);
+		my $bases = 0;
+		$bases += $_ foreach (@lengths);
+		$summary = {type => "fasta", maps => scalar(@lengths), bases => $bases, lengths => \@lengths};
+	}
+	close $in;
+	writeStats($file, $stamp, $summary);
+	return $summary;
+}
+
+##
+# the count, minimum, median, mean, N50, maximum and total (in Mbp) of a list of lengths
+##
+sub summarizeLengths
+{
+	my @len = sort {$b<=>$a} @_;
+
+	my $qty = scalar(@len);
+	if( $qty == 0 ){
+		return ('NA', 'NA', 'NA', 'NA', 'NA', 'NA', 'NA');
+	}
+
+	my $ratio = 10 ** 6;
+
+	my $median = 0;
+	my $m = int($qty/2);
+	if( $qty%2 ){
+		$median = $len[$m];
+	}
+	else{
+		$median = ($len[$m-1] + $len[$m]) / 2;
+	}
+	$median = sprintf("%.3f", $median/$ratio);
+
+	my $min = sprintf("%.3f", $len[-1]/$ratio);
+	my $max = sprintf("%.3f", $len[0]/$ratio);
+
+	my $total = 0;
+	$total += $_ foreach (@len);
+	my $mean = sprintf("%.3f", $total/($qty*$ratio));
+
+	my $half = $total / 2;
+	my ($n50, $n50val) = (0, 0);
+	for(my $i=0; $i<$qty; $i++){
+		$n50 += $len[$i];
+		if( $n50 >= $half ){
+			$n50val = $len[$i];
+			last;
+		}
+	}
+
+	$total = sprintf("%.3f", $total/$ratio);
+	$n50val = sprintf("%.3f", $n50val/$ratio);
+
+	return ($qty, $min, $median, $mean, $n50val, $max, $total);
+}
+
 1;
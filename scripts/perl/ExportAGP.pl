@@ -24,7 +24,6 @@ BEGIN{
 
 use BNG::Utility;
 use Getopt::Std;
-use Tie::File;
 
 my $program = basename($0);
 my $usage = << "USAGE";
@@ -145,11 +144,16 @@ printFasta($seqMap, $xmap, $NCBI_fasta_out_file, $hybridCmap, $NCBI_cut_site, $p
 sub sortXMap
 {
 	my ($xmapFile, $sorted_xmap) = @_;
-	my $headerCnt = `grep -c '^#' $xmapFile`; chomp $headerCnt;
+	my $cat = "gzip -dcf " . inputFile($xmapFile); # the xmap may be gzipped
+	my $headerCnt = `$cat | grep -c '^#'`; chomp $headerCnt;
 
-	`head -n $headerCnt $xmapFile > $sorted_xmap`;  #export header to sorted xmap 
+	my $out = openOutput($sorted_xmap);
+	print $out `$cat | head -n $headerCnt`;  #export header to sorted xmap 
      $headerCnt = $headerCnt+1; #set to appropriate param for tail
-	`tail -n+$headerCnt $xmapFile | sort -k3,3n -k6,6n -k7,7nr >> $sorted_xmap`; # RefContigID, RefStartPos, RefEndPos
+	open(my $in, "$cat | tail -n+$headerCnt | sort -k3,3n -k6,6n -k7,7nr |") || die("ERROR: cannot sort $xmapFile\n"); # RefContigID, RefStartPos, RefEndPos
+	print $out $_ while(<$in>);
+	close($in);
+	close($out);
 
 	return($sorted_xmap);
 }
@@ -244,15 +248,15 @@ sub readFasta
 {
 	my ($fasta_file, $out_dir) = @_;
 	
-	my ($fastaMap, $tmp_file) = processFastaFile($fasta_file, $out_dir);
-	tie my @fasta_arry, 'Tie::File',  $tmp_file,  or die("ERROR: cannot process fasta file");
-	my %fasta_map = %{$fastaMap};
+	#the sequences are spooled into a flat temporary file without line breaks, which is removed by cleanUp
+	my $tmp_file = "$out_dir/" . basename($fasta_file) . ".tmp.fa.tmp";
+	my %fasta_map = %{spoolFasta($fasta_file, $tmp_file)};
+	open(my $fasta_fh, "<$tmp_file") or die("ERROR: cannot process fasta file");
 	
 	my $accesser = sub{
 		my ($ID) = @_;
 		if(exists $fasta_map{$ID}){
-			my $ind = $fasta_map{$ID};
-			return $fasta_arry[$ind];
+			return readSpooled($fasta_fh, $fasta_map{$ID}, 0, $fasta_map{$ID}->[1]);
 		}else{
 			print "Warning: cannot find sequence for ID: $ID\n";
 			return "";
@@ -261,46 +265,6 @@ sub readFasta
 	return $accesser;
 }
 
-#This function remove extra white space in a fasta file, so the sequence remains in one line
-#It also creates an index table of seq name to the which line in the file
-#corresponding to that sequence
-sub processFastaFile
-{
-	my ($fasta_file, $out_dir) = @_;
-	my $tmp_file = "$outdir/" . basename($fasta_file) . ".tmp.fa.tmp";
-	open FASTA, $fasta_file || die("ERROR: cannot open fasta file");
-	open TMP, ">".$tmp_file || die("ERROR: cannot access file system for temporary file");
-	my %fastaTable=();
-	my $curr="";
-	my $currHeader="";
-	my $numLines=1;
-	my $line;
-	while($line = <FASTA>){
-		chomp $line;
-		if($line =~ /^>/){
-			if($curr ne ""){
-				$fastaTable{substr($currHeader,1)}=$numLines;
-				print TMP $currHeader."\n";
-				print TMP $curr."\n";
-				$numLines=$numLines+2;
-			}
-			my @tokens = split(/\s+/, $line);
-			$currHeader = $tokens[0];		
-			$curr="";
-		}else{
-			$curr=$curr.$line;
-		}
-	}
-	#taking care of the last seq contig
-	$fastaTable{substr($currHeader,1)}=$numLines;	
-	print TMP $currHeader."\n";
-	print TMP $curr."\n";
-	
-	close(FASTA);
-	close(TMP);
-	return (\%fastaTable, $tmp_file)
-}
-
 ##########################Functions for processing the hybrid-scaffold to NGS contigs alignment (i.e. the xmap file) ##########################
 
 #This function read-in the alignments btw hybrid-scaffold contigs and the NGS contigs and compute gap length
@@ -601,7 +565,7 @@ sub printFasta
 	my ($fasta_map, $xmap, $out_file, $hybridCmap, $cut_site, $paddingGap) = @_;
 	my $numAlign = $xmap->{totalHits};
 	my $isBegin = 1;
-	open(my $fh, ">".$out_file) || die "cannot open output fasta file $out_file\n";
+	my $fh = openOutput($out_file);
 	
 	my $currInd = 0;
 	my $nextInd = 1;
@@ -795,7 +759,7 @@ sub printUnUsedNGS
 	my ($agp_out_file, $ngs_map, $aux_out_file, $fasta_out, $seqMap) = @_;
 	open(my $fh, ">>".$agp_out_file) || die "Cannot open agp output file";
 	open(my $aux_fh, ">>".$aux_out_file) || die "Cannot open agp auxilliary file";
-	open(my $fasta_fh, ">".$fasta_out) || die "Cannot open fasta output file";
+	my $fasta_fh = openOutput($fasta_out);
 	
 	my $unUsedCount=0;
 	foreach my $key(keys %{$ngs_map}){
@@ -17,6 +17,7 @@ use Cwd qw(abs_path);
 use Statistics::LineFit;
 use Storable qw(dclone);
 use List::Util qw[min max];
+use File::Temp qw(tempfile);
 
 BEGIN{
         my $progpath = abs_path(dirname($0));
@@ -38,7 +39,7 @@ Usage: $program [options];
 	-i, --input <str>  The input XMAP file (REQUIRED)
 	-o, --output <str> The output path containing the output directory and prefix (REQUIRED)
 	-c, --cmap <str>   The input CMAP file from hybrid assembly (REQUIRED)
-	-s, --seq <str>    The input FASTA file from NGS assembly (REQUIRED)
+	-s, --seq <str>    The input FASTA file (plain or gzipped) from NGS assembly (REQUIRED)
 	-m, --map <str>    The file containing the mapping information from ID to sequence name (REQUIRED)
 	-t, --trans <str>  The file containing the coordinate transformation information when resolving conflicts
 	-g, --gap <int>    The length of gap to be inserted between overlapping NGS contigs in a scaffold (default: 13)
@@ -111,6 +112,7 @@ my $hybrid_cmap_file = $opt_c;
 ###################Main entry point of the export script########################
 my ($hybridCmap, $numcontig, $contigLength) = readCMap($hybrid_cmap_file);
 print("Number of contigs in hybrid: $numcontig\n");
+my $seqStore; # the file holding the sequences read by readFasta
 my $seqTable = readFasta($ngs_namemap_file, $fasta_file);
 my $contigInfo = readContigInfo($seqTable, $cut_coord_file);
 my $alignTable = readAlign($xmap_file);
@@ -164,31 +166,14 @@ sub readFasta
 		$rev_map{$name} = $seqid;
 	}
 	close NM;
-	my $seq = "";
-	open(FA, "<$fasta_file") or die("Can not open \"$fasta_file\" for reading\n");
-	while($line = <FA>){
-		chomp($line);
-		if($line =~ /^>(\S+)/){
-			if($seq ne ""){
-				$seqid = $rev_map{$name};
-				if(defined $seqid){
-					$seqTable{$seqid}{seq} = $seq;
-				}
-				else{
-					warn "Warning: $name is not recognized to be a valid NAME, check $namemap_file or $fasta_file\n";
-				}
-				$seq = "";
-			}
-			$name = $1;
-			next;
-		}
-		$seq .= $line;
-	}
-	close FA;
-	if($seq ne ""){
+	# the sequences are kept on disk, and only their locations in memory
+	my $spool_file;
+	($seqStore, $spool_file) = tempfile("${outpre}_XXXXXX", DIR => $outdir, SUFFIX => ".seq", UNLINK => 1);
+	my $spool = spoolFasta($fasta_file, $spool_file);
+	foreach $name (sort { $spool->{$a}->[0] <=> $spool->{$b}->[0] } keys %$spool){
 		$seqid = $rev_map{$name};
 		if(defined $seqid){
-			$seqTable{$seqid}{seq} = $seq;
+			$seqTable{$seqid}{spool} = $spool->{$name};
 		}
 		else{
 			warn "Warning: $name is not recognized to be a valid NAME, check $namemap_file or $fasta_file\n";
@@ -991,7 +976,7 @@ sub retrieveSequence
 	}
 	$dir = "+" if(!defined $dir);
 	$offset = 0 if(!defined $offset or $offset < 0);
-	my $seq = substr($seqTable->{$seqid}{seq}, $offset, $len);
+	my $seq = (defined $seqTable->{$seqid}{spool}) ? readSpooled($seqStore, $seqTable->{$seqid}{spool}, $offset, $len) : "";
 	if($dir ne "+"){
 		$seq = reverseComplement($seq);
 	}
@@ -36,6 +36,10 @@ Usage: $program [options]
 	-o, --output <str>      The output path (REQUIRED)
 	-c, --channel <int>     The channel # (default: 1)
 	-m, --min <int>,<int>   Minimum numbers of labels for REF and QRY respectively (default: 30,15)
+	-s, --seed <int>,<num>  Number of label intervals in a seed and relative sizing tolerance of the intervals,
+	                        only the CMAPs sharing a seed with a molecule are aligned to it (0: all, default: 3,0.05)
+	-n, --chunk <int>       Number of molecules read from the BNX file and aligned at a time, the results are
+	                        appended to the output chunk by chunk (0: the whole file at once, default: 10000)
 	-t, --threads <int>     The number of threads for parallel processing (default: 8)
 	-h, --help              Help
 
@@ -43,12 +47,14 @@ Example:
 	$program -r molecules-bspqi.bnx -q bspqi.cmap -o alignment/bspqi -t 4
 USAGE
 
-use vars qw($opt_r $opt_q $opt_o $opt_c $opt_m $opt_t $opt_h);
+use vars qw($opt_r $opt_q $opt_o $opt_c $opt_m $opt_s $opt_n $opt_t $opt_h);
 GetOptions( "r|reference=s" => \$opt_r,
 			"q|query=s" => \$opt_q,
 			"o|output=s" => \$opt_o,
 			"c|channel=i" => \$opt_c,
 			"m|min=s" => \$opt_m,
+			"s|seed=s" => \$opt_s,
+			"n|chunk=i" => \$opt_n,
 			"t|threads=i" => \$opt_t,
 			"h|help" => \$opt_h);
 die($usage) if($opt_h);
@@ -75,33 +81,65 @@ else{
 }
 my $ichannel = (defined $opt_c && ($opt_c =~ /^\d+$/)) ? $opt_c : 1; 
 my ($minref, $minqry) = (defined $opt_m) ? split(/,/, $opt_m) : (30, 15);
+my ($seedlen, $tolerance) = (defined $opt_s) ? split(/,/, $opt_s) : (3, 0.05);
+$tolerance = 0.05 unless(defined $tolerance and $tolerance > 0);
+my $chunk = (defined $opt_n && ($opt_n =~ /^\d+$/)) ? $opt_n : 10000;
 my $nthreads = (defined $opt_t && ($opt_t =~ /^\d+$/)) ? (($opt_t < 1) ? 1 : $opt_t) : 8;
 
 my $cmd = "mkdir -p $outdir";
 my $retCode = system($cmd);
 die("**ERROR: Can not create directory \"$outdir\"\n") if($retCode != 0);
 
-my ($bnxInfo, $bnxPositions) = readBNXPositions($opt_r, $minref);
 my ($cmapInfo, $cmapPositions) = readCMAPPositions($opt_q, $minqry);
-
-my $hits = alignBNXwithCMAP($bnxPositions, $cmapPositions, $nthreads);
-processAlignments($bnxInfo, $bnxPositions, $cmapInfo, $cmapPositions, $hits);
-outputAlignments($bnxInfo, $cmapInfo, $hits, $ichannel, "$outdir/$outpre-alignments.tsv");
-collectEvidences($bnxInfo, $cmapInfo, $hits, $ichannel, "$outdir/$outpre-evidences.tsv");
+my $seedIndex = ($seedlen > 0) ? buildSeedIndex($cmapPositions, $seedlen, log(1 + $tolerance)) : undef;
+
+# the molecules are streamed through in chunks, so the memory is bounded by the chunk rather than the BNX file
+my $bnx = openBNX($refbnx);
+my ($alnfile, $evdfile) = ("$outdir/$outpre-alignments.tsv", "$outdir/$outpre-evidences.tsv");
+open(my $alnfh, ">$alnfile") or die("Can not open \"$alnfile\" for writing.\n");
+open(my $evdfh, ">$evdfile") or die("Can not open \"$evdfile\" for writing.\n");
+print $alnfh "#no\tqryid\trefid\tqryLength\trefLength\tqrycnt\trefcnt\tchannel\torientation\t[S,M,T]\tend\talignment\n";
+print $evdfh "#no\tctg1\tctg2\tend1\tend2\tmol\tdistance\n";
+my ($nalns, $nevds) = (0, 0);
+while(my ($bnxInfo, $bnxPositions) = readBNXChunk($bnx, $minref, $chunk)){
+	my $hits = alignBNXwithCMAP($bnxPositions, $cmapPositions, $seedIndex, $nthreads);
+	processAlignments($bnxInfo, $bnxPositions, $cmapInfo, $cmapPositions, $hits);
+	$nalns = outputAlignments($bnxInfo, $cmapInfo, $hits, $ichannel, $alnfh, $nalns);
+	$nevds = collectEvidences($bnxInfo, $cmapInfo, $hits, $ichannel, $evdfh, $nevds);
+}
+close $alnfh;
+close $evdfh;
 exit 0;
 
-sub readBNXPositions
+##
+# open a BNX file for reading its molecules chunk by chunk
+##
+sub openBNX
 {
-	my ($infile, $minLabels) = @_;
+	my ($infile) = @_;
+	open(my $fh, "<$infile") or die("Can not open \"$infile\" for reading\n");
+	return {file=>$infile, fh=>$fh, eof=>0};
+}
+
+##
+# read the next $size molecules of a BNX file (all the remaining ones if $size is 0) with their label positions,
+# an empty list is returned once the file is exhausted
+##
+sub readBNXChunk
+{
+	my ($reader, $minLabels, $size) = @_;
+	return () if($reader->{eof});
+	my $infile = $reader->{file};
+	my $fh = $reader->{fh};
 	my %info = ();
 	my %positions = ();
-	open(IN, "<$infile") or die("Can not open \"$infile\" for reading\n");
 	my $line;
-	my ($idx_id, $idx_len, $idx_num, $idx_max);
+	my ($idx_id, $idx_len, $idx_num, $idx_max) = @{$reader}{qw(idx_id idx_len idx_num idx_max)};
 	my ($id, $len, $num);
 	my @columns;
 	my @names = ();
-	while($line = <IN>){
+	my $nmols = 0;
+	while(($size == 0 or $nmols < $size) and defined($line = <$fh>)){
 		chomp($line);
 		if($line !~ /^\d\t/){
 			if($line =~ /^#0h /){
@@ -110,19 +148,23 @@ sub readBNXPositions
 				$idx_id = getIndex(\@names, "MoleculeID");
 				if(!defined $idx_id){
 					print STDERR "wrong format of \"$infile\": MoleculeID is undefined";
+					$reader->{eof} = 1;
 					last;
 				}
 				$idx_len = getIndex(\@names, "Length");
 				if(!defined $idx_len){
 					print STDERR "wrong format of \"$infile\": Length is undefined";
+					$reader->{eof} = 1;
 					last;
 				}
 				$idx_num = getIndex(\@names, "NumberofLabels");
 				if(!defined $idx_num){
 					print STDERR "wrong format of \"$infile\": NumberofLabels is undefined";
+					$reader->{eof} = 1;
 					last;
 				}
 				$idx_max = max(max($idx_id, $idx_len), $idx_num);
+				@{$reader}{qw(idx_id idx_len idx_num idx_max)} = ($idx_id, $idx_len, $idx_num, $idx_max);
 			}
 			next;
 		}
@@ -131,6 +173,7 @@ sub readBNXPositions
 		if($columns[0] eq 0){
 			if(scalar(@columns) <= $idx_max){
 				print STDERR "irregular data found in \"$infile\": $line";
+				$reader->{eof} = 1;
 				last;
 			}
 			($id, $len, $num) = ($columns[$idx_id], $columns[$idx_len], $columns[$idx_num]);
@@ -139,6 +182,7 @@ sub readBNXPositions
 		elsif($columns[0] eq 1){
 			if(scalar(@columns) != $num + 2){
 				print STDERR "irregular data found in \"$infile\": $line";
+				$reader->{eof} = 1;
 				last;
 			}
 			if(defined $id){
@@ -146,10 +190,13 @@ sub readBNXPositions
 					$positions{$id} = [@columns[1..$num]];
 				}
 				$id = undef;
+				$nmols++;
 			}
 		}
 	}
-	close IN;
+	$reader->{eof} = 1 if(!defined $line);
+	close $fh if($reader->{eof});
+	return () if($nmols == 0 and !%info);
 
 	return (\%info, \%positions);
 }
@@ -233,9 +280,25 @@ sub getIndex
 	return undef;
 }
 
+##
+# collect the cmaps sharing at least one seed with a molecule
+##
+sub getCandidates
+{
+	my ($reflocs, $seedIndex) = @_;
+	my %candidates = ();
+	searchSeeds($seedIndex, $reflocs, sub {
+		my ($start, $entries) = @_;
+		for(my $x=0; $x<scalar(@{$entries}); $x+=3){
+			$candidates{$entries->[$x]} = 1;
+		}
+	});
+	return [keys %candidates];
+}
+
 sub alignBNXwithCMAP
 {
-	my ($bnxPositions, $cmapPositions, $nthreads) = @_;
+	my ($bnxPositions, $cmapPositions, $seedIndex, $nthreads) = @_;
 
 	my @hits = ();
 	my $alignment;
@@ -278,7 +341,8 @@ sub alignBNXwithCMAP
 		my $pid = $pm->start and next;
 		# forked thread
 		my @localHits = ();
-		foreach my $qryid (keys %$cmapPositions){
+		my $candidates = (defined $seedIndex) ? getCandidates($reflocs, $seedIndex) : [keys %$cmapPositions];
+		foreach my $qryid (@$candidates){
 			my $qrylocs = $cmapPositions->{$qryid};
 			$alignment = localAlign($reflocs, $qrylocs);
 			if(scalar(@{$alignment}) > 0){ # found significant overlap
@@ -426,35 +490,36 @@ sub processAlignments
 	$pm->wait_all_children;
 }
 
+##
+# append the alignments of a chunk of molecules, numbered after the $no ones written before; returns the new count
+##
 sub outputAlignments
 {
-	my ($refInfo, $qryInfo, $hits, $ichannel, $outfile) = @_;
-	open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing.\n");
-	print OUT "#no\tqryid\trefid\tqryLength\trefLength\tqrycnt\trefcnt\tchannel\torientation\t[S,M,T]\tend\talignment\n";
+	my ($refInfo, $qryInfo, $hits, $ichannel, $out, $no) = @_;
 	my ($qryid, $refid, $qrylen, $reflen, $qrycnt, $refcnt);
-	my $no = 0;
 	foreach (sort {$a->{qry} <=> $b->{qry} || $a->{ref} <=> $b->{ref}} @$hits){
 		$no++;
 		($qryid, $refid) = ($_->{qry}, $_->{ref});
 		my ($qryItem, $refItem) = ($qryInfo->{$qryid}, $refInfo->{$refid});
 		($qrylen, $reflen, $qrycnt, $refcnt) = ($qryItem->{len}, $refItem->{len}, $qryItem->{num}, $refItem->{num});
-		print OUT "$no\t$qryid\t$refid\t$qrylen\t$reflen\t$qrycnt\t$refcnt\t$ichannel\t";
-		print OUT $_->{dir} . "\t";
-		print OUT "[" . $_->{linkage}->{start} . ", ", $_->{linkage}->{mid}, ", ", $_->{linkage}->{end} . "]\t";
-		print OUT $_->{end} ."\t";
+		print $out "$no\t$qryid\t$refid\t$qrylen\t$reflen\t$qrycnt\t$refcnt\t$ichannel\t";
+		print $out $_->{dir} . "\t";
+		print $out "[" . $_->{linkage}->{start} . ", ", $_->{linkage}->{mid}, ", ", $_->{linkage}->{end} . "]\t";
+		print $out $_->{end} ."\t";
 		foreach (@{$_->{alignment}}){
-			print OUT "(" . ($_->[0]+1) . "," . ($_->[1]+1) . ")";
+			print $out "(" . ($_->[0]+1) . "," . ($_->[1]+1) . ")";
 		}
-		print OUT "\n";
+		print $out "\n";
 	}
-	close OUT;
+	return $no;
 }
 
+##
+# append the linkage evidences of a chunk of molecules, numbered after the $no ones written before; returns the new count
+##
 sub collectEvidences
 {
-	my($refInfo, $qryInfo, $hits, $ichannel, $outfile) = @_;
-	open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing.\n");
-	print OUT "#no\tctg1\tctg2\tend1\tend2\tmol\tdistance\n";
+	my($refInfo, $qryInfo, $hits, $ichannel, $out, $no) = @_;
 	my ($ctg1, $ctg2, $end1, $end2, $molid, $distance);
 	my ($refid, $qryid1, $qryid2, $refItem, $qryItem1, $qryItem2, $alignment);
 	my ($hit1, $hit2, $intersect);
@@ -467,7 +532,6 @@ sub collectEvidences
 		}
 		push(@{$clustered{$refid}}, $hit);
 	}
-	my $no = 0;
 	foreach $refid (keys %clustered){
 		$refItem = $refInfo->{$refid};
 		my $clusteredHits = $clustered{$refid};
@@ -483,11 +547,11 @@ sub collectEvidences
 				next unless(%$intersect);
 				$no++;
 				$distance = distance($hit1->{linkage}, $hit2->{linkage});
-				print OUT "$no\t$qryid1\t$qryid2\t$hit1->{end}\t$hit2->{end}\t$refid\t$distance\n";
+				print $out "$no\t$qryid1\t$qryid2\t$hit1->{end}\t$hit2->{end}\t$refid\t$distance\n";
 			}
 		}
 	}
-	close OUT;
+	return $no;
 }
 
 sub intersect
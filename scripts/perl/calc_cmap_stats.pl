@@ -15,6 +15,13 @@ use Getopt::Long qw(:config no_ignore_case bundling);
 use Scalar::Util qw(looks_like_number);
 use Cwd qw(abs_path);
 
+BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
+}
+
+use BNG::Utility;
+
 my $dir=dirname($0);
 require "$dir/msg.pm";
 
@@ -71,28 +78,12 @@ foreach my $file ( @ARGV ){
 	my $name = $file;
 	$name =~ s/^.*\///;
 
-	my ($idCol, $lenCol);
-	my $line = `grep -m 1 '^#h' $file`;
-	$line =~ s/^#h\s+//;
-	chomp($line);
-	my @columns = split(/\t/, $line);
-	for( my $i=0; $i<scalar(@columns); $i++ ){
-		if( $columns[$i] eq 'CMapId' ){
-			$idCol = $i+1;
-		}
-		elsif( $columns[$i] eq 'ContigLength' ){
-			$lenCol = $i+1;
-		}
-	}
-	&dieMsg("File '$file' format is incorrect.") unless( $idCol and $lenCol );
-
 	&infoMsg($name, 'Loading file', 32);
-	open(IN, "grep -v '^#' $file | cut -f$idCol,$lenCol | uniq | cut -f2 | ") or die $!;
-	my @len = <IN>;
-	chomp(@len);
-	close IN;
+	# the lengths are summarized once, and kept next to the file
+	my $summary = summarizeFile($file);
+	&dieMsg("File '$file' format is incorrect.") unless( $summary->{type} eq 'cmap' );
 
-	my @ret = &stats(@len);
+	my @ret = summarizeLengths(@{$summary->{lengths}});
 
 	if( $fmt ){
 		print $fh "\n" if($null);
@@ -115,47 +106,3 @@ foreach my $file ( @ARGV ){
 close $fh;
 print "\n";
 exit(0);
-
-# =============================================================================================================
-sub stats
-{
-	my @len = sort {$b<=>$a} @_;
-
-	my $qty = scalar(@len);
-	if( $qty == 0 ){
-		return ('NA', 'NA', 'NA', 'NA', 'NA', 'NA', 'NA');
-	}
-
-	my $ratio = 10 ** 6;
-
-	my $median = 0;
-	my $m = int($qty/2);
-	if( $qty%2 ){
-		$median = $len[$m];
-	}
-	else{
-		$median = ($len[$m-1] + $len[$m]) / 2;
-	}
-	$median = sprintf("%.3f", $median/$ratio);
-
-	my $min = sprintf("%.3f", $len[-1]/$ratio);
-	my $max = sprintf("%.3f", $len[0]/$ratio);
-
-	my $total = eval join('+', @len);
-	my $mean = sprintf("%.3f", $total/($qty*$ratio));
-
-	my $half = $total / 2;
-	my ($n50, $n50val) = (0, 0);
-	for(my $i=0; $i<$qty; $i++){
-		$n50 += $len[$i];
-		if( $n50 >= $half ){
-			$n50val = $len[$i];
-			last;
-		}
-	}
-
-	$total = sprintf("%.3f", $total/$ratio);
-	$n50val = sprintf("%.3f", $n50val/$ratio);
-
-	return ($qty, $min, $median, $mean, $n50val, $max, $total);
-}
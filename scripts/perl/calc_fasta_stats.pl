@@ -15,6 +15,13 @@ use Getopt::Long qw(:config no_ignore_case bundling);
 use Scalar::Util qw(looks_like_number);
 use Cwd qw(abs_path);
 
+BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
+}
+
+use BNG::Utility;
+
 my $dir=dirname($0);
 require "$dir/msg.pm";
 
@@ -70,17 +77,10 @@ foreach my $file ( @ARGV ){
 
 	&infoMsg($name, 'Loading file', 32);
 
-	my $line;
-	my @len = ();
-	open(IN, '<', $file) or die $!;
-	while( defined($line=<IN>) ){
-		next if( $line =~ /^>/ );
-		chomp($line);
-		push @len, length($line);
-	}
-	close IN;
+	# the lengths of the sequences are summarized once, and kept next to the file
+	my $summary = summarizeFile($file);
 
-	my @ret = &stats(@len);
+	my @ret = summarizeLengths(@{$summary->{lengths}});
 
 	if( $fmt ){
 		print $fh "\n" if($null);
@@ -103,47 +103,3 @@ foreach my $file ( @ARGV ){
 close $fh;
 print "\n";
 exit(0);
-
-# =============================================================================================================
-sub stats
-{
-	my @len = sort {$b<=>$a} @_;
-
-	my $qty = scalar(@len);
-	if( $qty == 0 ){
-		return ('NA', 'NA', 'NA', 'NA', 'NA', 'NA', 'NA');
-	}
-
-	my $ratio = 10 ** 6;
-
-	my $median = 0;
-	my $m = int($qty/2);
-	if( $qty%2 ){
-		$median = $len[$m];
-	}
-	else{
-		$median = ($len[$m-1] + $len[$m]) / 2;
-	}
-	$median = sprintf("%.3f", $median/$ratio);
-
-	my $min = sprintf("%.3f", $len[-1]/$ratio);
-	my $max = sprintf("%.3f", $len[0]/$ratio);
-
-	my $total = eval join('+', @len);
-	my $mean = sprintf("%.3f", $total/($qty*$ratio));
-
-	my $half = $total / 2;
-	my ($n50, $n50val) = (0, 0);
-	for(my $i=0; $i<$qty; $i++){
-		$n50 += $len[$i];
-		if( $n50 >= $half ){
-			$n50val = $len[$i];
-			last;
-		}
-	}
-
-	$total = sprintf("%.3f", $total/$ratio);
-	$n50val = sprintf("%.3f", $n50val/$ratio);
-
-	return ($qty, $min, $median, $mean, $n50val, $max, $total);
-}
@@ -17,6 +17,13 @@ use Scalar::Util qw(looks_like_number);
 use Cwd qw(abs_path getcwd);
 use POSIX qw(ceil);
 
+BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
+}
+
+use BNG::Utility;
+
 my $dir=dirname($0);
 require "$dir/msg.pm";
 
@@ -52,68 +59,22 @@ select STDERR;
 &dieMsg("File '$opt_q' does not exist.") unless( -s $opt_q );
 &dieMsg("File '$opt_r' does not exist.") unless( -s $opt_r );
 
-my $line;
-my @columns;
-
-my %cmapLengthRef = ();
+# the lengths of the reference maps and the coverage of each by the alignments are summarized
+# in one pass over each file, and kept next to the files
 &infoMsg($opt_r, 'Loading file', 32);
-open(IN, '<', $opt_r) or die("Can not open '$opt_r' for reading.\n");
-while( defined($line=<IN>) ){
-	next if( $line =~ /^#/ );
-	chomp($line);
-	@columns = split(/\t/, $line);
-
-	if( scalar(@columns)>4 and $columns[4]==0 ){
-		$cmapLengthRef{$columns[0]} = {
-			size				=> $columns[1],
-			overlapRef 			=> [],
-			sumCoverage			=> 0,
-			nrCoverage			=> 0,
-			nrPercentCoverage	=> 0
-		};
-	}
-}
-close IN;
-
+my $refs = summarizeFile($opt_r);
+&dieMsg("File '$opt_r' format is incorrect.") unless( $refs->{type} eq 'cmap' );
 &infoMsg($opt_q, 'Loading file', 32);
-open(IN, '<', $opt_q) or die("Can not open '$opt_q' for reading.\n");
-while( defined($line=<IN>) ){
-	next if( $line =~ /^#/ );
-	chomp($line);
-	$line =~ s/^\s+//;
-	$line =~ s/\s+/\t/g;
-	@columns = split(/\t/, $line);
-	my ($qId, $refId, $qStart, $qEnd, $start, $end) = @columns[1..6];
-	&dieMsg("Cannot get reference contig '$refId' information") unless( $cmapLengthRef{$refId} );
-	push(@{$cmapLengthRef{$refId}{overlapRef}}, {start => $start, end => $end});
-}
-close IN;
+my $hits = summarizeFile($opt_q);
+&dieMsg("File '$opt_q' format is incorrect.") unless( $hits->{type} eq 'xmap' );
 
 &infoMsg("Calculating coverage ... ");
-foreach my $id (keys %cmapLengthRef){
-	next unless(scalar(@{$cmapLengthRef{$id}{overlapRef}}));
-
-	$cmapLengthRef{$id}{overlapRef} = &sortByCoord($cmapLengthRef{$id}{overlapRef}, 'start');
-	my $oStart = $cmapLengthRef{$id}{overlapRef}[0]{start};
-	my $oEnd = $cmapLengthRef{$id}{overlapRef}[0]{end};
-	my $oSizeSum = 0;
-	my $redundantSizeSum = $oEnd - $oStart;
-	for( my $i=1; $i<scalar(@{$cmapLengthRef{$id}{overlapRef}}); $i++ ){
-		my $iRef = $cmapLengthRef{$id}{overlapRef}[$i];
-		$redundantSizeSum += ($iRef->{end} - $iRef->{start});
-		if( $oStart <= $iRef->{start} and $iRef->{start} <= $oEnd ){
-			$oEnd = ($oEnd < $iRef->{end}) ? $iRef->{end} : $oEnd;
-		}
-		else{
-			$oSizeSum += ($oEnd - $oStart);
-			$oStart = $iRef->{start};
-			$oEnd = $iRef->{end};
-		}
-	}
-	$oSizeSum += ($oEnd - $oStart);
-	$cmapLengthRef{$id}{sumCoverage} = $redundantSizeSum;
-	$cmapLengthRef{$id}{nrCoverage} = $oSizeSum;
-	$cmapLengthRef{$id}{nrPercentCoverage} = ($oSizeSum / $cmapLengthRef{$id}{size} * 100);
+my %cmapLengthRef = ();
+for( my $i=0; $i<scalar(@{$refs->{ids}}); $i++ ){
+	$cmapLengthRef{$refs->{ids}[$i]} = $refs->{lengths}[$i];
+}
+foreach my $refId (keys %{$hits->{coverage}}){
+	&dieMsg("Cannot get reference contig '$refId' information") unless( exists $cmapLengthRef{$refId} );
 }
 print "done\n";
 
@@ -127,21 +88,13 @@ else{
 }
 
 print $fh "refContig\trefContig_size\tquery_cov_bp\tquery_unique_cov_bp\tquery_unique_cov_percent\n";
-foreach my $id ( keys %cmapLengthRef ){
-	my $cRef = $cmapLengthRef{$id};
-	my $sNrPercentCoverage = sprintf("%.2f", $cRef->{nrPercentCoverage});
-	print $fh join("\t", $id, $cRef->{size}, $cRef->{sumCoverage}, $cRef->{nrCoverage}, $sNrPercentCoverage)."\n";
+foreach my $id ( @{$refs->{ids}} ){
+	my $size = $cmapLengthRef{$id};
+	my ($sumCoverage, $nrCoverage) = ($hits->{coverage}{$id}) ? @{$hits->{coverage}{$id}} : (0, 0);
+	my $sNrPercentCoverage = sprintf("%.2f", $nrCoverage / $size * 100);
+	print $fh join("\t", $id, $size, $sumCoverage, $nrCoverage, $sNrPercentCoverage)."\n";
 }
 
 close $fh;
 print "\n";
 exit(0);
-
-# =====================================================================================================================
-sub sortByCoord
-{
-	my ($hRef, $coord) = @_;
-
-	@$hRef = sort {$a->{$coord} <=> $b->{$coord}} @$hRef;
-	return $hRef;
-}
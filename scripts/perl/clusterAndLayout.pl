@@ -13,6 +13,8 @@ use warnings;
 use Getopt::Long;
 use File::Basename;
 use List::MoreUtils qw(uniq);
+use List::Util qw[min max];
+use Parallel::ForkManager;
 use Math::Round;
 use Cwd 'abs_path';
 use Switch;
@@ -38,17 +40,19 @@ Usage: $program [options]
 	-e, --edges <str>   The TSV file containing the edge information of nodes (REQUIRED)
 	-g, --glues <str>   The TSV file containing the glue information of edges (REQRUIED)
 	-o, --output <str>  The path of the output table (default: STDOUT)
+	-t, --thread <num>  The number of threads, more than one to lay out the connected components of the graph in parallel (default: 1)
 	-h, --help          Help
 
 Example:
 	$program -r BSPQI_r.cmap -r BSSSI_r.cmap -e edges.tsv -g glues.tsv -o layout
 USAGE
 
-use vars qw(@opt_r $opt_e $opt_g $opt_o $opt_h);
+use vars qw(@opt_r $opt_e $opt_g $opt_o $opt_t $opt_h);
 GetOptions( "r|reference=s" => \@opt_r,
 			"e|edges=s" => \$opt_e,
 			"g|glues=s" => \$opt_g,
 			"o|output=s" => \$opt_o,
+			"t|thread=i" => \$opt_t,
 			"h|help" => \$opt_h);
 
 die($usage) if($opt_h);
@@ -58,6 +62,7 @@ die("**ERROR: -e option must be specified\n") unless(defined $opt_e);
 die("**ERROR: -g option must be specified\n") unless(defined $opt_g);
 
 die("Only one of '-e' and '-g' can be specified as STDIN\n") if( ($opt_e eq "-") and ($opt_g eq "-") );
+my $nthreads = (defined $opt_t and ($opt_t > 0)) ? $opt_t : 1;
 
 my $outfile;
 if(defined $opt_o){
@@ -87,9 +92,14 @@ my $edgeTable = &readTable($opt_e, ["id_str", "nglues", "overlap", "intercept",
 my $glueTable = &readTable($opt_g, ["ID", "QryContigID", "QryLen", "type1", "RefContigID.x", "RefLen.x", "type2", "RefContigID.y", "RefLen.y", "Orientation.x", "Orientation.y", "Overlap", "Confidence.x", "Confidence.y", "QryStartPos.x", "QryEndPos.x", "RefStartPos.x", "RefEndPos.x", "QryStartPos.y", "QryEndPos.y", "RefStartPos.y", "RefEndPos.y", "OriContigID.x", "offset.x", "len.x", "OriContigID.y", "offset.y", "len.y"]);
 
 my $graph = &buildGraph($edgeTable, $glueTable, \@cmaps);
-my $cluster_pool = &traverseGraph($graph);
-
-my ($paths, $headers) = &makeLayouts($graph->{nodes}, $cluster_pool);
+my ($paths, $headers);
+if($nthreads > 1){
+	($paths, $headers) = &layoutComponents($graph, &partitionGraph($graph), $nthreads);
+}
+else{
+	my $cluster_pool = &traverseGraph($graph);
+	($paths, $headers) = &makeLayouts($graph->{nodes}, $cluster_pool);
+}
 &outputLayouts($paths, $headers, $outfile);
 
 exit 0;
@@ -103,8 +113,7 @@ sub readTable
 	if($infile eq "-"){
 		$in = \*STDIN;
 	} else {
-		open(IN, "$infile") or die("Can not open \"$infile\" for reading\n");
-		$in = \*IN;
+		$in = openInput($infile);
 	}
 	my @fields = ();
 	my $nfields = 0;
@@ -366,7 +375,9 @@ sub traverseGraph
 #		checkCluster($cluster); # For DEBUG
 	}
 	my @uniq_ids = grep {defined $cluster_pool->{clusters}->[$_]} (uniq values %clsid);
-	my @sorted_ids = sort {scalar(keys %{$cluster_pool->{clusters}->[$b]->{locations}}) <=> scalar(keys %{$cluster_pool->{clusters}->[$a]->{locations}})} (@uniq_ids);
+	# the clusters of the same size are ordered by their smallest node IDs to make the order reproducible
+	my %firsts = map { $_ => min(keys %{$cluster_pool->{clusters}->[$_]->{locations}}) } (@uniq_ids);
+	my @sorted_ids = sort {scalar(keys %{$cluster_pool->{clusters}->[$b]->{locations}}) <=> scalar(keys %{$cluster_pool->{clusters}->[$a]->{locations}}) || $firsts{$a} <=> $firsts{$b}} (@uniq_ids);
 	my @clusters = ();
 	my $no = 0;
 	foreach my $id (@sorted_ids){
@@ -382,6 +393,88 @@ sub traverseGraph
 	return $cluster_pool;
 }
 
+##
+# split the edges into the connected components of the graph with union-find, each component keeps
+# its edges in their original order and the components are ordered by their smallest node IDs
+##
+sub partitionGraph
+{
+	my ($graph) = @_;
+	my @parent = ();
+	my ($root1, $root2);
+	foreach my $edge (@{$graph->{edges}}){
+		($root1, $root2) = (findRoot(\@parent, $edge->{id1}), findRoot(\@parent, $edge->{id2}));
+		$parent[max($root1, $root2)] = min($root1, $root2) if($root1 != $root2);
+	}
+	my %components = ();
+	foreach my $edge (@{$graph->{edges}}){
+		push(@{$components{findRoot(\@parent, $edge->{id1})}}, $edge);
+	}
+	return [map { $components{$_} } sort { $a <=> $b } keys %components];
+}
+
+sub findRoot
+{
+	my ($parent, $id) = @_;
+	my $root = $id;
+	while(defined $parent->[$root] and $parent->[$root] != $root){
+		$root = $parent->[$root];
+	}
+	# compress the path to the root
+	while($id != $root){
+		($parent->[$id], $id) = ($root, $parent->[$id]);
+	}
+	return $root;
+}
+
+##
+# cluster and lay out the connected components independently in a pool of worker processes, then
+# order the paths as traverseGraph orders the clusters, i.e. by their sizes and their smallest node IDs
+##
+sub layoutComponents
+{
+	my ($graph, $components, $nthreads) = @_;
+	# more batches than workers, filled with the largest components first, to balance the workers
+	my $nbatches = min($nthreads * 4, scalar(@{$components}));
+	my @batches = map { [] } (1..$nbatches);
+	my @loads = (0) x $nbatches;
+	foreach my $i (sort { scalar(@{$components->[$b]}) <=> scalar(@{$components->[$a]}) || $a <=> $b } (0..$#{$components})){
+		my $k = 0;
+		for(my $j=1; $j<$nbatches; $j++){
+			$k = $j if($loads[$j] < $loads[$k]);
+		}
+		push(@{$batches[$k]}, $i);
+		$loads[$k] += scalar(@{$components->[$i]});
+	}
+	my @layouts = ();
+	my $pm = Parallel::ForkManager->new($nthreads);
+	$pm->run_on_finish(
+		sub{
+			my ($pid, $exit_code, $ident, $exit_signal, $core_dump, $data_structure_reference) = @_;
+			die("**ERROR: failed to lay out the connected components\n") if($exit_code != 0 or !defined $data_structure_reference);
+			foreach my $i (keys %{$data_structure_reference}){
+				$layouts[$i] = $data_structure_reference->{$i};
+			}
+		}
+	);
+	foreach my $batch (@batches){
+		$pm->start and next;
+		# forked thread
+		my %result = ();
+		foreach my $i (@{$batch}){
+			my $cluster_pool = &traverseGraph({%{$graph}, edges=>$components->[$i]});
+			($result{$i}) = &makeLayouts($graph->{nodes}, $cluster_pool);
+		}
+		$pm->finish(0, \%result);
+	}
+	$pm->wait_all_children;
+
+	my @paths = map { [min(map { $_->{node_id} } @{$_}), $_] } (map { @{$_} } @layouts);
+	@paths = map { $_->[1] } sort { scalar(@{$b->[1]}) <=> scalar(@{$a->[1]}) || $a->[0] <=> $b->[0] } @paths;
+	my (undef, $headers) = &makeLayouts($graph->{nodes}, {clusters=>[]});
+	return (\@paths, $headers);
+}
+
 sub checkCluster
 {
 	my ($cluster) = @_;
@@ -2099,7 +2192,7 @@ sub makeLayout
 			push(@layout, {node_id=>$nodeId, ori_id=>$node->{ori_id}, type=>$type, dir=>$dir, start=>$offset2, end=>$offset1, xstart=>$coor2, xend=>$coor1, xlength=>$node->{length}});
 		}
 	}
-	@layout = sort{ $a->{start} <=> $b->{start} } @layout;
+	@layout = sort{ $a->{start} <=> $b->{start} || $a->{node_id} <=> $b->{node_id} } @layout;
 	return \@layout;
 }
 
@@ -2108,8 +2201,7 @@ sub outputLayouts
 	my ($paths, $headers, $outfile) = @_;
 	my $out;
 	if(defined $outfile){
-		open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing\n");
-		$out = \*OUT;
+		$out = openOutput($outfile);
 	}
 	else{
 		$out = \*STDOUT;
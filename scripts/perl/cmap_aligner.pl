@@ -14,6 +14,8 @@ use Getopt::Long;
 use File::Basename;
 use Cwd 'abs_path';
 use XML::Simple;
+use List::Util qw[min max];
+use Parallel::ForkManager;
 
 BEGIN{
 	my $progpath = abs_path(dirname($0));
@@ -34,8 +36,16 @@ Usage: $program [options]
 	-q, --query <str>     The query CMAP file for alignment (REQUIRED)
 	-o, --output <str>    The output path (REQUIRED)
 	-t, --threads <int>   The number of threads for parallel processing (default: 8)
+	-n, --shards <int>    Split the reference into this number of shards aligned separately and merged (default: \$MOMS_ALIGN_SHARDS or 1)
+	-g, --grid <str>      Submit the shards as an SGE array job with these qsub options instead of running them locally (default: \$MOMS_ALIGN_GRID)
+	-p, --grid-threads <int> The number of threads of each shard submitted to SGE (default: \$MOMS_ALIGN_GRID_THREADS or -t)
+	-m, --grid-mem <int>  The memory (in GB) of each shard submitted to SGE (default: \$MOMS_ALIGN_GRID_MEM or maxmem of the XML)
 	-h, --help            Help
 
+	The sharded alignments can differ from an unsharded run: -BestRef is applied within each shard by RefAligner
+	and then across the shards by the highest confidence, and the .err/.errbin are those of the shard with the
+	most alignments rather than an estimate over the whole reference.
+
 Options for invoking \$bionano/binary/RefAligner:
 	-s, --stage           The stage of the alignment (first|BNG|final) (default: first)
 	-c, --hashcolor <int> Set the hashcolor for the final stage (default: 1)
@@ -45,13 +55,17 @@ Example:
 	$program -r ngs_assembly.cmap -q bng_assembly.cmap -o align
 USAGE
 
-use vars qw($opt_r $opt_q $opt_s $opt_c $opt_o $opt_t $opt_h $opt_x);
+use vars qw($opt_r $opt_q $opt_s $opt_c $opt_o $opt_t $opt_n $opt_g $opt_p $opt_m $opt_h $opt_x);
 GetOptions( "r|reference=s" => \$opt_r,
 			"q|query=s" => \$opt_q,
 			"s|stage=s" => \$opt_s,
 			"c|hashcolor=i" => \$opt_c,
 			"o|output=s" => \$opt_o,
 			"t|threads=i" => \$opt_t,
+			"n|shards=i" => \$opt_n,
+			"g|grid=s" => \$opt_g,
+			"p|grid-threads=i" => \$opt_p,
+			"m|grid-mem=i" => \$opt_m,
 			"x|xml=s" => \$opt_x,
 			"h|help" => \$opt_h);
 
@@ -77,6 +91,10 @@ my $qrycmap = $opt_q;
 my $optxml = (defined $opt_x) ? $opt_x : "$bionano/xml/alignArguments.xml";
 my $stage = (defined $opt_s) ? $opt_s : "first";
 my $color = (defined $opt_c) ? $opt_c : 1;
+my $nshards = (defined $opt_n) ? $opt_n : ((defined $ENV{MOMS_ALIGN_SHARDS} && $ENV{MOMS_ALIGN_SHARDS} =~ /^\d+$/) ? $ENV{MOMS_ALIGN_SHARDS} : 1);
+my $grid = (defined $opt_g) ? $opt_g : $ENV{MOMS_ALIGN_GRID};
+my $gridThreads = (defined $opt_p) ? $opt_p : ((defined $ENV{MOMS_ALIGN_GRID_THREADS} && $ENV{MOMS_ALIGN_GRID_THREADS} =~ /^\d+$/) ? $ENV{MOMS_ALIGN_GRID_THREADS} : undef);
+my $gridMem = (defined $opt_m) ? $opt_m : ((defined $ENV{MOMS_ALIGN_GRID_MEM} && $ENV{MOMS_ALIGN_GRID_MEM} =~ /^\d+$/) ? $ENV{MOMS_ALIGN_GRID_MEM} : undef);
 
 my ($outdir, $outpre);
 if($opt_o =~ /\/$/ or $opt_o !~ /\//){
@@ -117,7 +135,8 @@ my $maxthreads = $paraDict->{'maxthreads'}{val};
 my $maxvirtmem = (defined $paraDict->{'maxvirtmem'}{val}) ? $paraDict->{'maxvirtmem'}{val} : 0;
 my $nthreads =  (defined $opt_t && ($opt_t =~ /^\d+$/)) ? (($opt_t < 1) ? 1 : $opt_t) : $maxthreads;
 
-my $sharedParams = "-stdout -stderr -maxmem $maxmem -maxthreads $maxthreads -maxvirtmem $maxvirtmem";
+# RefAligner is held to -t, the share of the threads given to this alignment, the maxthreads of the XML being its default
+my $sharedParams = "-stdout -stderr -maxmem $maxmem -maxthreads $nthreads -maxvirtmem $maxvirtmem";
 if(defined $paraDict->{'RAmem'}{val}){
 	$sharedParams .= " -RAmem " . $paraDict->{'RAmem'}{val};
 }
@@ -125,12 +144,103 @@ $sharedParams .= " -hashcolor $color" if($stage eq "final");
 my $paraStage = parseConfig($configs, "stage_${stage}");
 my $params = makeParams($paraStage);
 
+if($nshards > 1){
+	&alignShards($nshards, $grid);
+	exit(0);
+}
+
 $cmd = "$refaligner -ref $refcmap -i $qrycmap -o $outdir/$outpre $sharedParams $params;";
 print "$cmd\n";
 system("$cmd");
+&compressOutputs("$outdir/$outpre");
 
 #my $nhits = `grep -c '^[^#]' $outdir/$outpre.xmap 2>/dev/null | tr -d '\n'`;
 #$nhits = 0 unless($nhits ne "");
 #printf "%5s alignments found.\n", $nhits;
 
 exit(0);
+
+##
+# gzip the alignments and the log written by RefAligner right away when the step compresses its outputs,
+# the error parameters are kept plain for the following RefAligner runs
+##
+sub compressOutputs
+{
+	my ($prefix) = @_;
+	return unless($ENV{MOMS_COMPRESS});
+	my @files = grep { -f $_ } map { "$prefix$_" } (".xmap", "_r.cmap", "_q.cmap", ".stdout");
+	return unless(@files);
+	system("$ENV{MOMS_COMPRESS} " . join(" ", @files)) == 0 or die("**ERROR: can not compress the outputs of $prefix\n");
+}
+
+##
+# align the query to shards of the reference, either as local processes sharing the threads and memory
+# or as the tasks of an SGE array job sized by their own request, then merge the alignments into the usual outputs
+##
+sub alignShards
+{
+	my ($nshards, $grid) = @_;
+	my $sharddir = abs_path($outdir) . "/${outpre}_shards";
+	system("rm -rf $sharddir; mkdir -p $sharddir") == 0 or die("**ERROR: can not create directory $sharddir\n");
+	my $shards = splitCMapFile($refcmap, $nshards, "$sharddir/ref");
+	$nshards = scalar(@{$shards});
+	my @prefixes = map { "$sharddir/shard_$_" } (1..$nshards);
+	my ($shardThreads, $shardMem);
+	if(defined $grid){
+		$shardThreads = (defined $gridThreads && $gridThreads > 0) ? $gridThreads : $nthreads;
+		$shardMem = (defined $gridMem && $gridMem > 0) ? $gridMem : $maxmem;
+	}
+	else{
+		my $nparallel = min($nshards, $nthreads);
+		$shardThreads = max(1, int($nthreads / $nparallel));
+		$shardMem = max(1, int($maxmem / $nparallel));
+	}
+	# the virtual memory limit, if any, shrinks with the memory of a shard
+	my $shardVirtmem = ($maxvirtmem > 0) ? max(1, int($maxvirtmem * $shardMem / $maxmem)) : 0;
+	(my $shardParams = $sharedParams) =~ s/-maxthreads \d+/-maxthreads $shardThreads/;
+	$shardParams =~ s/-maxmem \S+/-maxmem $shardMem/;
+	$shardParams =~ s/-maxvirtmem \S+/-maxvirtmem $shardVirtmem/;
+	my @cmds = map { "$refaligner -ref $shards->[$_] -i $qrycmap -o $prefixes[$_] $shardParams $params" } (0..($nshards-1));
+	if(defined $grid){
+		for(my $i=0; $i<$nshards; $i++){
+			open(OUT, ">$prefixes[$i].sh") or die("Can not open \"$prefixes[$i].sh\" for writing\n");
+			# the paths of the inputs are relative to the current directory
+			print OUT "#!/bin/bash\ncd " . abs_path(".") . "\n$cmds[$i]\n";
+			close OUT;
+		}
+		open(OUT, ">$sharddir/shards.sh") or die("Can not open \"$sharddir/shards.sh\" for writing\n");
+		print OUT "#!/bin/bash\n#\$ -S /bin/bash\n#\$ -wd $sharddir\n#\$ -N ${outpre}_shards\n#\$ -o shards.\$JOB_ID.log\n#\$ -j y\n";
+		print OUT "bash $sharddir/shard_\${SGE_TASK_ID}.sh\n";
+		close OUT;
+		my $qsub = "qsub -sync y -terse -t 1-$nshards $grid $sharddir/shards.sh";
+		print "$qsub\n";
+		system($qsub);
+	}
+	else{
+		my $pm = new Parallel::ForkManager(min($nshards, $nthreads));
+		foreach my $cmd (@cmds){
+			print "$cmd\n";
+			$pm->start and next;
+			system("$cmd > /dev/null");
+			$pm->finish(0);
+		}
+		$pm->wait_all_children;
+	}
+	foreach my $prefix (@prefixes){
+		die("**ERROR: the alignment of $prefix did not finish\n") unless(-f "$prefix.xmap");
+	}
+	my $nhits = mergeAlignmentShards(\@prefixes, "$outdir/$outpre", defined $paraStage->{'BestRef'} && $paraStage->{'BestRef'}{val});
+	# the error parameters of the shard with the most alignments stand for the whole alignment: the .errbin is
+	# a binary of RefAligner which can not be merged, and the errors (FP, FN, sf, sd, bpp) are those of the query
+	# maps, which every shard aligns in full against a part of the reference balanced by its labels
+	my ($best, $most) = (0, -1);
+	for(my $i=0; $i<$nshards; $i++){
+		my $n = `grep -c '^[^#]' $prefixes[$i].xmap`;
+		($best, $most) = ($i, $n) if($n > $most);
+	}
+	foreach my $suffix (".err", ".errbin"){
+		system("cp $prefixes[$best]$suffix $outdir/$outpre$suffix") if(-f "$prefixes[$best]$suffix");
+	}
+	print "$nhits alignments merged from $nshards shards\n";
+	system("rm -rf $sharddir");
+}
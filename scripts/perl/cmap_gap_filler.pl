@@ -14,7 +14,7 @@ use Getopt::Long;
 use File::Basename;
 use Parallel::ForkManager;
 use Cwd 'abs_path';
-use POSIX qw/ceil/;
+use POSIX qw/ceil floor/;
 use Storable qw(dclone);
 use List::Util qw[min max];
 
@@ -37,6 +37,7 @@ Usage: $program [options]
 	-o, --output <str>  The output path (STDOUT)
 	-a, --add <str>     Additional CMAP(s) containing small contigs for gap filling
 	--addonly           Only use additional CMAP(s)
+	-s, --seeds <num>   The minimum number of seeds shared by a gap and a small contig to align them, 0 for all (default: 3)
 	-t, --thread <num>  The number of threads for parallel computing (default: 4)
 	-h, --help          Help
 
@@ -44,11 +45,12 @@ Example:
 	$program -i BSPQI.hybrid.cmap -a BSPQI.hybrid-BNG-non_used.cmap -o BSPQI.filled
 USAGE
 
-use vars qw($opt_i $opt_o @opt_a $opt_ao $opt_t $opt_h);
+use vars qw($opt_i $opt_o @opt_a $opt_ao $opt_s $opt_t $opt_h);
 GetOptions( "i|cmap=s" => \$opt_i,
 			"o|output=s" => \$opt_o,
 			"a|add=s" => \@opt_a,
 			"addonly" => \$opt_ao,
+			"s|seeds=i" => \$opt_s,
 			"t|thread=i" => \$opt_t,
 			"h|help" => \$opt_h);
 
@@ -75,6 +77,7 @@ else{
 }
 $outfile .= ".cmap";
 my $nthreads = (defined $opt_t and ($opt_t > 0)) ? $opt_t : 4;
+my $minSeeds = (defined $opt_s and ($opt_s >= 0)) ? $opt_s : 3;
 
 # input the cmap file
 my ($cmap) = readCMap($opt_i);
@@ -96,7 +99,8 @@ my $mean_distance = meanLabelDistance($cmap);
 my $gappedFragments = retrieveGappedFragments($cmap, $mean_distance);
 my $smallContigs = gatherSmallContigs(\@cmaps, $mean_distance, (defined $opt_ao ? 1 : 0));
 
-my $matches = matchFragments($gappedFragments, $smallContigs, $nthreads);
+my $index = ($minSeeds > 0) ? buildCandidateIndex($smallContigs, $minSeeds) : undef;
+my $matches = matchFragments($gappedFragments, $smallContigs, $index, $nthreads);
 my $new_cmap = fillCMap(\@cmaps, $matches);
 
 writeCMapFile($new_cmap, "$outdir/$outfile", 1);
@@ -199,13 +203,71 @@ distance	labels		length
 =cut
 }
 
+##
+# index the seeds of the small contigs, i.e. the runs of 3 successive intervals, in both orientations
+##
+sub buildCandidateIndex
+{
+	my ($contigs, $minSeeds) = @_;
+	my %positions = map { $_ => $contigs->[$_]->{positions} } (0..$#{$contigs});
+	# a bucket a bit wider than the fragment size deviation allowed by alignGappedDP (alpha = 0.05),
+	# so that the sizes of two matching intervals never fall more than one bucket apart
+	my $index = buildSeedIndex(\%positions, 3, 1.01 * log(1.05 / 0.95));
+	$index->{spans} = [map { $_->{positions}->[-1] - $_->{positions}->[0] } @{$contigs}];
+	$index->{minSeeds} = $minSeeds;
+	return $index;
+}
+
+##
+# the small contigs likely to fill a gap: every seed of the flanks of the gap looks up the seeds of the
+# small contigs and votes for their offsets, and a small contig is kept if it gathers enough votes
+# around a consistent offset in one orientation. A small contig whose span is too short to bridge
+# the gap is never aligned by alignGappedDP (theta = 0.25) and is skipped
+##
+sub getCandidates
+{
+	my ($gappedFrag, $index) = @_;
+	my $positions = $gappedFrag->{positions};
+	my $mi = $gappedFrag->{offset2} - $gappedFrag->{offset};
+	my $minSpan = $gappedFrag->{gapsize} * 0.75 - 1;
+	# offsets are binned by a quarter of the mean label distance of the flanks, and the adjacent bins
+	# are counted together to absorb the accumulated sizing errors
+	my $binSize = ($positions->[-1] - $positions->[0] - $gappedFrag->{gapsize}) / ($#{$positions} - 1) / 4;
+	my %votes = ();
+	my %seen = ();
+	foreach my $flank ([0, $mi-1], [$mi, $#{$positions}]){
+		searchSeeds($index, $positions, sub {
+			my ($start, $entries) = @_;
+			for(my $x=0; $x<scalar(@{$entries}); $x+=3){
+				my ($id, $orient) = @{$entries}[$x, $x+1];
+				next if($index->{spans}->[$id] < $minSpan);
+				my $bin = floor(($entries->[$x+2] - $start) / $binSize);
+				$votes{"$id,$orient,$flank->[0]"}->{$bin}++ unless($seen{"$start,$id,$orient,$bin"}++);
+			}
+		}, @{$flank});
+	}
+	my %best = ();
+	foreach my $key (keys %votes){
+		my ($id, $orient) = split(/,/, $key);
+		my $bins = $votes{$key};
+		$best{"$id,$orient"} += max(map { ($bins->{$_-1} || 0) + $bins->{$_} + ($bins->{$_+1} || 0) } keys %{$bins});
+	}
+	my %candidates = ();
+	foreach my $key (keys %best){
+		my ($id) = split(/,/, $key);
+		$candidates{$id} = 1 if($best{$key} >= $index->{minSeeds});
+	}
+	return \%candidates;
+}
+
 sub matchFragments
 {
-	my ($gappedFragments, $contigs, $nthreads) = @_;
+	my ($gappedFragments, $contigs, $index, $nthreads) = @_;
 
 	my %matches = ();
 	my @sorted = sort{$contigs->[$a]->{size} <=> $contigs->[$b]->{size}} 0..$#{$contigs};
 	my ($cnt, $total) = (0, scalar(@{$gappedFragments}));
+	my $nAligned = 0;
 	my %gapped = ();
 	foreach (@{$gappedFragments}){
 		$gapped{$_->{cmapid}} = 1;
@@ -219,6 +281,7 @@ sub matchFragments
 			my ($pid, $exit_code, $ident, $exit_signal, $core_dump, $data_structure_reference) = @_;
 			my $id = $data_structure_reference->{input};
 			my $match = $data_structure_reference->{result};
+			$nAligned += $data_structure_reference->{aligned};
 			if(defined $match){
 				if(!defined $matches{$id}){
 					$matches{$id} = [];
@@ -298,10 +361,14 @@ sub matchFragments
 		my $pid = $pm->start and next;
 		# forked thread
 		my ($match, $optimalScore);
+		my $nTried = 0;
+		my $candidates = (defined $index) ? getCandidates($gappedFrag, $index) : undef;
 #		next if(!defined $selected{$id}); # for DEBUG
 		foreach my $idx (@sorted){
+			next if(defined $candidates and !$candidates->{$idx});
 			my $smallFrag = $contigs->[$idx];
 			next if("$smallFrag->{cmapid}" eq "$id");
+			$nTried++;
 #			next if(!grep {/^$smallFrag->{cmapid}$/} @{$selected{$id}}); # for DEBUG
 			my ($alignment, $score, $gapidx) = alignGapped($gappedFrag, $smallFrag);
 			if(scalar(@{$alignment}) > 0){
@@ -326,10 +393,11 @@ sub matchFragments
 				print " ";
 			}
 =cut
-		$pm->finish(0, {result => $match, input => $id});
+		$pm->finish(0, {result => $match, input => $id, aligned => $nTried});
 	}
 	$pm->wait_all_children;
 	print "\n";
+	print "aligned $nAligned of " . ($total * scalar(@sorted)) . " pairs of gaps and small cmaps.\n";
 	return \%matches;
 }
 
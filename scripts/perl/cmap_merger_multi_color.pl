@@ -91,8 +91,7 @@ sub readPaths
 		$infile = "STDIN";
 	}
 	else{
-		open(TSV, "$infile") or die("Can not open \"$infile\" for reading\n");
-		$in = \*TSV;
+		$in = openInput($infile);
 	}
 	my $line;
 	my @fields = ();
@@ -15,6 +15,7 @@ use File::Basename;
 use Cwd qw(abs_path);
 use List::Util qw(min);
 use POSIX;
+use File::Temp qw(tempfile);
 
 BEGIN{
 	my $progpath = abs_path(dirname(abs_path($0)));
@@ -23,13 +24,15 @@ BEGIN{
 	select(STDOUT); $| = 1;
 }
 
+use BNG::Utility;
+
 my $program = basename($0);
 my $usage = << "USAGE";
 $program A perl script for outputing sequences of unused contigs given IDs of used contigs
 Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
 
 Usage: $program [options]:
-	-i, input <str>   The input FASTA file from NGS assembly (REQUIRED)
+	-i, input <str>   The input FASTA file (plain or gzipped) from NGS assembly (REQUIRED)
 	-m, --map <str>   The file containing the mapping information from ID to sequence name (REQUIRED)
 	-t, --trans <str> The file containing the coordinate transformation information when resolving conflicts (REQUIRED)
 	-o, output <str>  The output FASTA file (REQUIRED)
@@ -83,6 +86,7 @@ $cmd = "mkdir -p $outdir";
 $retCode = system($cmd);
 die("**ERROR: Can not create directory \"$outdir\"\n") if($retCode != 0);
 
+my $seqStore; # the file holding the sequences read by readFasta
 my $seqTable = readFasta($ngs_namemap_file, $fasta_file);
 my $contigInfo = readContigInfo($seqTable, $cut_coord_file);
 my $usedIds = readIds($opt_u);
@@ -160,31 +164,14 @@ sub readFasta
 		$rev_map{$name} = $seqid;
 	}
 	close NM;
-	my $seq = "";
-	open(FA, "<$fasta_file") or die("Can not open \"$fasta_file\" for reading\n");
-	while($line = <FA>){
-		chomp($line);
-		if($line =~ /^>(\S+)/){
-			if($seq ne ""){
-				$seqid = $rev_map{$name};
-				if(defined $seqid){
-					$seqTable{$seqid}{seq} = $seq;
-				}
-				else{
-					warn "Warning: $name is not recognized to be a valid NAME, check $namemap_file or $fasta_file\n";
-				}
-				$seq = "";
-			}
-			$name = $1;
-			next;
-		}
-		$seq .= $line;
-	}
-	close FA;
-	if($seq ne ""){
+	# the sequences are kept on disk, and only their locations in memory
+	my $spool_file;
+	($seqStore, $spool_file) = tempfile("${outpre}_XXXXXX", DIR => $outdir, SUFFIX => ".seq", UNLINK => 1);
+	my $spool = spoolFasta($fasta_file, $spool_file);
+	foreach $name (sort { $spool->{$a}->[0] <=> $spool->{$b}->[0] } keys %$spool){
 		$seqid = $rev_map{$name};
 		if(defined $seqid){
-			$seqTable{$seqid}{seq} = $seq;
+			$seqTable{$seqid}{spool} = $spool->{$name};
 		}
 		else{
 			warn "Warning: $name is not recognized to be a valid NAME, check $namemap_file or $fasta_file\n";
@@ -350,7 +337,7 @@ sub retrieveSequence
 	}
 	$dir = "+" if(!defined $dir);
 	$offset = 0 if(!defined $offset or $offset < 0);
-	my $seq = substr($seqTable->{$seqid}{seq}, $offset, $len);
+	my $seq = (defined $seqTable->{$seqid}{spool}) ? readSpooled($seqStore, $seqTable->{$seqid}{spool}, $offset, $len) : "";
 	if($dir ne "+"){
 		$seq = reverseComplement($seq);
 	}
@@ -86,9 +86,9 @@ die("**ERROR: invalid -s option specified\n") if($sub_i !~ /^\d+$/ or $sub_n !~
 my ($xmap_in, $ref_cmap_in, $qry_cmap_in, $ref0_cmap_in, $qry0_cmap_in, $conflict_in) = ($opt_i, $opt_r, $opt_q, $opt_r0, $opt_q0, $opt_c);
 
 # check the input files
-die("**ERROR: XMAP file \"$xmap_in\" does not exist") unless(-f $xmap_in);
-die("**ERROR: reference cmap \"$ref_cmap_in\" does not exist") unless(-f $ref_cmap_in);
-die("**ERROR: query cmap \"$qry_cmap_in\" does not exist") unless(-f $qry_cmap_in);
+die("**ERROR: XMAP file \"$xmap_in\" does not exist") unless(-f inputFile($xmap_in));
+die("**ERROR: reference cmap \"$ref_cmap_in\" does not exist") unless(-f inputFile($ref_cmap_in));
+die("**ERROR: query cmap \"$qry_cmap_in\" does not exist") unless(-f inputFile($qry_cmap_in));
 die("**ERROR: original reference cmap \"$ref0_cmap_in\" does not exist") unless(-f $ref0_cmap_in);
 die("**ERROR: original query cmap \"$qry0_cmap_in\" does not exist") unless(-f $qry0_cmap_in);
 die("**ERROR: conflict file \"$conflict_in\" does not exist") unless(-f $conflict_in);
@@ -583,6 +583,7 @@ sub checkSupportingPaint
 	my ($conflictsAllRef, $paintedQryCmapRef, $paintedRefCmapRef, $max_overhang) = @_;
 
 	my $shiftbp = 30;
+	my (%refIndexes, %qryIndexes) = ((), ());	# the painted labels indexed by position
 	# d if there is no support @ seq junction and no support @ BN junction, then as already in conflictsAllRef
 	# c if there is support @ seq junction and no support @ BN junction, then (if BN's current status is "okay" then turn both to "okay" <- pairmerge will ignore, but if current status is "cut" then leave BN as "cut")
 	# b if there is no support @ seq junction and support @ BN junction, then (if BN's current status is "okay" then leave seq as "cut", but if current status "cut" then turn both to "okay" <- pairmerge will ignore) 
@@ -596,14 +597,17 @@ sub checkSupportingPaint
 			my $cRef = $conflictsAllRef->{$theKey}[$i];
 			my $sign = ($cRef->{qryAlignOrientation} eq '+') ? 1 : -1;
 			my ($rRef, $qRef) = ($paintedRefCmapRef->{$refId}, $paintedQryCmapRef->{$qryId});
+			# the breakpoints are looked up by the starts of the painted intervals only, as findOverlap does
+			$refIndexes{$refId} = makeIntervalIndex([map { $_->{start} } @$rRef]) if (! exists $refIndexes{$refId});
+			$qryIndexes{$qryId} = makeIntervalIndex([map { $_->{start} } @$qRef]) if (! exists $qryIndexes{$qryId});
 			my ($refLeftBkpt, $qryLeftBkpt, $refRightBkpt, $qryRightBkpt) = ($cRef->{refLeftBkpt}, $cRef->{qryLeftBkpt}, $cRef->{refRightBkpt}, $cRef->{qryRightBkpt});
 			if (! ($cRef->{refLeftBkptStatus} eq "okay" && $cRef->{qryLeftBkptStatus} eq "okay"))	{
 				# now check the paint colour at the left breakpoint (remember to shift up the left co-ordinates -- as it was shifted down in AssignAlignType)
-				($cRef->{refLeftBkptStatus}, $cRef->{qryLeftBkptStatus}) = conflictResolveWithAltSupport($refId, $qryId, $refLeftBkpt + $shiftbp, $qryLeftBkpt + $sign * $shiftbp, $cRef->{refLeftBkptStatus}, $cRef->{qryLeftBkptStatus}, $rRef, $qRef, $max_overhang);
+				($cRef->{refLeftBkptStatus}, $cRef->{qryLeftBkptStatus}) = conflictResolveWithAltSupport($refId, $qryId, $refLeftBkpt + $shiftbp, $qryLeftBkpt + $sign * $shiftbp, $cRef->{refLeftBkptStatus}, $cRef->{qryLeftBkptStatus}, $rRef, $qRef, $refIndexes{$refId}, $qryIndexes{$qryId}, $max_overhang);
 			} # if we need to deal with left bkpt
 			if (! ($cRef->{refRightBkptStatus} eq "okay" && $cRef->{qryRightBkptStatus} eq "okay"))	{
 				# remember to shift down the right co-ordinates -- as they were shifted up in AssignAlignType
-				($cRef->{refRightBkptStatus}, $cRef->{qryRightBkptStatus}) = conflictResolveWithAltSupport($refId, $qryId, $refRightBkpt - $shiftbp, $qryRightBkpt - $sign * $shiftbp, $cRef->{refRightBkptStatus}, $cRef->{qryRightBkptStatus}, $rRef, $qRef, $max_overhang);
+				($cRef->{refRightBkptStatus}, $cRef->{qryRightBkptStatus}) = conflictResolveWithAltSupport($refId, $qryId, $refRightBkpt - $shiftbp, $qryRightBkpt - $sign * $shiftbp, $cRef->{refRightBkptStatus}, $cRef->{qryRightBkptStatus}, $rRef, $qRef, $refIndexes{$refId}, $qryIndexes{$qryId}, $max_overhang);
 			} # if we need to deal with the right bkpt
 		}
 	}
@@ -612,14 +616,14 @@ sub checkSupportingPaint
 
 sub conflictResolveWithAltSupport
 {
-	my ($refId, $qryId, $refBkpt, $qryBkpt, $refBkptStatus, $qryBkptStatus, $paintedRefCmapIdRef, $paintedQryCmapIdRef, $max_overhang) = @_;
-	my $refOIndeciesRef = searchForOverlap($refBkpt, $refBkpt, $paintedRefCmapIdRef);	# should have only 1 matching that co-ordinate
+	my ($refId, $qryId, $refBkpt, $qryBkpt, $refBkptStatus, $qryBkptStatus, $paintedRefCmapIdRef, $paintedQryCmapIdRef, $refIndexRef, $qryIndexRef, $max_overhang) = @_;
+	my $refOIndeciesRef = searchOverlaps($refIndexRef, $refBkpt, $refBkpt);	# should have only 1 matching that co-ordinate
 
 	die "ERROR: cut_conflicts conflictResolveWithAltSupport: cannot find the bkpt co-ordinate=$refBkpt for id=$refId in the paintedRefIdCmap array\n" if (scalar(@$refOIndeciesRef) == 0);
 	my ($indexStart, $indexEnd) = (($refOIndeciesRef->[0] - $max_overhang < 0) ? (0) : ($refOIndeciesRef->[0] - $max_overhang), 
 					($refOIndeciesRef->[0] + $max_overhang > $#$paintedRefCmapIdRef) ? ($#$paintedRefCmapIdRef) : ($refOIndeciesRef->[0] + $max_overhang));
 	my ($altSupportForReferenceFlag, $altSupportForReferenceId) = findSupportingPaint($paintedRefCmapIdRef, $indexStart, $indexEnd, $qryId);	# find alt support spanning the conflict region +/- overhang label
-	my $qryOIndeciesRef = searchForOverlap($qryBkpt, $qryBkpt, $paintedQryCmapIdRef);
+	my $qryOIndeciesRef = searchOverlaps($qryIndexRef, $qryBkpt, $qryBkpt);
 	die "ERROR: cut_conflicts conflictResolveWithAltSupport: cannot find the bkpt co-ordinate=$qryBkpt for id=$qryId in the paintedQryIdCmap array\n" if (scalar(@$qryOIndeciesRef) == 0);
 	($indexStart, $indexEnd) = (($qryOIndeciesRef->[0] - $max_overhang < 0) ? (0) : ($qryOIndeciesRef->[0] - $max_overhang),
 					($qryOIndeciesRef->[0] + $max_overhang > $#$paintedQryCmapIdRef) ? ($#$paintedQryCmapIdRef) : ($qryOIndeciesRef->[0] + $max_overhang));
@@ -738,9 +742,10 @@ sub findOverlap
 	my ($data1Ref, $data2Ref) = @_;
 	foreach my $id (keys %$data1Ref)        {
 		die "ERROR: findOverlap: cannot find quality scores information for genome map = $id\n" if (! exists $data2Ref->{$id});
+		my $indexRef = makeIntervalIndex([map { $_->{start} } @{$data2Ref->{$id}}]);
 		for (my $i = 0; $i < scalar(@{$data1Ref->{$id}}); $i += 1)      {
 			my $d1Ref = $data1Ref->{$id}[$i];
-			my $oIndeciesRef = searchForOverlap($d1Ref->{start}, $d1Ref->{end}, $data2Ref->{$id});  
+			my $oIndeciesRef = searchOverlaps($indexRef, $d1Ref->{start}, $d1Ref->{end});
 			for (my $o = 0; $o < scalar(@$oIndeciesRef); $o += 1)   {
 			        # record the coverages and chimeric quality scores of the region
 			        my $d2Ref = $data2Ref->{$id}[$oIndeciesRef->[$o]];
@@ -752,32 +757,6 @@ sub findOverlap
 	return $data1Ref;
 }
 
-sub searchForOverlap
-{
-	my ($qStart, $qEnd, $dataChromRef) = @_;
-	my @oIndecies = ();
-	my $bot = 0;
-	my $top = $#{$dataChromRef};
-	while($top > $bot + 1){
-		my $mid = int(($top + $bot) / 2);
-		if ($dataChromRef->[$mid]{start} < $qStart)       {
-			$bot = $mid;
-		} else  {
-			$top = $mid;
-		}
-	}
-
-	for (my $i = $bot; $i < scalar(@$dataChromRef); $i += 1)     {
-		my $dRef = $dataChromRef->[$i];
-		last if ($dRef->{start} > $qEnd);
-		# any overlap
-		if ( $qStart <= $dRef->{start} )   {
-			push(@oIndecies, $i);
-		}
-	}
-	return \@oIndecies;
-}
-
 sub getQScores
 {
 	my ($file) = @_;
@@ -883,8 +862,8 @@ sub readAlign1Xmap4Paint
 	# xmap4Ref2Paint{$refId}[numAlignment] = {partnerId, confScore, alignmentStartLabel (wrt reference), alignmentEndLabel (wrt reference)}
 	# xmap4Qry2Paint{$refId}[numAlignment] = {partnerId, confScore, alignemntStartLabel (wrt query), alignmentEndLabel (wrt query)}
 
-	open(IN, $file) or die "ERROR: cannot open file $file for reading\n";
-	while (my $line = <IN>)	{
+	my $in = openInput($file);
+	while (my $line = <$in>)	{
 		chomp $line;
 		next if ($line =~ /^#/);	# skip header
 		my @content = split(/\t/, $line);
@@ -916,7 +895,7 @@ sub readAlign1Xmap4Paint
 		push(@{$xmap4Ref2Paint{$refId}}, {confScore => $confScore, alignmentStartLabel => $refStartAlignLabel, alignmentEndLabel => $refEndAlignLabel, partnerId => $qryId});
 		push(@{$xmap4Qry2Paint{$qryId}}, {confScore => $confScore, alignmentStartLabel => $qryStartAlignLabel, alignmentEndLabel => $qryEndAlignLabel, partnerId => $refId});
 	}
-	close IN;
+	close $in;
 	return (\%xmap4Ref2Paint, \%xmap4Qry2Paint);
 }
 
@@ -925,8 +904,8 @@ sub readAlign1Cmap2Paint
 	my ($file) = @_;
 	# assuming that cmap entries are sorted according to their id, and then their position
 	my %cmap2Paint = ();
-	open(IN, $file) or die "ERROR: cannot open file $file for reading.\n";
-	while (my $line = <IN>)	{
+	my $in = openInput($file);
+	while (my $line = <$in>)	{
 		chomp $line;
 		next if ($line =~ /^#/);
 		my @content = split(/\t/, $line);
@@ -937,7 +916,7 @@ sub readAlign1Cmap2Paint
 		# cmap{id}[$labelNumIndex] = {start, end, labelNum, topAlignPartnerId} for both reference and query
 		push(@{$cmap2Paint{$id}}, {start => $position, end => $position, siteId => $siteId, topAlignPartnerId => -1});
 	}
-	close IN;
+	close $in;
 	return \%cmap2Paint;
 }
 
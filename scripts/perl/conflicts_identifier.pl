@@ -72,9 +72,9 @@ die("**ERROR: -o option must be specified\n") if(!defined $opt_o);
 my ($xmap_in, $ref_cmap_in, $qry_cmap_in, $ref0_cmap_in, $qry0_cmap_in) = ($opt_i, $opt_r, $opt_q, $opt_r0, $opt_q0);
 
 # check the input files
-die("**ERROR: XMAP file \"$xmap_in\" does not exist") unless(-f $xmap_in);
-die("**ERROR: reference cmap \"$ref_cmap_in\" does not exist") unless(-f $ref_cmap_in);
-die("**ERROR: query cmap \"$qry_cmap_in\" does not exist") unless(-f $qry_cmap_in);
+die("**ERROR: XMAP file \"$xmap_in\" does not exist") unless(-f inputFile($xmap_in));
+die("**ERROR: reference cmap \"$ref_cmap_in\" does not exist") unless(-f inputFile($ref_cmap_in));
+die("**ERROR: query cmap \"$qry_cmap_in\" does not exist") unless(-f inputFile($qry_cmap_in));
 die("**ERROR: original reference cmap \"$ref0_cmap_in\" does not exist") unless(-f $ref0_cmap_in);
 die("**ERROR: original query cmap \"$qry0_cmap_in\" does not exist") unless(-f $qry0_cmap_in);
 
@@ -99,8 +99,8 @@ my ($T_cutoff, $max_overhang) = (-log($paraDict->{'T_cutoff'}{val})/log(10), $pa
 my $xmap = readXMap($xmap_in);
 my ($ref_cmap) = readCMap($ref_cmap_in);
 my ($qry_cmap) = readCMap($qry_cmap_in);
-my ($orig_ref_cmap) = readCMap($ref0_cmap_in);
-my ($orig_qry_cmap) = readCMap($qry0_cmap_in);
+# the original cmaps are only subset, so they are passed by name and read lazily
+my ($orig_ref_cmap, $orig_qry_cmap) = ($ref0_cmap_in, $qry0_cmap_in);
 
 my ($stickyXMap, $filtered_ref_cmap, $filtered_qry_cmap, $breakpoints) = &createStickXMap($xmap, $ref_cmap, $qry_cmap, $orig_ref_cmap, $orig_qry_cmap, $T_cutoff, $max_overhang);
 
@@ -14,10 +14,14 @@ use File::Basename;
 use Cwd 'abs_path';
 
 BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
 	select(STDERR); $| = 1;
 	select(STDOUT); $| = 1;
 }
 
+use BNG::Utility;
+
 my $program = basename($0);
 my $usage = << "USAGE";
 $program: A perl script for allocating edges 
@@ -52,11 +56,11 @@ my ($type1, $type2);
 my %usedType = ();
 my $outdir;
 foreach my $file (@ARGV){
-	if($file =~ /edges_([^_]*)_([^_]*)\.tsv$/){
+	if($file =~ /edges_([^_]*)_([^_]*)\.tsv(\.gz)?$/){
 		($name1, $name2) = ($1, $2);
 		$file_type = "edge";
 	}
-	elsif($file =~ /glues_([^_]*)_([^_]*)\.tsv$/){
+	elsif($file =~ /glues_([^_]*)_([^_]*)\.tsv(\.gz)?$/){
 		($name1, $name2) = ($1, $2);
 		$file_type = "glue";
 	}
@@ -97,14 +101,14 @@ exit(0);
 sub readTable
 {
 	my ($table, $mustFields, $type1, $type2, $infile) = @_;
-	open(TSV, "$infile") or die("Can not open \"$infile\" for reading\n");
+	my $in = openInput($infile);
 	my $line;
 	my @fields = ();
 	my @indices = ();
 	my ($nfields, $i, $idx);
 	my @columns;
 	my $row;
-	while($line = <TSV>){
+	while($line = <$in>){
 		chomp($line);
 		if(scalar(@fields) == 0){
 			@fields = split(/\t/, $line);
@@ -125,7 +129,7 @@ sub readTable
 		($row->{type1}, $row->{type2}) = ($type1, $type2);
 		push(@{$table}, $row);
 	}
-	close TSV;
+	close $in;
 
 	die("**ERROR: some of the required fields is missing in \"$infile\"\n") unless(scalar(@indices) == scalar(@$mustFields));
 
@@ -234,19 +238,19 @@ sub writeTable
 {
 	my ($table, $fields, $outfile) = @_;
 
-	open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing.\n");
-	print OUT join("\t", @{$fields}) . "\n";
+	my $out = openOutput($outfile);
+	print $out join("\t", @{$fields}) . "\n";
 	my ($i, $j);
 	my $no = scalar(@{$table});
 	for($i=0; $i<$no; $i++){
 		for($j=0; $j<scalar(@{$fields}); $j++){
-			print OUT $table->[$i]->{$fields->[$j]};
+			print $out $table->[$i]->{$fields->[$j]};
 			if($j != $#{ $fields }){
-				print OUT "\t";
+				print $out "\t";
 			} else {
-				print OUT "\n";
+				print $out "\n";
 			}
 		}
 	}
-	close OUT;
+	close $out;
 }
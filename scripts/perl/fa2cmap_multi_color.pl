@@ -14,7 +14,7 @@
 # Options:                                                                      #
 #   -h : This help message                                                      #
 #   -v : Print program version information                                      #
-#   -i : Input fasta file (Required)                                            #
+#   -i : Input fasta file, plain or gzipped (Required)                          #
 #   -k : Input key file (If provided, use as contigIDs rather than sequentially)#
 #   -o : Output folder (Default: the same as the input file)                    #
 #   -e : Name or sequence of the enzyme (or a combination of name and sequence  #
@@ -25,6 +25,7 @@
 #   -g : Minimum N gap size (bp) when generating Nbase gap file (Default: 1000) #
 #   -W : For web use only, and must be the first option (Default: OFF)          #
 #   -S : Add an additional column, Strand, to the cmap file (Default: OFF)      #
+#   -s : Also output the single-channel cmap of each enzyme (Default: OFF)      #
 #                                                                               #
 # NOTE: CMAP index is 1-based, and is color-aware.                              #
 #################################################################################
@@ -45,9 +46,12 @@ use Getopt::Long qw(:config no_ignore_case);
 sub Init;
 sub Usage;
 sub Version;
+sub Process_contig;
 sub Find_enzymes;
+sub New_output;
 sub Print_cmap_header;
 sub Generate_cmap;
+sub Finish_output;
 sub Get_and_set_enzyme_sequence;
 sub is_enzyme_name;
 sub is_nt_sequence;
@@ -55,8 +59,10 @@ sub is_enzyme_name_and_sequence;
 sub Uniq;
 sub Get_distance;
 sub Get_N50;
+sub Get_N50_hist;
 sub Get_N90;
 sub StdDev;
+sub StdDev_hist;
 sub getNGaps;
 sub printNGaps;
 
@@ -75,7 +81,7 @@ my %enzyme = (
 );
 my (@enzymes, @enzyme_sequences, @color, @color_uniq);
 my ($min_labels, $min_length, $minNGapSize) = (0, 0, 1000);
-my ($FASTA, $CMAP, $KEY, $BED, $SUMMARY, $ERROR, $KEY_IN);
+my ($FASTA, $BED, $ERROR, $KEY_IN);
 
 # Autoflush for files
 local $| = 1;
@@ -85,101 +91,57 @@ my $argvs = "";
 for(my $i = 0; $i <= $num_args; $i++){
 	$argvs .= " $ARGV[$i]";
 }
-my ($help, $version, $web, $strand, $keyfile, $input, $output, $nbase_bed, $bedfile);
+my ($help, $version, $web, $strand, $single, $keyfile, $input, $output, $nbase_bed, $bedfile);
 my ($strand_header, $strand_header_type) = ("", "");
-my (@loci, @loci_tmp);
-my (%color, %color_to_enzyme_sequence, %strand);
-my ($count, $num_cmaps, $total_nicks) = (0, 0, 0);
-my @num_nicks;  # For each channel
-my @num_nicks_global;  # For each channel
-my @density;  # For each channel
-my @total_label_distance;  # For each channel
-my @label_distances_by_channel;  # Two-dimensional array containing label distances of each channel
-my $density_global;
-my ($total_length_original, $total_length_filtered, $total_label_distance_filtered) = (0, 0, 0);
-my (@length_filtered, @label_distance_filtered);
+my %color_to_enzyme_sequence;
+my @patterns;  # [motif, enzyme index, strand] of each enzyme and of its reverse complement
+my %motifs;  # Indices in @patterns sharing the same motif
+my @outputs;  # The multi-color cmap, followed by the single-channel cmaps when requested
+my $count = 0;
+my $total_length_original = 0;
 my $nGaps = {};  # hashref variable for NGap begin/end with minNGapSize - Zhanyang
 
-my ($command, $seq, $seq_length, $tmp);
-my ($fastaHeader, $fastaHeader_previous);
-my ($A, $C, $G, $T, $N, $global_N, $global_GC, $global_ACGT, $global_ACGTN);
-my ($N_percentage, $GC_percentage, $global_N_percentage, $global_GC_percentage);
+my ($command, $seq, $out_dir);
+my ($fastaHeader, $print_bed);
+my ($global_N, $global_GC, $global_ACGT, $global_ACGTN);
 
 Init();
-my ($filename, $filename_key, $filename_bed, $filename_summary, $filename_error) = ($input) x 6;
-
-for(my $i = 0; $i < @color_uniq; $i++){
-	@num_nicks_global[$color_uniq[$i]] = 0;
-}
-for(my $i = 0; $i < @enzymes; $i++){
-	$tmp .= "_$enzymes[$i]";
-}
+my ($filename_bed, $filename_error) = ($input) x 2;
 
 # If output folder is not defined, use the input folder
 if($output){
-	#if(substr($output, -1) eq "/"){
-	#	$filename = $output . (split("/", $input))[-1];
-	#	$filename_key = $output . (split("/", $input))[-1];
-	#}
-	#else{
-	#	$filename = $output . "/" . (split("/", $input))[-1];
-	#	$filename_key = $output . "/" . (split("/", $input))[-1];
-	#}
-	
 	# TODO: Convert ".." to absolute path!
-	my ($nothing, $out_dir) = fileparse($output."/");
-	#mkdir($out_dir);
+	my $nothing;
+	($nothing, $out_dir) = fileparse($output."/");
 	make_path($out_dir) unless (-d $out_dir);
-	#print "\nOUTPUT_DIR\n", $out_dir, "\n\n";
 	
-	$filename = basename($filename);
-	$filename = catfile($out_dir, $filename);
-	$filename_key = basename($filename_key);
-	$filename_key = catfile($out_dir, $filename_key);
 	$filename_bed = basename($filename_bed);
 	$filename_bed = catfile($out_dir, $filename_bed);
-	$filename_summary = basename($filename_summary);
-	$filename_summary = catfile($out_dir, $filename_summary);
 	$filename_error = catfile($out_dir, "error.txt");
 }
 else{
 	my ($nothing, $in_dir) = fileparse($input);
 	$filename_error = catfile($in_dir, "error.txt");
 }
-if($min_length == 0 && $min_labels == 0){ # no filter
-	$filename =~ s/(\S+)\.\w+$/$1${tmp}.cmap/;
-	$filename_key =~ s/(\S+)\.\w+$/$1${tmp}_key.txt/;
-	$filename_summary =~ s/(\S+)\.\w+$/$1${tmp}_summary.txt/;
-}
-else{
-	$filename =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels.cmap/;
-	$filename_key =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels_key.txt/;
-	$filename_summary =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels_summary.txt/;
-}
+$filename_bed =~ s/\.gz$//;
 $filename_bed =~ s/(\S+)\.\w+$/$1_min${minNGapSize}_nbase.bed/;
 
-my $num_contigs = 0;
-my $ct = 0;
-open($FASTA, $input) || die ("ERROR: Can't open $input: $!\n");
-while(my $line = <$FASTA>){
-	if($ct == 0){
-		$ct++;
-		#chomp $line;
-		#$line =~ s/\r//g;
-		#if( $line ne "" && !($line =~ /^[>ACGTNacgtn]/) ){
-		if(! ($line =~ /^>/) ){
-			open($ERROR, ">$filename_error") || die ("ERROR: Can't open $filename_error: $!\n");
-			print ("ERROR: Invalid input file!\n");
-			print $ERROR("ERROR: Invalid input file!\n");
-			close($ERROR);
-			Usage();
-		}
-	}
-	if($line =~ /^>/){
-		$num_contigs++;
-	}
+# The fasta file (plain or gzipped) is read only once, one contig at a time
+if($input =~ /\.gz$/){
+	(-r $input) || die ("ERROR: Can't open $input: No such file or directory\n");
+	open($FASTA, "gzip -dc \"$input\" |") || die ("ERROR: Can't open $input: $!\n");
+}
+else{
+	open($FASTA, $input) || die ("ERROR: Can't open $input: $!\n");
+}
+my $first_line = <$FASTA>;
+if(!defined($first_line) || !($first_line =~ /^>/) ){
+	open($ERROR, ">$filename_error") || die ("ERROR: Can't open $filename_error: $!\n");
+	print ("ERROR: Invalid input file!\n");
+	print $ERROR("ERROR: Invalid input file!\n");
+	close($ERROR);
+	Usage();
 }
-close($FASTA);
 
 my %table;
 if( defined($keyfile) ){
@@ -199,123 +161,31 @@ if( defined($keyfile) ){
 	close($KEY_IN);
 }
 
-open($KEY, ">$filename_key") || die ("ERROR: Can't open $filename_key: $!\n");
-print $KEY("# CMAP = ", File::Spec -> rel2abs($filename), "\n");
-print $KEY("# filter: Minimum Nicks = $min_labels\n");
-print $KEY("# filter: Minimum Size (kb) = $min_length\n");
-print $KEY("CompntId\tCompntName\tCompntLength\n");
-
-open($SUMMARY, ">$filename_summary") || die ("ERROR: Can't open $filename_summary: $!\n");
-print $SUMMARY("#PARAMS\n");
-print $SUMMARY("Version:\t", '$Id: fa2cmap_multi_color.pl 5456 2016-10-07 18:46:32Z apang $', "\n");
-print $SUMMARY("Command:\t", "$0", $argvs, "\n");
-print $SUMMARY("Input file:\t", File::Spec -> rel2abs($input), "\n");
-print $SUMMARY("Output file:\t", File::Spec -> rel2abs($filename), "\n");
-print $SUMMARY("ID keyfile:\t", File::Spec -> rel2abs($filename_key), "\n");
 if($nbase_bed){
+	$print_bed = 1;
 	# Do not re-generate Nbase gap file!
 	if(-e $filename_bed){
 		$nbase_bed = 0;
 	}
-	print $SUMMARY("BED file:\t", File::Spec -> rel2abs($filename_bed), "\n");
-}
-print $SUMMARY("Minimum nicks:\t$min_labels\n");
-print $SUMMARY("Minimum size (kb):\t$min_length\n");
-for(my $i = 0; $i < @enzymes; $i++){
-	print $SUMMARY("Enzyme ", $i+1, " (Channel $color[$i]):\t$enzymes[$i]($enzyme_sequences[$i])\n");
 }
-print $SUMMARY("\n");
 
-print $SUMMARY("#RESULT\n");
-print $SUMMARY("CMapId\tChannel\tLength(Mb)\tFreq(nicks/100kb)\tGC%\tN%\n");
-#print $SUMMARY("------------------------------------------------------------------\n");
-
-Print_cmap_header($filename);
+# All enzymes are found in one scan, which feeds the multi-color cmap and the single-channel ones
+push(@outputs, New_output([0 .. $#enzymes], \@color));
+if($single && @enzymes > 1){
+	for(my $i = 0; $i < @enzymes; $i++){
+		push(@outputs, New_output([$i], [1]));
+	}
+}
 
-open($FASTA, $input) || die ("ERROR: Can't open $input: $!\n");
-while(my $line = <$FASTA>){
+for(my $line = $first_line; defined($line); $line = <$FASTA>){
 	chomp $line;
 	$line =~ s/\r//g;
 	
 	if($line =~ /^>/){
-		$fastaHeader_previous = $fastaHeader;
-		$fastaHeader = substr($line, 1);
-		
 		if($count != 0){
-			$seq_length = length($seq);
-			
-			# IF the sequence length is 0, ignore this sequence!!!
-			if(!$seq_length){
-				$count++;
-				next;
-			}
-			
-			$A = ($seq =~ tr/A/A/);
-			$C = ($seq =~ tr/C/C/);
-			$G = ($seq =~ tr/G/G/);
-			$T = ($seq =~ tr/T/T/);
-			$N = ($seq =~ tr/N/N/);
-			$global_N += $N;
-			$global_GC += ($C+$G);
-			$global_ACGT += ($A+$C+$G+$T);
-			$global_ACGTN += ($A+$C+$G+$T+$N);
-			
-			$total_length_original += $seq_length;
-			
-			@loci_tmp = ();
-			%color = ();
-			for(my $i = 0; $i < @color_uniq; $i++){
-				@num_nicks[$color_uniq[$i]] = 0;
-			}
-			for(my $i = 0; $i < @enzyme_sequences; $i++){
-				my @nicks_tmp = Find_enzymes($seq, $enzyme_sequences[$i], $color[$i]);
-				push(@loci_tmp, @nicks_tmp);
-			}
-			
-			# Remove duplicated values!
-			@loci = Uniq(@loci_tmp);
-			
-			# Filter by $min_labels and $min_length
-			if(scalar(@loci) >= $min_labels && $seq_length >= $min_length * 1000){
-				if(%table){
-					Generate_cmap($filename, $table{$fastaHeader_previous}, \@loci, $seq_length);
-					print $KEY("$table{$fastaHeader_previous}\t$fastaHeader_previous\t", $seq_length, "\n");
-				}
-				else{
-					Generate_cmap($filename, $count, \@loci, $seq_length);
-					print $KEY("$count\t$fastaHeader_previous\t", $seq_length, "\n");
-				}
-				
-				my $length_tmp = sprintf("%.3f", $seq_length/1000000);
-				
-				if($A+$C+$G+$T == 0){
-					$GC_percentage = sprintf("%.1f", 0);
-				}
-				else{
-					$GC_percentage = sprintf("%.1f", ($C+$G)/($A+$C+$G+$T)*100);
-				}
-				if($N == 0){
-					$N_percentage = sprintf("%.1f", 0);
-				}
-				else{
-					$N_percentage = sprintf("%.1f", $N/$seq_length*100);
-				}
-				
-				for(my $i = 0; $i < @color_uniq; $i++){
-					$density[$count] = sprintf("%.1f", $num_nicks[$color_uniq[$i]]/$seq_length * 100000);
-					print $SUMMARY("$count\t$color_uniq[$i]\t$length_tmp\t$density[$count]\t$GC_percentage\t$N_percentage\n");
-				}
-				
-				# NOTE: No duplicate sites!!!
-				$total_nicks += @loci;
-				$total_length_filtered += $seq_length;
-				push(@length_filtered, $seq_length);
-			}
-			# Count Ngaps for this chromosome (Zhanyang Zhu)
-			if($nbase_bed){
-				$nGaps->{$count} = getNGaps($seq, $minNGapSize);
-			}
+			Process_contig($count, $fastaHeader, \$seq);
 		}
+		$fastaHeader = substr($line, 1);
 		
 		# Reset
 		$seq = "";
@@ -325,144 +195,18 @@ while(my $line = <$FASTA>){
 		$seq .= uc($line);
 	}
 }
-
-$seq_length = length($seq);
-
-# IF the sequence length is not 0!!!
-if($seq_length){
-	$A = ($seq =~ tr/A/A/);
-	$C = ($seq =~ tr/C/C/);
-	$G = ($seq =~ tr/G/G/);
-	$T = ($seq =~ tr/T/T/);
-	$N = ($seq =~ tr/N/N/);
-	$global_N += $N;
-	$global_GC += ($C+$G);
-	$global_ACGT += ($A+$C+$G+$T);
-	$global_ACGTN += ($A+$C+$G+$T+$N);
-
-	$total_length_original += $seq_length;
-	
-	@loci_tmp = ();
-	%color = ();
-	for(my $i = 0; $i < @color_uniq; $i++){
-		@num_nicks[$color_uniq[$i]] = 0;
-	}
-	for(my $i = 0; $i < @enzyme_sequences; $i++){
-		my @nicks_tmp = Find_enzymes($seq, $enzyme_sequences[$i], $color[$i]);
-		push(@loci_tmp, @nicks_tmp);
-	}
-	
-	# Remove duplicated values!
-	@loci = Uniq(@loci_tmp);
-	
-	if(scalar(@loci) >= $min_labels && $seq_length >= $min_length * 1000){
-		if(%table){
-			Generate_cmap($filename, $table{$fastaHeader}, \@loci, $seq_length);
-			print $KEY("$table{$fastaHeader}\t$fastaHeader\t", $seq_length, "\n");
-		}
-		else{
-			Generate_cmap($filename, $count, \@loci, $seq_length);
-			print $KEY("$count\t$fastaHeader\t", $seq_length, "\n");
-		}
-		
-		my $length_tmp = sprintf("%.3f", $seq_length/1000000);
-		
-		if($A+$C+$G+$T == 0){
-			$GC_percentage = sprintf("%.1f", 0);
-		}
-		else{
-			$GC_percentage = sprintf("%.1f", ($C+$G)/($A+$C+$G+$T)*100);
-		}
-		if($N == 0){
-			$N_percentage = sprintf("%.1f", 0);
-		}
-		else{
-			$N_percentage = sprintf("%.1f", $N/$seq_length*100);
-		}
-		
-		for(my $i = 0; $i < @color_uniq; $i++){
-			$density[$count] = sprintf("%.1f", $num_nicks[$color_uniq[$i]]/$seq_length * 100000);
-			print $SUMMARY("$count\t$color_uniq[$i]\t$length_tmp\t$density[$count]\t$GC_percentage\t$N_percentage\n");
-		}
-		
-		# NOTE: No duplicate sites!!!
-		$total_nicks += @loci;
-		$total_length_filtered += $seq_length;
-		push(@length_filtered, $seq_length);
-	}
-	
-	if($nbase_bed){
-		# Count Ngaps for the last chromosome (Zhanyang Zhu)
-		$nGaps->{$count} = getNGaps($seq, $minNGapSize);
-	}
+if($count != 0){
+	Process_contig($count, $fastaHeader, \$seq);
 }
 close($FASTA);
-close($KEY);
 
 if($nbase_bed){
 	printNGaps($nGaps, $filename_bed, $minNGapSize);
 }
 
-#$command = "$^X -pi -e 's|N/A|$num_cmaps|' $filename";
-#print "Running command:\n$command\n\n";
-#system("$command");
-#edit_file_lines {s |N/A|$num_cmaps| } $filename;
-
-$command = "$^X -i.bak -p -e \"s/N\\/A/$num_cmaps/\" $filename";
-#print "Running command:\n$command\n\n";
-system("$command");
-unlink("$filename.bak");
-
-#print $SUMMARY("\n================================Summary================================\n");
-print $SUMMARY("\n#SUMMARY\n");
-print $SUMMARY("Minimum nicks:\t$min_labels\n");
-print $SUMMARY("Minimum size (kb):\t$min_length\n");
-print $SUMMARY("Total sequence entries processed\t$count\n");
-print $SUMMARY("Total maps generated\t$num_cmaps\n");
-
-print $SUMMARY("Total length of the original sequence entries\t$total_length_original\n");
-print $SUMMARY("Total length of the filtered maps\t$total_length_filtered\n");
-print $SUMMARY("Map N50\t", Get_N50(\@length_filtered, $total_length_filtered), "\n");
-print $SUMMARY("Map N90\t", Get_N90(\@length_filtered, $total_length_filtered), "\n");
-
-foreach my $channel ( sort {$a <=> $b} @color_uniq ){
-	my $distance_tmp = sprintf("%.1f", Get_N50(\@{$label_distances_by_channel[$channel]}, $total_label_distance[$channel]));
-	print $SUMMARY("Nick to nick distance N50 for channel $channel\t$distance_tmp\n");
+foreach my $out (@outputs){
+	Finish_output($out);
 }
-my $label_distance_global = sprintf("%.1f", Get_N50(\@label_distance_filtered, $total_label_distance_filtered));
-print $SUMMARY("Overall nick to nick distance N50\t$label_distance_global\n");
-
-foreach my $channel ( sort {$a <=> $b} @color_uniq ){
-	my $distance_stddev_tmp = sprintf("%.1f", StdDev(\@{$label_distances_by_channel[$channel]}));
-	print $SUMMARY("Standard deviation of nick to nick distance for channel $channel\t$distance_stddev_tmp\n");
-}
-my $distance_stddev_global = sprintf("%.1f", StdDev(\@label_distance_filtered));
-print $SUMMARY("Standard deviation of overall nick to nick distance\t$distance_stddev_global\n");
-
-foreach my $channel ( sort {$a <=> $b} @color_uniq ){
-	my $density_tmp;
-	if($total_length_filtered){
-		$density_tmp = sprintf("%.1f", $num_nicks_global[$channel]/$total_length_filtered * 100000);
-	}
-	else{
-		$density_tmp = sprintf("%.1f", 0);
-	}
-	print $SUMMARY("Global nick frequency (nicks/100kb) for channel $channel\t$density_tmp\n");
-}
-if($total_length_filtered){
-	$density_global = sprintf("%.1f", $total_nicks/$total_length_filtered * 100000);
-}
-else{
-	$density_global = sprintf("%.1f", 0);
-}
-print $SUMMARY("Global nick frequency (nicks/100kb)\t$density_global\n");
-
-$global_GC_percentage = sprintf("%.1f", $global_GC/$global_ACGT*100);
-$global_N_percentage = sprintf("%.1f", $global_N/$global_ACGTN*100);
-print $SUMMARY("Global GC %\t$global_GC_percentage\n");
-print $SUMMARY("Global N %\t$global_N_percentage\n");
-#print $SUMMARY("=======================================================================\n");
-close($SUMMARY);
 
 sleep(1);
 exit 0;
@@ -484,6 +228,7 @@ sub Init{
 		'minSizeNGap|g:i' => \$minNGapSize,
 		'Web|W'           => \$web,
 		'Strand|S'        => \$strand,
+		'single|s'        => \$single,
 	);
 	
 	if(!$ret){
@@ -553,10 +298,23 @@ sub Init{
 		($strand_header, $strand_header_type) = ("\tStrand", "\tchar");
 	}
 	
+	# The motifs of all enzymes and their reverse complements, digested together in one pass
+	for(my $i = 0; $i < @enzyme_sequences; $i++){
+		my $enzyme_rc = reverse($enzyme_sequences[$i]);
+		$enzyme_rc =~ tr/ACGTUN/TGCAAN/;
+		push(@patterns, [$enzyme_sequences[$i], $i, "+"]);
+		push(@patterns, [$enzyme_rc, $i, "-"]);
+	}
+	for(my $i = 0; $i < @patterns; $i++){
+		push(@{$motifs{$patterns[$i][0]}}, $i);
+	}
+	
 	# @enzymes:          enzyme names in the same order as the input
 	# @enzyme_sequences: enzyme sequences in the same order as the input
 	# @color:      colors of each enzyme in the same order as the input
 	# @color_uniq: a unique set of colors of all enzymes in ascending order
+	# @patterns:   [motif, enzyme index, strand] of each enzyme, then of its reverse complement
+	# %motifs:     indices in @patterns of each distinct motif
 	
 	#print "[@enzymes]", "\n";
 	#print "[@enzyme_sequences]", "\n";
@@ -575,7 +333,7 @@ Usage: $^X $0 [options] <Args>
 Options:
   -h : This help message
   -v : Print program version information
-  -i : Input fasta file (Required)
+  -i : Input fasta file, plain or gzipped (Required)
   -k : Input key file (If provided, use as contigIDs rather than sequentially)
   -o : Output folder (Default: the same as the input file)
   -e : Name or sequence of the enzyme (or a combination of name and sequence
@@ -586,6 +344,7 @@ Options:
   -g : Minimum N gap size (bp) when generating Nbase gap file (Default: 1000)
   -W : For web use only, and must be the first option (Default: OFF)
   -S : Add an additional column, Strand, to the cmap file (Default: OFF)
+  -s : Also output the single-channel cmap of each enzyme (Default: OFF)
 
 NOTE: CMAP index is 1-based, and is color-aware.
 EOF
@@ -605,92 +364,171 @@ sub Version{
 	exit 0;
 }
 
+sub Process_contig{
+	my ($ID, $header, $seq_ref) = @_;
+	my $seq_length = length($$seq_ref);
+	my ($GC_percentage, $N_percentage);
+	
+	# IF the sequence length is 0, ignore this sequence!!!
+	if(!$seq_length){
+		return;
+	}
+	
+	my $A = ($$seq_ref =~ tr/A/A/);
+	my $C = ($$seq_ref =~ tr/C/C/);
+	my $G = ($$seq_ref =~ tr/G/G/);
+	my $T = ($$seq_ref =~ tr/T/T/);
+	my $N = ($$seq_ref =~ tr/N/N/);
+	$global_N += $N;
+	$global_GC += ($C+$G);
+	$global_ACGT += ($A+$C+$G+$T);
+	$global_ACGTN += ($A+$C+$G+$T+$N);
+	
+	$total_length_original += $seq_length;
+	
+	if($A+$C+$G+$T == 0){
+		$GC_percentage = sprintf("%.1f", 0);
+	}
+	else{
+		$GC_percentage = sprintf("%.1f", ($C+$G)/($A+$C+$G+$T)*100);
+	}
+	if($N == 0){
+		$N_percentage = sprintf("%.1f", 0);
+	}
+	else{
+		$N_percentage = sprintf("%.1f", $N/$seq_length*100);
+	}
+	
+	my ($hit_loci, $hit_patterns) = Find_enzymes($seq_ref);
+	foreach my $out (@outputs){
+		Generate_cmap($out, $ID, $header, $seq_length, $hit_loci, $hit_patterns, $GC_percentage, $N_percentage);
+	}
+	
+	# Count Ngaps for this chromosome (Zhanyang Zhu)
+	if($nbase_bed){
+		$nGaps->{$ID} = getNGaps($$seq_ref, $minNGapSize);
+	}
+}
+
 sub Find_enzymes{
-	my ($seq, $enzyme, $channel) = @_;
-	my @result;
-	
-	# HashTable: $color{ nicking_site }[0] = total_num_of_colors
-	# HashTable: $color{ nicking_site }[1 .. total_num_of_colors_at_this_location] = $channel
-	# HashTable: $strand{$nicking_site} = "+" or "-"
-	
-	# Find the enzymes in the forward strand, staring from the first nucleotide!!!
-	my $current_loc = index($seq, $enzyme, 0);
-	while ($current_loc != -1){
-		# Add the current location into @result IFF
-		# 1) it is not in @result, or
-		# 2) it is in @result, and the current color is not in the color array.
-		if( !defined($color{$current_loc+1}[0]) || !($channel ~~ @{$color{$current_loc+1}}[1 .. $color{$current_loc+1}[0]]) ){
-			# This is color-aware!
-			push(@result, $current_loc+1);
-			
-			# Increase the color count
-			if( !defined($color{$current_loc+1}) ){
-				$color{$current_loc+1}[0] = 1;
-			}
-			else{
-				$color{$current_loc+1}[0]++;
+	my ($seq_ref) = @_;
+	my (@hits, @hit_loci, @hit_patterns);
+	
+	# Each distinct motif is searched once, and its hits are shared by every enzyme and strand using it.
+	# A hit is encoded as nicking_site * @patterns + pattern index, so sorting them numerically orders
+	# the sites, and the patterns at the same site in the input order (the later one wins on strand).
+	foreach my $motif (keys %motifs){
+		my $current_loc = index($$seq_ref, $motif, 0);
+		while ($current_loc != -1){
+			foreach my $i (@{$motifs{$motif}}){
+				push(@hits, ($current_loc+1) * @patterns + $i);
 			}
-			
-			# Store the current color on the current nicking site in the color array (unique, no order!):
-			# $color{ nicking_site }[1 .. total_num_of_colors_at_this_location]
-			$color{$current_loc+1}[ $color{$current_loc+1}[0] ] = $channel;
+			$current_loc = index($$seq_ref, $motif, $current_loc + 1);
 		}
-		
-		$strand{$current_loc+1} = "+";
-		
-		$current_loc = index($seq, $enzyme, $current_loc + 1);
 	}
+	
+	# @hit_loci:     1-based nicking sites in ascending order, repeated for each pattern found there
+	# @hit_patterns: index in @patterns of the pattern found at the same entry of @hit_loci
+	foreach my $hit (sort {$a <=> $b} @hits){
+		push(@hit_loci, int($hit / @patterns));
+		push(@hit_patterns, $hit % @patterns);
+	}
+	
+	return (\@hit_loci, \@hit_patterns);
+}
 
-	my $enzyme_rc = reverse($enzyme);
-	$enzyme_rc =~ tr/ACGTUN/TGCAAN/;
+sub New_output{
+	my ($indices, $channels) = @_;
+	my $tmp = "";
+	my %sequences;
+	my $out = {
+		channel => [],  # Channel of each enzyme in this cmap, undefined if the enzyme is not used
+		num_cmaps => 0,
+		total_nicks => 0,
+		num_nicks_global => [],  # For each channel
+		total_label_distance => [],  # For each channel
+		label_distances_by_channel => [],  # Histogram (distance => count) of the label distances of each channel
+		total_length_filtered => 0,
+		total_label_distance_filtered => 0,
+		length_filtered => [],
+		label_distance_filtered => {},  # Histogram (distance => count) of the label distances
+	};
+	
+	for(my $i = 0; $i < @$indices; $i++){
+		$out->{channel}[$indices->[$i]] = $channels->[$i];
+		push(@{$sequences{$channels->[$i]}}, $enzyme_sequences[$indices->[$i]]);
+		$tmp .= "_$enzymes[$indices->[$i]]";
+	}
+	$out->{color_uniq} = [sort {$a <=> $b} (Uniq(@$channels))];
+	foreach my $channel (@{$out->{color_uniq}}){
+		$out->{num_nicks_global}[$channel] = 0;
+	}
+	
+	my ($filename, $filename_key, $filename_summary) = ($input) x 3;
+	$filename =~ s/\.gz$//;
+	$filename_key =~ s/\.gz$//;
+	$filename_summary =~ s/\.gz$//;
+	if($output){
+		$filename = catfile($out_dir, basename($filename));
+		$filename_key = catfile($out_dir, basename($filename_key));
+		$filename_summary = catfile($out_dir, basename($filename_summary));
+	}
+	if($min_length == 0 && $min_labels == 0){ # no filter
+		$filename =~ s/(\S+)\.\w+$/$1${tmp}.cmap/;
+		$filename_key =~ s/(\S+)\.\w+$/$1${tmp}_key.txt/;
+		$filename_summary =~ s/(\S+)\.\w+$/$1${tmp}_summary.txt/;
+	}
+	else{
+		$filename =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels.cmap/;
+		$filename_key =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels_key.txt/;
+		$filename_summary =~ s/(\S+)\.\w+$/$1${tmp}_${min_length}kb_${min_labels}labels_summary.txt/;
+	}
+	$out->{filename} = $filename;
 	
-	# Find the rc(enzymes) in the forward strand, staring from the first nucleotide!!!
-	$current_loc = index($seq, $enzyme_rc, 0);
-	while ($current_loc != -1){
-		# Add the current location into @result IFF
-		# 1) it is not in @result, or
-		# 2) it is in @result, and the current color is not in the color array.
-		if( !defined($color{$current_loc+1}[0]) || !($channel ~~ @{$color{$current_loc+1}}[1 .. $color{$current_loc+1}[0]]) ){
-			# This is color-aware!
-			push(@result, $current_loc+1);
-			
-			if( !defined($color{$current_loc+1}) ){
-				$color{$current_loc+1}[0] = 1;
-			}
-			else{
-				$color{$current_loc+1}[0]++;
-			}
-			$color{$current_loc+1}[ $color{$current_loc+1}[0] ] = $channel;
-		}
-		$strand{$current_loc+1} = "-";
-		
-		$current_loc = index($seq, $enzyme_rc, $current_loc + 1);
+	my ($KEY, $SUMMARY);
+	open($KEY, ">$filename_key") || die ("ERROR: Can't open $filename_key: $!\n");
+	print $KEY("# CMAP = ", File::Spec -> rel2abs($filename), "\n");
+	print $KEY("# filter: Minimum Nicks = $min_labels\n");
+	print $KEY("# filter: Minimum Size (kb) = $min_length\n");
+	print $KEY("CompntId\tCompntName\tCompntLength\n");
+	$out->{key} = $KEY;
+	
+	open($SUMMARY, ">$filename_summary") || die ("ERROR: Can't open $filename_summary: $!\n");
+	print $SUMMARY("#PARAMS\n");
+	print $SUMMARY("Version:\t", '$Id: fa2cmap_multi_color.pl 5456 2016-10-07 18:46:32Z apang $', "\n");
+	print $SUMMARY("Command:\t", "$0", $argvs, "\n");
+	print $SUMMARY("Input file:\t", File::Spec -> rel2abs($input), "\n");
+	print $SUMMARY("Output file:\t", File::Spec -> rel2abs($filename), "\n");
+	print $SUMMARY("ID keyfile:\t", File::Spec -> rel2abs($filename_key), "\n");
+	if($print_bed){
+		print $SUMMARY("BED file:\t", File::Spec -> rel2abs($filename_bed), "\n");
 	}
+	print $SUMMARY("Minimum nicks:\t$min_labels\n");
+	print $SUMMARY("Minimum size (kb):\t$min_length\n");
+	for(my $i = 0; $i < @$indices; $i++){
+		print $SUMMARY("Enzyme ", $i+1, " (Channel $channels->[$i]):\t$enzymes[$indices->[$i]]($enzyme_sequences[$indices->[$i]])\n");
+	}
+	print $SUMMARY("\n");
+	
+	print $SUMMARY("#RESULT\n");
+	print $SUMMARY("CMapId\tChannel\tLength(Mb)\tFreq(nicks/100kb)\tGC%\tN%\n");
+	$out->{summary} = $SUMMARY;
+	
+	Print_cmap_header($out, \%sequences);
 	
-	# Remove duplicated values!
-	return Uniq(@result);
+	return $out;
 }
 
 sub Print_cmap_header{
-	my ($filename) = @_;
+	my ($out, $sequences) = @_;
 	my $OUT;
 	my $tmp = "";
-	my $color_uniq = scalar(@color_uniq);
+	my $color_uniq = scalar(@{$out->{color_uniq}});
 	
-	open($OUT, ">$filename") || die ("ERROR: Can't open $filename: $!\n");
+	open($OUT, ">$out->{filename}") || die ("ERROR: Can't open $out->{filename}: $!\n");
 	
-	#for(my $i = 0; $i < @enzyme_sequences; $i++){
-	#	$tmp .= ("# Nickase Recognition Site " . eval($i+1) . ":\t$enzyme_sequences[$i]\n");
-	#}
-	
-	foreach my $key (sort {$a <=> $b} keys %color_to_enzyme_sequence){
-		$tmp .= ("# Nickase Recognition Site $key:\t" . $color_to_enzyme_sequence{$key}[0]);
-		
-		for(my $i = 1; $i < scalar(@{$color_to_enzyme_sequence{$key}}); $i++){
-			$tmp .= ",$color_to_enzyme_sequence{$key}[$i]";
-		}
-		
-		$tmp .= "\n";
+	foreach my $key (sort {$a <=> $b} keys %$sequences){
+		$tmp .= ("# Nickase Recognition Site $key:\t" . join(",", @{$sequences->{$key}}) . "\n");
 	}
 	
 	chomp($tmp);
@@ -704,70 +542,170 @@ $tmp
 #f int	float	int	int	int	float	float	int	int$strand_header_type
 EOF
 	print $OUT($str);
-	close($OUT);
+	$out->{cmap} = $OUT;
 }
 
 sub Generate_cmap{
-	my ($filename, $ID, $loci_ref, $length) = @_;
+	my ($out, $ID, $header, $length, $hit_loci, $hit_patterns, $GC_percentage, $N_percentage) = @_;
 	my $i;
 	my $siteID = 1;
 	my $total_loci = 0;
-	my $OUT;
+	my $OUT = $out->{cmap};
 	my $length_float = sprintf("%.1f", $length);
-	my @sorted_loci = sort {$a <=> $b} @$loci_ref;
+	my (@sorted_loci, @sorted_colors, @site_strand);
+	my @num_nicks;  # For each channel
 	my @positions;  # Two-dimensional array containing label positions of each channel
 	
-	open($OUT, ">>$filename") || die ("ERROR: Can't open $filename: $!\n");
+	# Keep the hits of the enzymes in this cmap: one site per location with its unique channels,
+	# and the strand of the last motif found there
+	$i = 0;
+	while($i < @$hit_loci){
+		my $current_loc = $hit_loci->[$i];
+		my (%seen, @colors, $current_strand);
+		for(; $i < @$hit_loci && $hit_loci->[$i] == $current_loc; $i++){
+			my $pattern = $patterns[ $hit_patterns->[$i] ];
+			my $channel = $out->{channel}[ $pattern->[1] ];
+			next if(!defined($channel));
+			push(@colors, $channel) if(!$seen{$channel}++);
+			$current_strand = $pattern->[2];
+		}
+		if(@colors){
+			push(@sorted_loci, $current_loc);
+			push(@sorted_colors, [sort {$a <=> $b} @colors]);
+			push(@site_strand, $current_strand);
+			# "1" in most of the time, ">1" when there are multiple labels at the same position
+			$total_loci += @colors;
+		}
+	}
 	
-	for($i = 0; $i < @sorted_loci; $i++){
-		# "1" in most of the time, ">1" when there are multiple labels at the same position (the array is unique!)
-		$total_loci += $color{$sorted_loci[$i]}[0];
+	# Filter by $min_labels and $min_length
+	if(scalar(@sorted_loci) < $min_labels || $length < $min_length * 1000){
+		return;
 	}
 	
+	my $cmap_id = (%table) ? $table{$header} : $ID;
 	for($i = 0; $i < @sorted_loci; $i++){
 		my $loci_float = sprintf("%.1f", $sorted_loci[$i]);
-		my @sorted_colors = sort {$a <=> $b} @{$color{$sorted_loci[$i]}}[1 .. $color{$sorted_loci[$i]}[0]];
-		
-		for(my $j = 0; $j < $color{$sorted_loci[$i]}[0]; $j++){
+	
+		foreach my $channel (@{$sorted_colors[$i]}){
 			if($strand){
-				print $OUT("$ID\t$length_float\t$total_loci\t$siteID\t", $sorted_colors[$j], "\t$loci_float\t1.0\t1\t1\t", $strand{$sorted_loci[$i]}, "\n");
+				print $OUT("$cmap_id\t$length_float\t$total_loci\t$siteID\t", $channel, "\t$loci_float\t1.0\t1\t1\t", $site_strand[$i], "\n");
 			}
 			else{
-				print $OUT("$ID\t$length_float\t$total_loci\t$siteID\t", $sorted_colors[$j], "\t$loci_float\t1.0\t1\t1\n");
+				print $OUT("$cmap_id\t$length_float\t$total_loci\t$siteID\t", $channel, "\t$loci_float\t1.0\t1\t1\n");
 			}
-			$num_nicks[$sorted_colors[$j]]++;
-			$num_nicks_global[$sorted_colors[$j]]++;
-			
+			$num_nicks[$channel]++;
+			$out->{num_nicks_global}[$channel]++;
+	
 			$siteID++;
-			
+	
 			# Storing label positions for calculating the label distances
-			push(@{$positions[$sorted_colors[$j]]}, $sorted_loci[$i]);
+			push(@{$positions[$channel]}, $sorted_loci[$i]);
 		}
 	}
 	
 	# Calculating per channel label distances
-	foreach my $channel (@color_uniq){
+	foreach my $channel (@{$out->{color_uniq}}){
 		if(exists($positions[$channel][1])){
-			push(@{$label_distances_by_channel[$channel]}, Get_distance(\@{$positions[$channel]}));
-			$total_label_distance[$channel] += ($positions[$channel][-1] - $positions[$channel][0]);
+			foreach my $distance (Get_distance(\@{$positions[$channel]})){
+				$out->{label_distances_by_channel}[$channel]{$distance}++;
+			}
+			$out->{total_label_distance}[$channel] += ($positions[$channel][-1] - $positions[$channel][0]);
 		}
 	}
 	
 	# Calculating global label distances
 	if(@sorted_loci >= 2){
-		push(@label_distance_filtered, Get_distance(\@sorted_loci));
-		$total_label_distance_filtered += ($sorted_loci[-1] - $sorted_loci[0]);
+		foreach my $distance (Get_distance(\@sorted_loci)){
+			$out->{label_distance_filtered}{$distance}++;
+		}
+		$out->{total_label_distance_filtered} += ($sorted_loci[-1] - $sorted_loci[0]);
 	}
 	
 	if($strand){
-		print $OUT("$ID\t$length_float\t$total_loci\t$siteID\t0\t$length_float\t0.0\t1\t0\t.\n");
+		print $OUT("$cmap_id\t$length_float\t$total_loci\t$siteID\t0\t$length_float\t0.0\t1\t0\t.\n");
 	}
 	else{
-		print $OUT("$ID\t$length_float\t$total_loci\t$siteID\t0\t$length_float\t0.0\t1\t0\n");
+		print $OUT("$cmap_id\t$length_float\t$total_loci\t$siteID\t0\t$length_float\t0.0\t1\t0\n");
+	}
+	$out->{num_cmaps}++;
+	
+	print {$out->{key}}("$cmap_id\t$header\t", $length, "\n");
+	
+	my $length_tmp = sprintf("%.3f", $length/1000000);
+	foreach my $channel (@{$out->{color_uniq}}){
+		my $density = sprintf("%.1f", ($num_nicks[$channel] || 0)/$length * 100000);
+		print {$out->{summary}}("$ID\t$channel\t$length_tmp\t$density\t$GC_percentage\t$N_percentage\n");
 	}
-	$num_cmaps++;
 	
-	close($OUT);
+	# NOTE: No duplicate sites!!!
+	$out->{total_nicks} += @sorted_loci;
+	$out->{total_length_filtered} += $length;
+	push(@{$out->{length_filtered}}, $length);
+}
+
+sub Finish_output{
+	my ($out) = @_;
+	my $SUMMARY = $out->{summary};
+	my $total_length_filtered = $out->{total_length_filtered};
+	my ($density_global, $global_N_percentage, $global_GC_percentage);
+	
+	close($out->{cmap});
+	close($out->{key});
+	
+	$command = "$^X -i.bak -p -e \"s/N\\/A/$out->{num_cmaps}/\" $out->{filename}";
+	#print "Running command:\n$command\n\n";
+	system("$command");
+	unlink("$out->{filename}.bak");
+	
+	print $SUMMARY("\n#SUMMARY\n");
+	print $SUMMARY("Minimum nicks:\t$min_labels\n");
+	print $SUMMARY("Minimum size (kb):\t$min_length\n");
+	print $SUMMARY("Total sequence entries processed\t$count\n");
+	print $SUMMARY("Total maps generated\t$out->{num_cmaps}\n");
+	
+	print $SUMMARY("Total length of the original sequence entries\t$total_length_original\n");
+	print $SUMMARY("Total length of the filtered maps\t$total_length_filtered\n");
+	print $SUMMARY("Map N50\t", Get_N50($out->{length_filtered}, $total_length_filtered), "\n");
+	print $SUMMARY("Map N90\t", Get_N90($out->{length_filtered}, $total_length_filtered), "\n");
+	
+	foreach my $channel ( @{$out->{color_uniq}} ){
+		my $distance_tmp = sprintf("%.1f", Get_N50_hist(\%{$out->{label_distances_by_channel}[$channel]}, $out->{total_label_distance}[$channel]));
+		print $SUMMARY("Nick to nick distance N50 for channel $channel\t$distance_tmp\n");
+	}
+	my $label_distance_global = sprintf("%.1f", Get_N50_hist($out->{label_distance_filtered}, $out->{total_label_distance_filtered}));
+	print $SUMMARY("Overall nick to nick distance N50\t$label_distance_global\n");
+	
+	foreach my $channel ( @{$out->{color_uniq}} ){
+		my $distance_stddev_tmp = sprintf("%.1f", StdDev_hist(\%{$out->{label_distances_by_channel}[$channel]}));
+		print $SUMMARY("Standard deviation of nick to nick distance for channel $channel\t$distance_stddev_tmp\n");
+	}
+	my $distance_stddev_global = sprintf("%.1f", StdDev_hist($out->{label_distance_filtered}));
+	print $SUMMARY("Standard deviation of overall nick to nick distance\t$distance_stddev_global\n");
+	
+	foreach my $channel ( @{$out->{color_uniq}} ){
+		my $density_tmp;
+		if($total_length_filtered){
+			$density_tmp = sprintf("%.1f", $out->{num_nicks_global}[$channel]/$total_length_filtered * 100000);
+		}
+		else{
+			$density_tmp = sprintf("%.1f", 0);
+		}
+		print $SUMMARY("Global nick frequency (nicks/100kb) for channel $channel\t$density_tmp\n");
+	}
+	if($total_length_filtered){
+		$density_global = sprintf("%.1f", $out->{total_nicks}/$total_length_filtered * 100000);
+	}
+	else{
+		$density_global = sprintf("%.1f", 0);
+	}
+	print $SUMMARY("Global nick frequency (nicks/100kb)\t$density_global\n");
+	
+	$global_GC_percentage = sprintf("%.1f", $global_GC/$global_ACGT*100);
+	$global_N_percentage = sprintf("%.1f", $global_N/$global_ACGTN*100);
+	print $SUMMARY("Global GC %\t$global_GC_percentage\n");
+	print $SUMMARY("Global N %\t$global_N_percentage\n");
+	close($SUMMARY);
 }
 
 sub Get_distance{
@@ -898,6 +836,40 @@ sub StdDev{
 	return sqrt($sum2/@$array_ref);
 }
 
+# The same as Get_N50, but for a histogram: value => count
+sub Get_N50_hist{
+	my ($hist, $total_len) = @_;
+	my $total = 0;
+	
+	foreach my $value (sort {$b <=> $a} keys %$hist){
+		$total += $value * $hist->{$value};
+		if($total >= $total_len / 2){
+			return $value;
+		}
+	}
+}
+
+# The same as StdDev, but for a histogram: value => count
+sub StdDev_hist{
+	my ($hist) = @_;
+	my ($n, $sum, $sum2) = (0, 0, 0);
+	
+	foreach my $value (keys %$hist){
+		$n += $hist->{$value};
+		$sum += $value * $hist->{$value};
+	}
+	if(!$n){
+		return 0;
+	}
+	my $mean = $sum / $n;
+	
+	foreach my $value (keys %$hist){
+		$sum2 += $hist->{$value} * ($value-$mean)**2;
+	}
+	
+	return sqrt($sum2/$n);
+}
+
 # Created by Zhanyang Zhu
 sub getNGaps{
 	my ($seq, $minNGapSize) = @_;
@@ -17,10 +17,14 @@ use Statistics::LineFit;
 use List::Util qw[sum min max];
 
 BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
 	select(STDERR); $| = 1;
 	select(STDOUT); $| = 1;
 }
 
+use BNG::Utility;
+
 my $program = basename($0);
 my $usage = << "USAGE";
 $program: A perl script which fits linear model using pairing information of contigs from two single-enzyme assemblies
@@ -89,8 +93,7 @@ sub readAssociation
 	if($infile eq "-"){
 		$in = \*STDIN;
 	} else {
-		open(TSV, "$infile") or die("Can not open \"$infile\" for reading\n");
-		$in = \*TSV;
+		$in = openInput($infile);
 	}
 	my $line;
 	my @fields = ();
@@ -289,23 +292,23 @@ sub findIndex
 sub outputTable
 {
 	my ($table, $fields, $outfile) = @_;
-	open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing\n");
+	my $out = openOutput($outfile);
 
-	print OUT join("\t", @{$fields}) . "\n";
+	print $out join("\t", @{$fields}) . "\n";
 	my ($i, $j);
 	my $no = scalar(@{$table});
 	for($i=0; $i<$no; $i++){
 		for($j=0; $j<scalar(@{$fields}); $j++){
-			print OUT $table->[$i]->{$fields->[$j]};
+			print $out $table->[$i]->{$fields->[$j]};
 			if($j != $#{ $fields }){
-				print OUT "\t";
+				print $out "\t";
 			} else {
-				print OUT "\n";
+				print $out "\n";
 			}
 		}
 	}
 
-	close OUT;
+	close $out;
 }
 
 sub getIndices
@@ -0,0 +1,63 @@
+#!/usr/bin/env perl
+# Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+# MOMS is licensed under the Mulan PSL v1.
+# You can use this software according to the terms and conditions of the Mulan PSL v1.
+# You may obtain a copy of Mulan PSL v1 at:
+#    http://license.coscl.org.cn/MulanPSL
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND, EITHER EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR
+# PURPOSE.
+# See the Mulan PSL v1 for more details.
+use strict;
+use warnings;
+use File::Basename;
+use Getopt::Long qw(:config no_ignore_case bundling);
+use Cwd qw(abs_path);
+
+BEGIN{
+	my $progpath = abs_path(dirname($0));
+	unshift @INC, $progpath;
+}
+
+use BNG::Utility;
+
+my $program=basename($0);
+my $usage = << "USAGE";
+$program: A perl script for printing the summary statistics of a CMAP, XMAP or FASTA file
+Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+Usage: $program [-k key] file
+
+Required options:
+  file           A CMAP, XMAP or FASTA file, plain or gzipped
+
+Optional options:
+  -k <str>       Print only the value of the key, e.g. maps and labels of a CMAP/FASTA file,
+                 alignments, queries and refs of an XMAP file (default: all the counts)
+  -h             Help
+
+Example:
+	$program -k refs file.xmap
+
+USAGE
+
+use vars qw($opt_k $opt_h);
+GetOptions( "k=s" => \$opt_k,
+			"h"   => \$opt_h) or exit;
+
+die($usage) if($opt_h or scalar(@ARGV)!=1);
+
+# a missing file counts nothing, as an empty one
+unless( -f inputFile($ARGV[0]) ){
+	print defined($opt_k) ? "0\n" : "";
+	exit(0);
+}
+my $summary = summarizeFile($ARGV[0]);
+if( defined($opt_k) ){
+	print ((defined($summary->{$opt_k}) and !ref($summary->{$opt_k})) ? "$summary->{$opt_k}\n" : "0\n");
+}
+else{
+	foreach my $key (sort keys %$summary){
+		print "$key\t$summary->{$key}\n" unless(ref $summary->{$key});
+	}
+}
+exit(0);
@@ -103,10 +103,10 @@ $filename2 = &makeFileName($outdir, "xmap", "sorted", basename($opt_s));
 
 # TSV file containing association information between two CMAPs with different channels
 my $outfile = "$outdir/$outpre.tsv";
-open(OUT, ">$outfile") or die("Can not open \"$outfile\" for writing\n");
+my $out = openOutput($outfile);
 
 # print out the header
-print OUT join("\t", ("ID", "QryContigID", "QryLen", "RefContigID.x", "RefLen.x", "RefContigID.y", "RefLen.y", "Orientation.x", "Orientation.y", "Overlap", "Confidence.x", "Confidence.y", "QryStartPos.x", "QryEndPos.x", "RefStartPos.x", "RefEndPos.x", "QryStartPos.y", "QryEndPos.y", "RefStartPos.y", "RefEndPos.y", "OriContigID.x", "offset.x", "len.x", "OriContigID.y", "offset.y", "len.y")) . "\n";
+print $out join("\t", ("ID", "QryContigID", "QryLen", "RefContigID.x", "RefLen.x", "RefContigID.y", "RefLen.y", "Orientation.x", "Orientation.y", "Overlap", "Confidence.x", "Confidence.y", "QryStartPos.x", "QryEndPos.x", "RefStartPos.x", "RefEndPos.x", "QryStartPos.y", "QryEndPos.y", "RefStartPos.y", "RefEndPos.y", "OriContigID.x", "offset.x", "len.x", "OriContigID.y", "offset.y", "len.y")) . "\n";
 
 # processing the alignments
 my $iret;
@@ -133,12 +133,12 @@ while( (defined $entry1) and (defined $entry2) ){
 		$keep1{$idx1} = 1;
 		$keep2{$idx2} = 1;
 		$id++;
-		print OUT "$id\t$entry1->{contigID}\t$hits1->{QryLen}->[$idx1]\t$hits1->{RefContigID}->[$idx1]\t$hits1->{RefLen}->[$idx1]\t$hits2->{RefContigID}->[$idx2]\t$hits2->{RefLen}->[$idx2]\t$hits1->{Orientation}->[$idx1]\t$hits2->{Orientation}->[$idx2]\t$overlap\t$hits1->{Confidence}->[$idx1]\t$hits2->{Confidence}->[$idx2]\t$hits1->{QryStartPos}->[$idx1]\t$hits1->{QryEndPos}->[$idx1]\t$hits1->{RefStartPos}->[$idx1]\t$hits1->{RefEndPos}->[$idx1]\t$hits2->{QryStartPos}->[$idx2]\t$hits2->{QryEndPos}->[$idx2]\t$hits2->{RefStartPos}->[$idx2]\t$hits2->{RefEndPos}->[$idx2]\t$hits1->{OriContigID}->[$idx1]\t$hits1->{map}->[$idx1]->{offset}\t$hits1->{map}->[$idx1]->{len}\t$hits2->{OriContigID}->[$idx2]\t$hits2->{map}->[$idx2]->{offset}\t$hits2->{map}->[$idx2]->{len}\n";
+		print $out "$id\t$entry1->{contigID}\t$hits1->{QryLen}->[$idx1]\t$hits1->{RefContigID}->[$idx1]\t$hits1->{RefLen}->[$idx1]\t$hits2->{RefContigID}->[$idx2]\t$hits2->{RefLen}->[$idx2]\t$hits1->{Orientation}->[$idx1]\t$hits2->{Orientation}->[$idx2]\t$overlap\t$hits1->{Confidence}->[$idx1]\t$hits2->{Confidence}->[$idx2]\t$hits1->{QryStartPos}->[$idx1]\t$hits1->{QryEndPos}->[$idx1]\t$hits1->{RefStartPos}->[$idx1]\t$hits1->{RefEndPos}->[$idx1]\t$hits2->{QryStartPos}->[$idx2]\t$hits2->{QryEndPos}->[$idx2]\t$hits2->{RefStartPos}->[$idx2]\t$hits2->{RefEndPos}->[$idx2]\t$hits1->{OriContigID}->[$idx1]\t$hits1->{map}->[$idx1]->{offset}\t$hits1->{map}->[$idx1]->{len}\t$hits2->{OriContigID}->[$idx2]\t$hits2->{map}->[$idx2]->{offset}\t$hits2->{map}->[$idx2]->{len}\n";
 	}
 	($entry1, $entry2) = &getNextPair($entry1, $entry2);
 }
 
-close OUT;
+close $out;
 
 $filename1 = &makeFileName($outdir, "xmap", "filtered", basename($filename1));
 $filename2 = &makeFileName($outdir, "xmap", "filtered", basename($filename2));
@@ -316,12 +316,12 @@ sub makeFileName
 sub writeXMap
 {
 	my ($xmap, $indexes, $filename) = @_;
-	open(XMF, ">$filename") or die("Can not open \"$filename\" for writing\n");
+	my $out = openOutput($filename);
 
 	my $i;
 	my $header = $xmap->{headers};
 	for($i=0; $i<scalar(@{$header}); $i++){
-		print XMF "$header->[$i]\n";
+		print $out "$header->[$i]\n";
 	}
 	my $j;
 	my @data_name = @{ $xmap->{dataName} };
@@ -329,17 +329,17 @@ sub writeXMap
 	for($i=0; $i<scalar(@{$indexes}); $i++){
 		for($j=0; $j<$nFields; $j++){
 			if($j == 0){
-				print XMF int($i+1);
+				print $out int($i+1);
 			} else {
-				print XMF $xmap->{hits}->{$data_name[$j]}->[$indexes->[$i]];
+				print $out $xmap->{hits}->{$data_name[$j]}->[$indexes->[$i]];
 			}
 			if($j < $nFields - 1){
-				print XMF "\t";
+				print $out "\t";
 			} else {
-				print XMF "\n";
+				print $out "\n";
 			}
 		}
 	}
 
-	close XMF;
+	close $out;
 }
@@ -67,19 +67,20 @@ for(my $i=0; $i<scalar(@{$xmap->{headers}}); $i++){
 }
 my $data_names = $xmap->{"dataName"};
 my $numc = scalar(@$data_names);
-my ($labels1, $labels2);
-my ($channels1, $channels2, $union_channels);
+my ($range1, $range2);
 my ($vec1, $vec2, $vec3, $vec4);
 my $cos;
-my $max = max(scalar(keys %{$refCmap->{"channels"}}), scalar(keys %{$qryCmap->{"channels"}}));
+# the label channels of every map are profiled once and shared by all of its alignments
+my (%qryProfiles, %refProfiles) = ((), ());
 
 my $k = 0;
 for(my $i=0; $i<$xmap->{totalHits}; $i++){
-	($labels1, $channels1) = retrieveLabels($qryCmap, $QryContigIDs->[$i], $QryStartPos->[$i], $QryEndPos->[$i]);
-	($labels2, $channels2) = retrieveLabels($refCmap, $RefContigIDs->[$i], $RefStartPos->[$i], $RefEndPos->[$i]);
-	$union_channels = union($channels1, $channels2);
-	($vec1, $vec3) = calculateEigenVectors($labels1, $max);
-	($vec2, $vec4) = calculateEigenVectors($labels2, $max);
+	$qryProfiles{$QryContigIDs->[$i]} = profileLabels($qryCmap, $QryContigIDs->[$i]) unless(exists $qryProfiles{$QryContigIDs->[$i]});
+	$refProfiles{$RefContigIDs->[$i]} = profileLabels($refCmap, $RefContigIDs->[$i]) unless(exists $refProfiles{$RefContigIDs->[$i]});
+	$range1 = locateLabels($qryProfiles{$QryContigIDs->[$i]}, $QryStartPos->[$i], $QryEndPos->[$i]);
+	$range2 = locateLabels($refProfiles{$RefContigIDs->[$i]}, $RefStartPos->[$i], $RefEndPos->[$i]);
+	($vec1, $vec3) = calculateEigenVectors($qryProfiles{$QryContigIDs->[$i]}, $range1);
+	($vec2, $vec4) = calculateEigenVectors($refProfiles{$RefContigIDs->[$i]}, $range2);
 	if(!compatible($vec1, $vec2)){
 		next;
 	}
@@ -101,73 +102,70 @@ for(my $i=0; $i<$xmap->{totalHits}; $i++){
 
 exit 0;
 
-sub retrieveLabels
+# the labels of a map by channel and by pair of successive channels, as sorted lists of label indices,
+# so that the vectors of any aligned region are counted without visiting its labels
+sub profileLabels
 {
-	my ($cmap, $id, $start, $end) = @_;
-	my @labels = ();
-	my %channels = ();
+	my ($cmap, $id) = @_;
 	my $ctg = $cmap->{contigs}->{$id};
 	my $numsites = $ctg->{NumSites};
-	if($start > $end){
-		my $tmp = $start; $start = $end; $end = $tmp;
-	}
-	my $i;
-	my $positions = $ctg->{Position};
 	my $labelchannels = $ctg->{LabelChannel};
-	for($i=0; $i<$numsites; $i++){
-		my $pos = $positions->[$i];
-		if($pos >= $start && $pos <= $end){
-			my $ichannel = $labelchannels->[$i];
-			push(@labels, $ichannel);
-			$channels{$ichannel} = 1;
+	my (%channels, %transitions) = ((), ());
+	my ($idx1, $idx2);
+	for(my $i=0; $i<$numsites; $i++){
+		push(@{$channels{$labelchannels->[$i]}}, $i);
+		if($i < $numsites - 1){
+			($idx1, $idx2) = ($labelchannels->[$i] >= $labelchannels->[$i+1]) ? ($labelchannels->[$i], $labelchannels->[$i+1]) : ($labelchannels->[$i+1], $labelchannels->[$i]);
+			push(@{$transitions{"$idx1,$idx2"}}, $i);
 		}
 	}
-	return (\@labels, \%channels);
+	return {positions => $ctg->{Position}, numsites => $numsites, channels => \%channels, transitions => \%transitions};
 }
 
-sub union
+# the range [first, last) of the labels located in a region
+sub locateLabels
 {
-	my ($channels1, $channels2) = @_;
-	my %union = ();
-	foreach (keys %$channels1, keys %$channels2){
-		$union{$_} = 1;
+	my ($profile, $start, $end) = @_;
+	if($start > $end){
+		my $tmp = $start; $start = $end; $end = $tmp;
 	}
-	return \%union;
+	# the labels are sorted by position
+	my $first = lowerBound($profile->{positions}, $start, $profile->{numsites});
+	my $last = upperBound($profile->{positions}, $end, $profile->{numsites});
+	return [$first, ($last > $first) ? $last : $first];
 }
 
+# the sparse vectors of the label channels and of the channel transitions in a range of labels,
+# with only the non-zero counts kept
 sub calculateEigenVectors
 {
-	my ($labels, $max) = @_;
-	my @vector = (0) x $max;
-	my @vector2 = (0) x (($max * ($max+1)) / 2);
-	my ($idx, $idx1, $idx2);
-	for(my $i=0; $i<=$#$labels; $i++){
-		$idx = $labels->[$i];
-		$vector[$idx-1]++;
-		if($i < $#$labels){
-			if($labels->[$i] >= $labels->[$i+1]){
-				$idx1 = $labels->[$i];
-				$idx2 = $labels->[$i+1];
-			}
-			else{
-				$idx1 = $labels->[$i+1];
-				$idx2 = $labels->[$i];
-			}
-			$vector2[($idx1-1)*$idx1/2+$idx2-1]++;
-		}
+	my ($profile, $range) = @_;
+	my ($first, $last) = @{$range};
+	my (%vector, %vector2) = ((), ());
+	my $n;
+	foreach my $channel (keys %{$profile->{channels}}){
+		my $list = $profile->{channels}->{$channel};
+		$n = lowerBound($list, $last) - lowerBound($list, $first);
+		$vector{$channel} = $n if($n > 0);
+	}
+	# the transitions from label i to i+1 with both labels in the range
+	foreach my $transition (keys %{$profile->{transitions}}){
+		my $list = $profile->{transitions}->{$transition};
+		$n = lowerBound($list, $last - 1) - lowerBound($list, $first);
+		$vector2{$transition} = $n if($n > 0);
 	}
 
-	return (\@vector, \@vector2);
+	return (\%vector, \%vector2);
 }
 
 sub compatible
 {
 	my ($vec1, $vec2) = @_;
-	if(scalar(@$vec1) != scalar(@$vec2)){
+	if(scalar(keys %$vec1) != scalar(keys %$vec2)){
 		return 0;
 	}
-	for(my $i=0; $i<scalar(@$vec1); $i++){
-		if( ($vec1->[$i] == 0) ^ ($vec2->[$i] == 0) ){
+	foreach (keys %$vec1){
+		if(!exists $vec2->{$_}){
 			return 0;
 		}
 	}
@@ -177,17 +175,15 @@ sub compatible
 sub cosine
 {
 	my ($vec1, $vec2) = @_;
-	die("vector sizes do not match\n") if(scalar(@$vec1) != scalar(@$vec2));
 	return dotProduct($vec1, $vec2) / sqrt(dotProduct($vec1, $vec1) * dotProduct($vec2, $vec2));
 }
 
 sub dotProduct
 {
 	my ($vec1, $vec2) = @_;
-	die("vector sizes do not match\n") if(scalar(@$vec1) != scalar(@$vec2));
 	my $product = 0;
-	for(my $i=0; $i<scalar(@$vec1); $i++){
-		$product += $vec1->[$i] * $vec2->[$i];
+	foreach (keys %$vec1){
+		$product += $vec1->{$_} * $vec2->{$_} if(exists $vec2->{$_});
 	}
 	return $product;
 }
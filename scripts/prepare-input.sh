@@ -24,7 +24,7 @@ stfile="$outdir/status.txt"
 
 mkdir -p $outdir
 `(cd $outdir; ln -sf $infasta ${infasta##*/})`
-`(cd $outdir; awk 'BEGIN{len=0}{if($0 ~ /^[^>]/){len+=length($0);}}END{print len}' $infasta > contig-length.txt)`
+`(cd $outdir; zcat -f $infasta | awk 'BEGIN{len=0}{if($0 ~ /^[^>]/){len+=length($0);}}END{print len}' > contig-length.txt)`
 
 eval "declare -A enzymes=`enzymeNames`"
 declare -A defined
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+'''
+Run a shell command and append its resource usage to the profile of the pipeline
+
+usage: profiler.py [--step] command
+
+The record goes to the file named by $MOMS_PROFILE under the step named by $MOMS_STEP,
+the exit status of the command is passed through.
+
+Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+MOMS is licensed under the Mulan PSL v1.
+You can use this software according to the terms and conditions of the Mulan PSL v1.
+You may obtain a copy of Mulan PSL v1 at:
+    http://license.coscl.org.cn/MulanPSL
+THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND, EITHER EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR
+PURPOSE.
+See the Mulan PSL v1 for more details.
+'''
+
+import os
+import sys
+import time
+import json
+import fcntl
+import subprocess
+
+# the block counters of rusage are in units of 512 bytes
+BLOCK_SIZE = 512
+
+def measure(cmd, step, level, shell="/bin/sh"):
+	'''
+	Run a command, wait for it and its waited-for descendants, and return its exit status and usage record
+	'''
+	start = time.time()
+	proc = subprocess.Popen(cmd, shell=True, executable=shell)
+	pid, status, usage = os.wait4(proc.pid, 0)
+	proc.returncode = status
+	record = {
+		'step'		: step,
+		'level'		: level,
+		'command'	: cmd,
+		'start'		: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)),
+		'wall'		: round(time.time() - start, 3),
+		'user'		: round(usage.ru_utime, 3),
+		'sys'		: round(usage.ru_stime, 3),
+		'maxrss'	: usage.ru_maxrss,
+		'read'		: usage.ru_inblock * BLOCK_SIZE,
+		'written'	: usage.ru_oublock * BLOCK_SIZE,
+		'status'	: os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+	}
+	return status, record
+
+def append(path, record):
+	'''
+	Append a record as a JSON line, serialized against the concurrent jobs of the same run
+	'''
+	with open(path, 'a') as f:
+		fcntl.flock(f, fcntl.LOCK_EX)
+		f.write(json.dumps(record, sort_keys=True) + "\n")
+		f.flush()
+		fcntl.flock(f, fcntl.LOCK_UN)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	level = 'tool'
+	if args and args[0] == '--step':
+		level = 'step'
+		args = args[1:]
+	if len(args) != 1:
+		sys.stderr.write("Usage: %s [--step] command\n"%(sys.argv[0]))
+		sys.exit(1)
+	status, record = measure(args[0], os.environ.get('MOMS_STEP', ''), level, "/bin/bash")
+	if os.environ.get('MOMS_PROFILE', '') != '':
+		append(os.environ['MOMS_PROFILE'], record)
+	sys.exit(record['status'] if record['status'] >= 0 else 128 - record['status'])
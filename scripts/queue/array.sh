@@ -0,0 +1,10 @@
+#!/bin/bash
+#$ -S /bin/bash
+#$ -wd WORKDIR
+#$ -N JOBNAME
+#$ -o SCRNAME.$JOB_ID.$TASK_ID.log
+#$ -pe PENAME SLOTS -l vf=MEM
+#$ -p PRIORITY
+#$ -t 1-TASKS
+
+MOMS_TASK=$SGE_TASK_ID COMMAND
@@ -88,7 +88,7 @@ etime=$(ntime)
 echo -e "Exporting AGP and FASTA files complete in $(duration $stime $etime) s.\n";
 
 check "ls $rptdir/Step*/*.cmap | xargs $DIR/perl/calc_cmap_stats.pl -f -o $outdir/cmap_file_stats.txt";
-check "ls -1 $outdir/$outpre*.fa* | xargs $DIR/perl/calc_fasta_stats.pl -f > $outdir/fasta_file_stats.txt";
+check "ls -1 $outdir/$outpre*.fa* | grep -v '\.stats$' | xargs $DIR/perl/calc_fasta_stats.pl -f > $outdir/fasta_file_stats.txt";
 check "$DIR/perl/calc_xmap_stats.pl -q $xmapdir/$xmapfile -r $cmapdir/$cmapfile > $outdir/xmap_file_stats.txt";
 
 echo 'Done' > $stfile
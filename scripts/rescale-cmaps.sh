@@ -22,7 +22,7 @@ refaligner="$DIR/bionano/binary/RefAligner"
 refpath=$1
 qrypath=$2
 outdir=$3
-stfile="$outdir/status.txt"
+stfile=$(task_status $outdir)
 
 nthreads=0
 alignconf=""
@@ -50,6 +50,8 @@ fi
 qrydir=${qrypath%/*};
 qrypre=${qrypath##*/};
 
+# the thread budget is split among the enzymes processed concurrently
+nthreads=$(job_threads $nthreads)
 shareparams="";
 if [ $nthreads -gt 0 ]; then
 	shareparams+=" -t $nthreads";
@@ -78,33 +80,47 @@ for name in ${ordered[@]}; do
 		fi
 	fi
 done
+# the enzymes processed by this run, a single one in a task of an array job
+declare -a tasknames=($(task_enzymes ${names[@]}))
+align_enzyme() {
+	local name=$1
+	local refmap="$refdir/${refpre}_$name.cmap"
+	local qrymap="$qrydir/${qrypre}_$name.cmap"
+	if ! has_file "$outdir/align0/$name.xmap"; then
+		check "$aligner -s first -r $refmap -q $qrymap -o $outdir/align0/$name $shareparams$alignconf > /dev/null";
+	fi
+}
+
+rescale_enzyme() {
+	local name=$1
+	local qrymap="$qrydir/${qrypre}_$name.cmap"
+	local errbin="$outdir/align0/$name.errbin"
+	local adjusted="$outdir/align0/${qrypre}_${name}_adjusted"
+	if [ ! -f "$adjusted.cmap" ]; then
+		check "$refaligner -merge -i $qrymap -readparameters $errbin -o $adjusted -stdout -stderr > /dev/null";
+	fi
+	if [ -f "$adjusted.cmap" ]; then
+		eval "ln -sf align0/${qrypre}_${name}_adjusted.cmap $outdir";
+	fi
+}
+
 # alignment
 echo -e "Beginning initial NGS CMAP to BioNano CMAP alignment ... ";
 stime=$(ntime)
-for name in ${names[@]}; do
-	refmap="$refdir/${refpre}_$name.cmap"
-	qrymap="$qrydir/${qrypre}_$name.cmap"
-	if [ ! -f "$outdir/align0/$name.xmap" ]; then
-		check "$aligner -s first -r $refmap -q $qrymap -o $outdir/align0/$name $shareparams$alignconf > /dev/null";
-	fi
+for name in ${tasknames[@]}; do
+	run_job "align_enzyme $name"
 done
+wait_jobs || { echo 'Error 3' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Initial alignment complete in $(duration $stime $etime) s.\n";
 
 # rescale the query CMAPs
 echo -e "Rescaling BioNano CMAP ... ";
 stime=$(ntime)
-for name in ${names[@]}; do
-	qrymap="$qrydir/${qrypre}_$name.cmap"
-	errbin="$outdir/align0/$name.errbin"
-	adjusted="$outdir/align0/${qrypre}_${name}_adjusted"
-	if [ ! -f "$adjusted.cmap" ]; then
-		check "$refaligner -merge -i $qrymap -readparameters $errbin -o $adjusted -stdout -stderr > /dev/null";
-	fi
-	if [ -f "$adjusted.cmap" ]; then
-		eval "ln -sf align0/${qrypre}_${name}_adjusted.cmap $outdir";
-	fi
+for name in ${tasknames[@]}; do
+	run_job "rescale_enzyme $name"
 done
+wait_jobs || { echo 'Error 4' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Rescaling complete in $(duration $stime $etime) s.\n";
 
@@ -23,7 +23,7 @@ cutter="$DIR/perl/conflicts_cutter.pl"
 refpath=$1
 qrypath=$2
 outdir=$3
-stfile="$outdir/status.txt"
+stfile=$(task_status $outdir)
 
 nthreads=0
 alignconf=""
@@ -53,6 +53,8 @@ fi
 qrydir=${qrypath%/*};
 qrypre=${qrypath##*/};
 
+# the thread budget is split among the enzymes processed concurrently
+nthreads=$(job_threads $nthreads)
 shareparams="";
 if [ $nthreads -gt 0 ]; then
 	shareparams+=" -t $nthreads";
@@ -82,73 +84,101 @@ for name in ${ordered[@]}; do
 		fi
 	fi
 done
+# the enzymes processed by this run, a single one in a task of an array job
+declare -a tasknames=($(task_enzymes ${names[@]}))
 
-# the 2nd round alignments
-alndir="$outdir/align1";
-mkdir -p $alndir
-echo -e "Beginning initial NGS CMAP to rescaled BioNano CMAP alignment ... ";
-stime=$(ntime)
-for name in ${names[@]}; do
-	refmap="$refdir/${refpre}_$name.cmap"
-	qrymap="$qrydir/${qrypre}_${name}_adjusted.cmap"
-	if [ ! -f "$alndir/$name.xmap" ]; then
+align_enzyme() {
+	local name=$1
+	local refmap="$refdir/${refpre}_$name.cmap"
+	local qrymap="$qrydir/${qrypre}_${name}_adjusted.cmap"
+	if ! has_file "$alndir/$name.xmap"; then
 		check "$aligner -r $refmap -q $qrymap -o $alndir/$name $shareparams$alignconf > /dev/null";
 	fi
-	nhits=`grep -c '^[^#]' $alndir/$name.xmap 2>/dev/null | tr -d '\n'`;
+	local nhits=`gzip -dcf $(input_files $alndir/$name.xmap) 2>/dev/null | grep -c '^[^#]' | tr -d '\n'`;
 	if [[ -n "$nhits" ]]; then
-		refhits=$(count_xmaps $alndir/$name.xmap 3);
-		qryhits=$(count_xmaps $alndir/$name.xmap 2);
+		local refhits=$(count_xmaps $alndir/$name.xmap 3);
+		local qryhits=$(count_xmaps $alndir/$name.xmap 2);
 		printf "%8s alignments are found for enzyme $name between %6s BNG contigs and %6s NGS contigs.\n" $nhits $qryhits $refhits
 	fi
+}
+
+identify_enzyme() {
+	local name=$1
+	local xmap="$alndir/$name.xmap";
+	local refmap="$alndir/${name}_r.cmap";
+	local qrymap="$alndir/${name}_q.cmap";
+	local ref0map="$refdir/${refpre}_$name.cmap";
+	local qry0map="$qrydir/${qrypre}_${name}_adjusted.cmap";
+	local ref0maps=$(count_cmaps $ref0map);
+	local qry0maps=$(count_cmaps $qry0map);
+	if [ ! -f "$cfldir/${name}_conflicts.txt" ]; then
+		check "$identifier -i $xmap -r $refmap -q $qrymap -r0 $ref0map -q0 $qry0map -o $cfldir/$name$xmlconf >/dev/null";
+	fi
+	local refhits=$(count_xmaps $cfldir/$name.xmap 3); [ $refhits -eq 0 ] && refhits="NONE"
+	local qryhits=$(count_xmaps $cfldir/$name.xmap 2); [ $qryhits -eq 0 ] && qryhits="NONE"
+	printf "%8s of %6s BNG contigs have been flagged as conflicting for enzyme $name.\n" $qryhits $qry0maps
+	printf "%8s of %6s NGS contigs have been flagged as conflicting for enzyme $name.\n" $refhits $ref0maps
+}
+
+cut_enzyme() {
+	local name=$1
+	local i=$2
+	local xmap="$alndir/$name.xmap";
+	local refmap="$alndir/${name}_r.cmap";
+	local qrymap="$alndir/${name}_q.cmap";
+	local ref0map="$refdir/${refpre}_$name.cmap";
+	local qry0map="$qrydir/${qrypre}_${name}_adjusted.cmap";
+	local conflict="$cfldir/${name}_conflicts.txt";
+	if [[ ! -f "$outdir/${refpre}_${name}_cut.cmap" || ! -f "$outdir/${qrypre}_${name}_adjusted_cut.cmap" ]]; then
+		check "$cutter -i $xmap -r $refmap -q $qrymap -r0 $ref0map -q0 $qry0map -c $conflict -s $i,${#ordered[@]} -o $outdir/$name $xmlconf >/dev/null";
+	fi
+	local refmaps=$(count_cmaps $outdir/${refpre}_${name}_cut.cmap);
+	local qrymaps=$(count_cmaps $outdir/${qrypre}_${name}_adjusted_cut.cmap);
+	printf "%8s BNG contigs found for enzyme $name after conflicts cutting.\n" $qrymaps
+	printf "%8s NGS contigs found for enzyme $name after conflicts cutting.\n" $refmaps
+}
+
+# the 2nd round alignments
+alndir="$outdir/align1";
+mkdir -p $alndir
+echo -e "Beginning initial NGS CMAP to rescaled BioNano CMAP alignment ... ";
+stime=$(ntime)
+for name in ${tasknames[@]}; do
+	run_job "align_enzyme $name"
 done
+wait_jobs || { echo 'Error 3' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Initial rescaled alignment complete in $(duration $stime $etime) s.\n";
 
 cfldir="$outdir/conflicts"
 mkdir -p $cfldir
 
-declare -A used
 # identification of conflicts
 echo -e "Beginning conflicts identification ...";
 stime=$(ntime)
-for xmap in `ls -1 $alndir/*.xmap`; do
-	name=${xmap##*/};
-	name=${name%.xmap};
-	((used[$name]++));
-	refmap="$alndir/${name}_r.cmap";
-	qrymap="$alndir/${name}_q.cmap";
-	ref0map="$refdir/${refpre}_$name.cmap";
-	qry0map="$qrydir/${qrypre}_${name}_adjusted.cmap";
-	ref0maps=$(count_cmaps $ref0map);
-	qry0maps=$(count_cmaps $qry0map);
-	check "$identifier -i $xmap -r $refmap -q $qrymap -r0 $ref0map -q0 $qry0map -o $cfldir/$name$xmlconf >/dev/null";
-	refhits=$(count_xmaps $cfldir/$name.xmap 3); [ $refhits -eq 0 ] && refhits="NONE"
-	qryhits=$(count_xmaps $cfldir/$name.xmap 2); [ $qryhits -eq 0 ] && qryhits="NONE"
-	printf "%8s of %6s BNG contigs have been flagged as conflicting for enzyme $name.\n" $qryhits $qry0maps
-	printf "%8s of %6s NGS contigs have been flagged as conflicting for enzyme $name.\n" $refhits $ref0maps
+for name in ${tasknames[@]}; do
+	if has_file "$alndir/$name.xmap"; then
+		run_job "identify_enzyme $name"
+	fi
 done
+wait_jobs || { echo 'Error 4' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Conflicts identification complete in $(duration $stime $etime) s.\n";
 
 echo -e "Beginning conflicts cutting ...";
 stime=$(ntime)
-i=0;
-for name in ${names[@]}; do
-	xmap="$alndir/$name.xmap";
-	refmap="$alndir/${name}_r.cmap";
-	qrymap="$alndir/${name}_q.cmap";
-	ref0map="$refdir/${refpre}_$name.cmap";
-	qry0map="$qrydir/${qrypre}_${name}_adjusted.cmap";
-	conflict="$cfldir/${name}_conflicts.txt";
-	((i++));
-	check "$cutter -i $xmap -r $refmap -q $qrymap -r0 $ref0map -q0 $qry0map -c $conflict -s $i,${#names[@]} -o $outdir/$name $xmlconf >/dev/null";
-	refmaps=$(count_cmaps $outdir/${refpre}_${name}_cut.cmap);
-	qrymaps=$(count_cmaps $outdir/${qrypre}_${name}_adjusted_cut.cmap);
-	printf "%8s BNG contigs found for enzyme $name after conflicts cutting.\n" $qrymaps
-	printf "%8s NGS contigs found for enzyme $name after conflicts cutting.\n" $refmaps
+# the cut contigs are numbered by the position of the enzyme among all the known ones,
+# so that the numbering of a channel does not depend on the other channels of the run
+for ((i=1; i<=${#ordered[@]}; i++)); do
+	name=${ordered[$((i-1))]};
+	if [[ " ${tasknames[@]} " == *" $name "* ]]; then
+		run_job "cut_enzyme $name $i"
+	fi
 done
+wait_jobs || { echo 'Error 5' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Conflicts cutting complete in $(duration $stime $etime) s.\n";
+end_task $stfile
 
 allenzymes=$( IFS="_"; echo "${names[*]}" );
 eval "(cp $refdir/${refpre}_${allenzymes}.cmap $outdir/${refpre}_${allenzymes}.cmap)";
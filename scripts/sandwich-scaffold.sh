@@ -87,35 +87,49 @@ if [[ ${#names[@]} -lt 2 ]]; then
 	exit 0;
 fi
 
+associate_pair() {
+	local name1=$1
+	local name2=$2
+	local coord1="$ngsdir/${name1}_auto_cut_NGS_coord_translation.txt";
+	local coord2="$ngsdir/${name2}_auto_cut_NGS_coord_translation.txt";
+	local pairname="${name1}_${name2}";
+	local assprefix="glues_$pairname";
+	local fitprefix="edges_$pairname";
+	# the outputs are written into a hidden directory and only moved in place once complete,
+	# so that the allocator never picks up the files of an unfinished pair
+	local tmpdir="$swdir/.$pairname.tmp";
+	rm -rf $tmpdir
+	check "$associator -f $alndir/$name1.xmap -s $alndir/$name2.xmap -t1 $coord1 -t2 $coord2 -o $tmpdir/$assprefix";
+	check "$lmfitter -i $tmpdir/$assprefix.tsv -o $tmpdir/$fitprefix";
+	rm -rf $swdir/$pairname
+	mv $tmpdir $swdir/$pairname
+}
+
 echo -e "Beginning to build relationship between the BN contigs from different enzyme assemblies ...";
 stime=$(ntime)
 mkdir -p $swdir
+# the enzyme pairs are independent of each other and associated concurrently,
+# a pair associated before (e.g. when an enzyme channel is added to a run) is reused
 for ((i=0; i<${#names[@]}-1; i++)); do
-	name1=${names[$i]};
-	coord1="$ngsdir/${name1}_auto_cut_NGS_coord_translation.txt";
 	for ((j=i+1; j<${#names[@]}; j++)); do
-		name2=${names[$j]};
-		coord2="$ngsdir/${name2}_auto_cut_NGS_coord_translation.txt";
-		pairname="${name1}_${name2}";
-
-		assprefix="glues_$pairname";
-		fitprefix="edges_$pairname";
-		check "$associator -f $alndir/$name1.xmap -s $alndir/$name2.xmap -t1 $coord1 -t2 $coord2 -o $swdir/$pairname/$assprefix";
-		check "$lmfitter -i $swdir/$pairname/$assprefix.tsv -o $swdir/$pairname/$fitprefix";
+		if [ ! -d "$swdir/${names[$i]}_${names[$j]}" ]; then
+			run_job "associate_pair ${names[$i]} ${names[$j]}"
+		fi
 	done
 done
+wait_jobs || { echo 'Error 3' > $stfile; exit 1; }
 etime=$(ntime)
 echo -e "Scaffolds/Contigs relationship building complete in $(duration $stime $etime) s.\n";
 
 echo -e "Beginning to make the layout of the final assembly ...";
 stime=$(ntime)
-check "$allocator $swdir/*/edges_*.tsv $swdir/*/glues_*.tsv $swdir";
+check "$allocator $swdir/*/edges_*.tsv* $swdir/*/glues_*.tsv* $swdir";
 references="";
 for ((i=0; i<${#names[@]}; i++)); do
 	name=${names[$i]};
 	references+=" -r $alndir/$name/${name}-NGS_r.cmap";
 done
-check "$layout $references -e $swdir/edges.tsv -g $swdir/glues.tsv -o $swdir/paths";
+check "$layout $references -e $swdir/edges.tsv -g $swdir/glues.tsv -o $swdir/paths $shareparams";
 check "$multimerger $references -l $swdir/paths.tsv -o $outdir/multicolors";
 
 mkdir -p $mono
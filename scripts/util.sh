@@ -7,10 +7,18 @@ duration(){
 	echo "$elapsed";
 }
 
+PROFILER="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )/profiler.py"
+MAPSTATS="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )/perl/map_stats.pl"
+
 check() {
 	echo "Running command: ${1}"
 	stime=$(ntime)
-	eval "(${1})"
+	if [ -n "${MOMS_PROFILE}" ]; then
+		# record the resource usage of the command in the profile of the run
+		python ${PROFILER} "${1}"
+	else
+		eval "(${1})"
+	fi
 	RESULT=$?
 	if [ "${RESULT}" -ne 0 ]; then
 		etime=$(ntime)
@@ -19,18 +27,129 @@ check() {
 	fi
 }
 
+## for running independent jobs concurrently (at most $MOMS_JOBS at a time)
+declare -a JOBPIDS
+JOBFAIL=0
+
+max_jobs() {
+	local n=$(echo "${MOMS_JOBS}" | egrep '^[0-9]+$')
+	if [[ -z "$n" || $n -lt 1 ]]; then
+		n=1
+	fi
+	echo "$n"
+}
+
+run_job() {
+	local n=$(max_jobs)
+	while [ ${#JOBPIDS[@]} -ge $n ]; do
+		wait ${JOBPIDS[0]} || JOBFAIL=$?
+		JOBPIDS=("${JOBPIDS[@]:1}")
+	done
+	eval "(${1})" &
+	JOBPIDS+=($!)
+}
+
+wait_jobs() {
+	local pid
+	for pid in ${JOBPIDS[@]}; do
+		wait $pid || JOBFAIL=$?
+	done
+	JOBPIDS=()
+	local result=$JOBFAIL
+	JOBFAIL=0
+	return $result
+}
+
+## split the thread budget among the concurrent jobs
+job_threads() {
+	local n=$(max_jobs)
+	local t=$1
+	if [[ $t -gt 0 && $n -gt 1 ]]; then
+		t=$(( t / n ))
+		if [ $t -lt 1 ]; then
+			t=1
+		fi
+	fi
+	echo "$t"
+}
+
+## for running the per-enzyme units of a step as the tasks of an SGE array job:
+## task $MOMS_TASK (counted from 1) processes the enzyme at that position only, reports to
+## its own status file and leaves the cross-enzyme work to the join run of the whole step
+task_status() {
+	if [ -n "${MOMS_TASK}" ]; then
+		echo "$1/status.${MOMS_TASK}.txt"
+	else
+		echo "$1/status.txt"
+	fi
+}
+
+task_enzymes() {
+	if [ -z "${MOMS_TASK}" ]; then
+		echo "$@"
+	elif [ ${MOMS_TASK} -le $# ]; then
+		echo "${!MOMS_TASK}"
+	fi
+}
+
+end_task() {
+	if [ -n "${MOMS_TASK}" ]; then
+		echo 'Done' > $1
+		exit 0
+	fi
+}
+
 abs_path(){
 	echo "$(cd $(dirname $1); pwd)/$(basename $1)";
 }
 
+## the files, each replaced by its gzipped copy if only that one exists
+input_files() {
+	local fl
+	for fl in $@; do
+		if [[ ! -e "$fl" && -e "$fl.gz" ]]; then
+			echo "$fl.gz"
+		else
+			echo "$fl"
+		fi
+	done
+}
+
+## whether a file exists, plain or gzipped
+has_file() {
+	[[ -f "$1" || -f "$1.gz" ]]
+}
+
+## the redirection of the output of a command run by check to a log file, which is gzipped
+## on the fly when the step compresses its outputs; the status is still that of the command
+log_to() {
+	if [ -n "${MOMS_COMPRESS}" ]; then
+		echo "| ${MOMS_COMPRESS} > $1.gz; exit \${PIPESTATUS[0]}"
+	else
+		echo "> $1"
+	fi
+}
+
+## a count of the summary statistics of a CMAP/XMAP file, read from the sidecar next to the file of the
+## output folder while it is up to date (see summarizeFile of BNG::Utility), otherwise summarized in one pass
+map_stat() {
+	perl $MAPSTATS -k $2 $(input_files $1)
+}
+
 count_cmaps() {
-	local result=$(grep '^[^#]' $1 2>/dev/null| cut -f1 | uniq | wc -l)
-	echo "$result"
+	echo "$(map_stat $1 maps)"
 }
 
+## the number of query (column 2) or reference (column 3) maps in the alignments
 count_xmaps() {
-	local result=$(grep '^[^#]' $1 2>/dev/null| cut -f$2 | sort -n | uniq | wc -l)
-	echo "$result"
+	if [ "$2" == "2" ]; then
+		echo "$(map_stat $1 queries)"
+	elif [ "$2" == "3" ]; then
+		echo "$(map_stat $1 refs)"
+	else
+		local result=$(gzip -dcf $(input_files $1) 2>/dev/null | grep '^[^#]' | cut -f$2 | sort -n | uniq | wc -l)
+		echo "$result"
+	fi
 }
 
 ## for enzyme ordering
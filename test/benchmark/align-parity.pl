@@ -0,0 +1,580 @@
+#!/usr/bin/perl
+# Check that the alignment kernels of BNG::Utility give the same results as the reference implementations
+# kept at the end of this script on random label positions, and report the time spent by each of them
+
+use strict;
+use warnings;
+use FindBin;
+use lib "$FindBin::RealBin/../../scripts/perl";
+use Getopt::Long;
+use List::Util qw(min max);
+use Storable qw(freeze);
+use Time::HiRes qw(time);
+use BNG::Utility;
+
+my ($ntrials, $seed) = (200, 1);
+GetOptions(
+	'n=i' => \$ntrials,
+	's=i' => \$seed
+) or die("Usage: $0 [-n trials] [-s seed]\n");
+srand($seed);
+$Storable::canonical = 1;
+
+my %elapsed = ();
+my $nfailed = 0;
+for(my $t=0; $t<$ntrials; $t++){
+	my $ref = randomPositions(20 + int(rand(60)));
+	my $qry = perturb([@{$ref}[0..(10 + int(rand($#{$ref} - 10)))]]);
+	my $bidirectional = (undef, 1, 2, 3)[$t % 4];
+	$nfailed += check("alignDP", [$qry, $ref, $bidirectional]);
+	$nfailed += check("alignDP", [$ref, $qry, $bidirectional]);
+	$nfailed += check("alignLCS", [$qry, $ref]);
+	$nfailed += check("alignDP", [randomPositions(15 + int(rand(30))), $ref, $bidirectional]);
+	my ($frag, $gapped, $mi) = gappedPositions($ref);
+	$nfailed += check("alignGappedDP", [$frag, $gapped, $mi]);
+}
+foreach my $name (sort keys %elapsed){
+	printf("%-16s reference %8.2fs  kernel %8.2fs  speed-up %5.2fx\n", $name, $elapsed{$name}[0], $elapsed{$name}[1], $elapsed{$name}[0] / ($elapsed{$name}[1] || 1e-9));
+}
+if($nfailed > 0){
+	print "$nfailed of the alignments differ from the reference\n";
+	exit(1);
+}
+print "All alignments are identical to the reference\n";
+exit(0);
+
+sub check
+{
+	my ($name, $args) = @_;
+	my @results = ();
+	my $i = 0;
+	foreach my $impl ("${name}Reference", $name){
+		no strict 'refs';
+		my $start = time();
+		my @result = &{"BNG::Utility::$impl"}(@{$args});
+		$elapsed{$name}[$i++] += time() - $start;
+		push(@results, freeze(\@result));
+	}
+	return 0 if($results[0] eq $results[1]);
+	print STDERR "$name differs on the positions:\n";
+	print STDERR join(" ", @{$_}) . "\n" foreach(grep { ref($_) eq 'ARRAY' } @{$args});
+	return 1;
+}
+
+sub randomPositions
+{
+	my ($n) = @_;
+	my @positions = (0);
+	push(@positions, $positions[-1] + 500 + int(rand(15000))) for(1..$n);
+	return \@positions;
+}
+
+# scale the fragments and randomly drop or add labels
+sub perturb
+{
+	my ($positions) = @_;
+	my @result = (0);
+	my $pos = 0;
+	for(my $i=1; $i<=$#{$positions}; $i++){
+		my $size = int(($positions->[$i] - $positions->[$i-1]) * (0.97 + rand(0.06)));
+		push(@result, $pos + int(rand($size))) if(rand() < 0.05); # an extra label
+		$pos += $size;
+		push(@result, $pos) unless(rand() < 0.05); # or a missing one
+	}
+	return \@result;
+}
+
+# a copy of the positions with a gap replacing some labels, and a fragment spanning the gap
+sub gappedPositions
+{
+	my ($positions) = @_;
+	my $n = $#{$positions};
+	my $mi = 3 + int(rand($n / 2));
+	my $len = 2 + int(rand(5));
+	$len = $n - $mi - 2 if($mi + $len > $n - 2);
+	my @gapped = (@{$positions}[0..($mi-1)], @{$positions}[($mi+$len)..$n]);
+	my $start = max(0, $mi - 5 - int(rand(5)));
+	my $end = min($n, $mi + $len + 5 + int(rand(5)));
+	my @frag = map { $_ - $positions->[$start] } @{$positions}[$start..$end];
+	return (perturb(\@frag), \@gapped, $mi);
+}
+
+# the original implementations of the kernels, in the package of BNG::Utility to use its scoring helpers
+package BNG::Utility;
+no warnings; # run as in BNG::Utility, which does not enable them
+
+sub alignDPReference
+{
+	my ($positions1, $positions2, $bidirectional) = @_;
+
+	my $delta = 3; # number of successive label mismatches allowed
+	my $alpha = 0.05; # expected variation ratio of fragment lengths
+# initialization
+	my @scores = (); # three dimentional score including number of matched fragments, matching scores, and the number of indel
+	my ($i, $j, $k, $l);
+	my ($m, $n) = ($#{$positions1}, $#{$positions2});
+	my $maxIndel = max(ceil(min($m, $n) * $alpha), (defined $bidirectional ? 3 : 2));
+	$scores[0][0] = [0, 0, 0];
+	if(defined $bidirectional){
+		$j = 1;
+		my $iRowVal = ($bidirectional & 0x1) ? 0 : 9**9;
+		# first row
+		while($j <= $n - $m){
+			$scores[0][$j++] = [0, 0, 0];
+		}
+		while($j <= $n){
+			$scores[0][$j++] = [0, $iRowVal, 0];
+		}
+		my $iColVal= ($bidirectional & 0x2) ? 0 : 9**9;
+		# first column
+		$i = 1;
+		while($i <= $m - $n){
+			$scores[$i++][0] = [0, 0, 0];
+		}
+		while($i <= $m){
+			$scores[$i++][0] = [0, $iColVal, 0];
+		}
+	}
+	else{
+		# first row
+		$j = 1;
+		while($j <= $n - $m){
+			 $scores[0][$j++] = [0, 0, 0];
+		}
+		while($j <= $n){
+			$scores[0][$j++] = [0, 9**9, 0];
+		}
+		# first column
+		for($i=1; $i<=$m; $i++){
+			$scores[$i][0] = [0, 0, 0];
+		}
+	}
+	my @backPointer = ();
+	my ($q, $r);
+	my ($dev, $nl, $nid, $sc);
+	my $score;
+# fill the score matrix
+	for($i=1; $i<=$m; $i++){
+		for($j=1; $j<=$n; $j++){
+			$scores[$i][$j] = [0, 9**9, 0];
+			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
+			for($k=max($i-$delta-1, 0); $k<=$i-1; $k++){
+				$q = $positions1->[$i] - $positions1->[$k];
+				for($l=max($j-$delta-1, 0); $l<=$j-1; $l++){
+					$score = $scores[$k][$l];
+					$nid = ($i - $k - 1) + ($j - $l - 1);
+					next if($score->[2] + $nid > $maxIndel);
+					$r = $positions2->[$j] - $positions2->[$l];
+					$dev = abs(($q - $r) / ($q + $r));
+					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
+					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * $nid;
+					if(compareScore([$nl, $sc], $scores[$i][$j]) > 0){
+						$scores[$i][$j] = [$nl, $sc, $score->[2] + $nid];
+						$backPointer[$i][$j] = [$k, $l];
+					}
+				}
+			}
+		}
+	}
+	my $maxScore = $scores[$m][$n];
+	my $pointer = [$m, $n];
+	for($j=$n-1; $j>=0; $j--){
+		if(compareScore($maxScore, $scores[$m][$j]) < 0){
+			$maxScore = $scores[$m][$j];
+			$pointer = [$m, $j];
+		}
+	}
+	if( ($m > $n) or ($bidirectional & 0x01) ){
+		for($i=$m-1; $i>=0; $i--){
+			if(compareScore($maxScore, $scores[$i][$n]) < 0){
+				$maxScore = $scores[$i][$n];
+				$pointer = [$i, $n];
+			}
+		}
+	}
+	my @alignment = ();
+	my $score = 0;
+	if($maxScore->[0] > 0){
+		my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		my @subAlignments = ();
+		my $status = 0;
+		while(defined $prevPointer){
+			if($scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0]){
+				if($status == 0){
+					unshift(@subAlignments, [$pointer]);
+				}
+				unshift(@{$subAlignments[0]}, $prevPointer);
+				$status++;
+			}
+			else{
+				$status = 0;
+			}
+			$pointer = $prevPointer;
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		}
+# find the optimal sub-alignment first
+		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scores[$subAlignments[$a]->[-1]->[0]][$subAlignments[$a]->[-1]->[1]]->[1] - $scores[$subAlignments[$a]->[0]->[0]][$subAlignments[$a]->[0]->[1]]->[1] <=> $scores[$subAlignments[$b]->[-1]->[0]][$subAlignments[$b]->[-1]->[1]]->[1] - $scores[$subAlignments[$b]->[0]->[0]][$subAlignments[$b]->[0]->[1]]->[1] } 0..$#subAlignments;
+		@alignment = @{$subAlignments[$sorted[0]]};
+
+# then extend the optimal sub-alignment
+		my $k = $sorted[0] - 1;
+		while($k >= 0){
+			my $subAlign = $subAlignments[$k];
+			my $safeGuardPointer = $subAlign->[-1];
+			$pointer = $alignment[0];
+			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			while($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1]){
+				unshift(@alignment, $prevPointer);
+				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+			}
+			unshift(@alignment, @{$subAlign});
+			$k--;
+		}
+		$k = $sorted[0] + 1;
+		while($k <= $#subAlignments){
+			my @subAlign = @{$subAlignments[$k]};
+			my $safeGuardPointer = $alignment[-1];
+			$pointer = $subAlign[0];
+			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			while($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1]){
+				unshift(@subAlign, $prevPointer);
+				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+			}
+			push(@alignment, @subAlign);
+			$k++;
+		}
+		my $missed;
+		if(defined $bidirectional){
+			if(scalar(@alignment) < 5){ # to reduce false positive alignments
+				return ([], 0);
+			}
+			if($bidirectional == 1){
+				$missed = ($alignment[-1]->[1] == $n) ? $alignment[0]->[0] : ($alignment[0]->[0] + ($m - $alignment[-1]->[0]));
+			}
+			elsif($bidirectional == 2){
+				$missed = ($alignment[0]->[1] == 0) ? ($m - $alignment[-1]->[0]) : ($alignment[0]->[0] + ($m - $alignment[-1]->[0]));
+			}
+			else{
+				$missed = ($alignment[0]->[1] == 0) ? ($m - $alignment[-1]->[0]) :
+						  ($alignment[-1]->[1] == $n) ? $alignment[0]->[0] : ($alignment[0]->[0] + ($m - $alignment[-1]->[0]));
+			}
+			if( $missed > scalar(@alignment) * 0.333 ){
+				return ([], 0);
+			}
+		}
+		else{
+			$missed = ($m - $alignment[-1]->[0]) + $alignment[0]->[1];
+			if( $missed >= (scalar(@alignment) * 2) ){
+				return ([], 0);
+			}
+		}
+		$score =  $scores[$alignment[-1]->[0]][$alignment[-1]->[1]]->[1] - $scores[$alignment[0]->[0]][$alignment[0]->[1]]->[1];
+	}
+	return (\@alignment, $score);
+}
+
+sub alignLCSReference
+{
+	my ($positions1, $positions2) = @_;
+
+	my $delta = 3; # number of successive label mismatches allowed
+	my $alpha = 0.05; # maximum allowed deviation dominated by total length for a pair of fragments to be regarded as matching
+# initialization
+	my @scores = (); # two dimentional score including number of matched labels and matching scores
+	my ($i, $j, $k, $l);
+	my ($m, $n) = ($#{$positions1}, $#{$positions2});
+	for($j=0; $j<=$n; $j++){ # first row
+		$scores[0][$j] = [0, 0];
+	}
+	for($i=1; $i<=$m; $i++){ # first column
+		$scores[$i][0] = [0, 0];
+	}
+	my @backPointer = ();
+	my ($q, $r);
+	my ($dev, $nl, $sc);
+	my $score;
+# fill the score matrix
+	for($i=1; $i<=$m; $i++){
+		for($j=1; $j<=$n; $j++){
+			$scores[$i][$j] = [0, 9**9];
+			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
+			for($k=max($i-$delta-1, 0); $k<=$i-1; $k++){
+				$q = $positions1->[$i] - $positions1->[$k];
+				for($l=max($j-$delta-1, 0); $l<=$j-1; $l++){
+					$r = $positions2->[$j] - $positions2->[$l];
+					$dev = abs(($q - $r) / ($q + $r));
+					$score = $scores[$k][$l];
+					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
+					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * (($i - $k - 1) + ($j - $l - 1));
+					if($sc < $scores[$i][$j]->[1]){
+						$scores[$i][$j] = [$nl, $sc];
+						$backPointer[$i][$j] = [$k, $l];
+					}
+				}
+			}
+		}
+	}
+	my @alignment = ();
+	my $k = 1;
+	my $maxScore = $scores[$m][$k];
+	for($j=2; $j<=$n; $j++){
+		if(compareScore($maxScore, $scores[$m][$j]) < 0){
+			$k = $j;
+			$maxScore = $scores[$m][$k];
+		}
+	}
+	my $pointer = [$m, $k];
+	my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+	my $status = 0;
+	while(defined $prevPointer){
+		if($scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0]){
+			unshift(@alignment, $pointer) if($status == 0);
+			unshift(@alignment, $prevPointer);
+			$status++;
+		}
+		else{
+			$status = 0;
+		}
+		$pointer = $prevPointer;
+		$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+	}
+	return \@alignment;
+}
+
+sub alignGappedDPReference
+{
+	my ($positions1, $positions2, $mi) = @_;
+
+	my $delta = 3; # number of successive label mismatches allowed
+	my $alpha = 0.05; # expected variation ratio of fragment lengths
+	my $theta = 0.25; # expected variation ratio of gap size
+# initialization
+	my @scores = (); # three dimentional score including number of matched fragments, matching scores, and the number of indel
+	my ($i, $j, $k, $l);
+	my ($m, $n1, $n) = ($#{$positions1}, $mi-1, $#{$positions2});
+	my $n2 = $n - $mi;
+	my $maxIndel = ceil(min($m, $n1) * $alpha); # POSITIVELY related to SENSITIVIEY
+	$scores[0][0] = [0, 0, 0];
+	# first column
+	$i = 1;
+	while($i <= $m - $n1){
+		$scores[$i++][0] = [0, 0, 0];
+	}
+	while($i <= $m){
+		$scores[$i++][0] = [0, 9**9, 0];
+	}
+	my @rowIndex = (0);
+	my @rowScore = (0);
+	for($i=1; $i<=$m; $i++){
+		my $fragSize  = $positions1->[$i] - $positions1->[$i-1];
+		$rowIndex[$i] = $rowIndex[$i-1] + countScore($fragSize);
+		$rowScore[$i] = $rowScore[$i-1] + sizeScore($fragSize);
+	}
+	my @colIndex = (0);
+	my @colScore = (0);
+	for($j=1; $j<=$n; $j++){
+		my $fragSize  = $positions2->[$j] - $positions2->[$j-1];
+		$colIndex[$j] = $colIndex[$j-1] + countScore($fragSize);
+		$colScore[$j] = $colScore[$j-1] + sizeScore($fragSize);
+	}
+	my @backPointer = ();
+	my ($q, $r);
+	my ($dev, $nl, $nid, $sc, $rnid, $cnid);
+	my $score;
+	my $pointer;
+	my ($minI, $minJ, $default) = (1, 0, 0);
+# fill the score matrix
+	for($j=1; $j<=$n; $j++){
+		if($j == $mi){
+			$r = $positions2->[$mi] - $positions2->[$mi-1];
+			$minI = locate($positions1, $positions1->[0] + $r * (1 - $theta));
+			$minI = 1 if($minI < 1);
+			$scores[$minI-1][$j] = [0, 9**9, 0];
+			for($i=$minI; $i<=$m; $i++){
+				$scores[$i][$mi] = [0, 9**9, 0];
+				my ($pos1, $pos2) = ($positions1->[$i] - $r * (1 + $theta), $positions1->[$i] - $r * (1 - $theta));
+				my $iStart = locate($positions1, $pos1);
+				my $iEnd = locate($positions1, $pos2);
+				for($k=$iStart; $k<=$iEnd; $k++){
+					$score = $scores[$k][$n1];
+					$q = $positions1->[$i] - $positions1->[$k];
+					$dev = abs(($q - $r) / ($q + $r));
+					$nl = $score->[0];
+					$sc = $score->[1] + ($dev / $alpha) ** 2;
+					if(specialCompareScore([$nl, $sc], $scores[$i][$mi]) > 0){
+						$scores[$i][$mi] = [$nl, $sc, 0];
+						$backPointer[$i][$mi] = [$k, $n1];
+					}
+				}
+			}
+			$default = 9**9;
+			$minJ = $mi;
+			$maxIndel = ceil(min($m, $n2) * $alpha); # POSITIVELY related to SENSITIVITY
+			next;
+		}
+		else{
+			$scores[$minI-1][$j] = [0, $default, 0];
+		}
+		for($i=$minI; $i<=$m; $i++){
+			$scores[$i][$j] = [0, 9**9, 0];
+			# for each cell, search for its (delta+1)^2 ajacent cells for an optimal path
+			for($k=max($i-$delta-1, $minI-1); $k<=$i-1; $k++){
+				$q = $positions1->[$i] - $positions1->[$k];
+				for($l=max($j-$delta-1, $minJ); $l<=$j-1; $l++){
+					$score = $scores[$k][$l];
+					$rnid = (($rowIndex[$i] > $rowIndex[$k]) ? (($rowIndex[$i] - $rowIndex[$k] - 1) * max($rowScore[$i] - $rowScore[$k] - 1, 0)): 0) ;
+					$cnid = (($colIndex[$j] > $colIndex[$l]) ? (($colIndex[$j] - $colIndex[$l] - 1) * max($colScore[$j] - $colScore[$l] - 1, 0)): 0);
+					$nid = $rnid + $cnid;
+					next if($score->[2] + $nid > $maxIndel);
+					$r = $positions2->[$j] - $positions2->[$l];
+					$dev = abs(($q - $r) / ($q + $r));
+					$nl = (($dev <= $alpha) ? ($score->[0] + 1) : $score->[0]);
+					$sc = $score->[1] + ($dev / $alpha) ** 2 + $delta * $nid;
+					if(compareScore([$nl, $sc], $scores[$i][$j]) > 0){
+						$scores[$i][$j] = [$nl, $sc, $score->[2] + $nid];
+						$backPointer[$i][$j] = [$k, $l];
+					}
+				}
+			}
+		}
+	}
+	my $maxScore = $scores[$m][$n];
+	$pointer = [$m, $n];
+	for($j=$n-1; $j>=$mi; $j--){
+		if(compareScore($maxScore, $scores[$m][$j]) < 0){
+			$maxScore = $scores[$m][$j];
+			$pointer = [$m, $j];
+		}
+	}
+	if($m > $n2){
+		$minI = $n2 if($n2 > $minI);
+		for($i=$m-1; $i>=$minI; $i--){
+			if(compareScore($maxScore, $scores[$i][$n]) < 0){
+				$maxScore = $scores[$i][$n];
+				$pointer = [$i, $n];
+			}
+		}
+	}
+	my @alignment = ();
+	my $score = [0, 9**9];
+	if($maxScore->[0] > 0){
+		my $lastPointer = $pointer;
+		my $prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		my @subAlignments = ();
+		my $status = 0;
+		while(defined $prevPointer){
+			if( $scores[$pointer->[0]][$pointer->[1]]->[0] > $scores[$prevPointer->[0]][$prevPointer->[1]]->[0] or
+				$pointer->[1] == $mi and ($scores[$pointer->[0]][$pointer->[1]]->[0] == 0 or $pointer->[0] == $m) ){
+				if($status == 0){
+					unshift(@subAlignments, [$pointer]);
+				}
+				unshift(@{$subAlignments[0]}, $prevPointer);
+				$status++;
+			}
+			else{
+				$status = 0;
+			}
+			$pointer = $prevPointer;
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+		}
+		my $firstPointer = $pointer;
+# find the optimal sub-alignment first
+		my @sorted = sort{ scalar(@{$subAlignments[$b]}) <=> scalar(@{$subAlignments[$a]}) || $scores[$subAlignments[$a]->[-1]->[0]][$subAlignments[$a]->[-1]->[1]]->[1] - $scores[$subAlignments[$a]->[0]->[0]][$subAlignments[$a]->[0]->[1]]->[1] <=> $scores[$subAlignments[$b]->[-1]->[0]][$subAlignments[$b]->[-1]->[1]]->[1] - $scores[$subAlignments[$b]->[0]->[0]][$subAlignments[$b]->[0]->[1]]->[1] } 0..$#subAlignments;
+		@alignment = @{$subAlignments[$sorted[0]]};
+		my ($hits1, $hits2);
+		$hits1 = getHits1(\@alignment, $mi);
+		$hits2 = getHits2(\@alignment, $mi);
+		my %used = ($sorted[0] => 1);
+		my $k;
+		my $bSingleSide = 0;
+		if($hits1 >= $hits2){
+			if($hits2 == 0){
+				$k = $sorted[0] + 1;
+				while($k <= $#subAlignments){
+					my $subAlign = $subAlignments[$k];
+					$hits2 = getHits2($subAlign, $mi);
+					if($hits2 > 0){
+						if( ($k+1 <= $#subAlignments) and getHits2($subAlignments[$k+1], $mi) > $hits2 ){
+							$k++;
+							$subAlign = $subAlignments[$k];
+						}
+						push(@alignment, @{$subAlign});
+						$used{$k} = 1;
+						last;
+					}
+					$k++;
+				}
+				if($k > $#subAlignments){
+					$bSingleSide = 1;
+				}
+			}
+		}
+		else{ # $hits2 > $hits1
+			if($hits1 == 0){
+				$k = $sorted[0] - 1;
+				while($k >= 0){
+					my $subAlign = $subAlignments[$k];
+					$hits1 = getHits1($subAlign, $mi);
+					if($hits1 > 0){
+						if( ($k-1 >= 0) and getHits1($subAlignments[$k-1], $mi) > $hits1 ){
+							$k--;
+							$subAlign = $subAlignments[$k];
+						}
+						unshift(@alignment, @{$subAlign});
+						$used{$k} = 1;
+						last;
+					}
+					$k--;
+				}
+				if($k < 0){
+					$bSingleSide = 1;
+				}
+			}
+		}
+		if($bSingleSide){
+			return ([], [0, 9**9]); # obsolete it at present
+		}
+
+# then extend the optimal sub-alignment
+		my @kk = (sort{$a <=> $b} keys %used);
+		$k = $kk[0] - 1;
+		while($k >= 0){
+			my $subAlign = $subAlignments[$k];
+			my $safeGuardPointer = $subAlign->[-1];
+			$pointer = $alignment[0];
+			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			while(defined $prevPointer and ($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1])){
+				unshift(@alignment, $prevPointer);
+				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+			}
+			unshift(@alignment, @{$subAlign});
+			$k--;
+		}
+		$k = $kk[-1] + 1;
+		while($k <= $#subAlignments){
+			my @subAlign = @{$subAlignments[$k]};
+			my $safeGuardPointer = $alignment[-1];
+			$pointer = $subAlign[0];
+			last if($scores[$pointer->[0]][$pointer->[1]]->[1] - $scores[$safeGuardPointer->[0]][$safeGuardPointer->[1]]->[1] > 16);
+			$prevPointer = $backPointer[$pointer->[0]][$pointer->[1]];
+			while(defined $prevPointer and ($prevPointer->[0] != $safeGuardPointer->[0] or $prevPointer->[1] != $safeGuardPointer->[1])){
+				unshift(@subAlign, $prevPointer);
+				$prevPointer = $backPointer[$prevPointer->[0]][$prevPointer->[1]];
+			}
+			push(@alignment, @subAlign);
+			$k++;
+		}
+		if( $maxScore->[0] < max(0.7 * ($lastPointer->[1] - $firstPointer->[1]), 5) ){ # to reduce false positive hits
+			return ([], [0, 9**9]);
+		}
+		my $final_score = $maxScore->[1]; # $scores[$alignment[-1]->[0]][$alignment[-1]->[1]]->[1] - $scores[$alignment[0]->[0]][$alignment[0]->[1]]->[1];
+		if( $final_score > getScoreThreshold(scalar(@alignment)) ){ # to reduce false positive hits
+			return ([], [0, 9**9]);
+		}
+		$score = [scalar(@alignment), $final_score];
+	}
+	return (\@alignment, $score);
+}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+'''
+Summarize the profiles of benchmark runs and compare them against a stored baseline
+
+usage:
+	benchmark.py collect results.json label bases profile.jsonl
+	benchmark.py compare results.json baseline.json [tolerance]
+
+Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+MOMS is licensed under the Mulan PSL v1.
+You can use this software according to the terms and conditions of the Mulan PSL v1.
+You may obtain a copy of Mulan PSL v1 at:
+    http://license.coscl.org.cn/MulanPSL
+THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND, EITHER EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR
+PURPOSE.
+See the Mulan PSL v1 for more details.
+'''
+from __future__ import print_function
+
+import os
+import re
+import sys
+import json
+
+# stages faster than this are too noisy for their time to be compared
+MIN_WALL = 1.0
+
+def load(path):
+	if not os.path.isfile(path):
+		return {}
+	with open(path, 'r') as f:
+		return json.load(f)
+
+def stageName(record):
+	'''
+	A step is named after its folder, a tool after its program without the leading environment settings
+	'''
+	if record['level'] == 'step':
+		return record['step']
+	words = [w for w in record['command'].split() if not re.match(r"^\w+=", w)]
+	return os.path.basename(words[0]) if words else record['command']
+
+def collect(results, label, bases, profile):
+	'''
+	Aggregate the records of a profiled run into per-stage usage and throughput
+	'''
+	stages = {}
+	with open(profile, 'r') as f:
+		for line in f:
+			if line.strip() == "":
+				continue
+			record = json.loads(line)
+			if record['level'] not in ['step', 'tool']:
+				continue
+			name = stageName(record)
+			stage = stages.setdefault(name, {'wall': 0.0, 'user': 0.0, 'sys': 0.0, 'maxrss': 0, 'calls': 0})
+			stage['wall'] += record['wall']
+			stage['user'] += record['user']
+			stage['sys'] += record['sys']
+			stage['maxrss'] = max(stage['maxrss'], record['maxrss'])
+			stage['calls'] += 1
+	for stage in stages.values():
+		stage['throughput'] = round(bases / stage['wall'], 1) if stage['wall'] > 0 else 0
+		for k in ['wall', 'user', 'sys']:
+			stage[k] = round(stage[k], 3)
+	results[label] = {'bases': bases, 'stages': stages}
+	return results
+
+def compare(results, baseline, tolerance):
+	'''
+	Report every stage whose time or peak memory grew beyond the tolerance, and return the number of regressions
+	'''
+	nregress = 0
+	print("%-8s %-36s %10s %10s %8s %10s %10s %8s"%("Dataset", "Stage", "Wall(s)", "Base(s)", "Ratio", "RSS(m)", "Base(m)", "Ratio"))
+	for label in sorted(results.keys()):
+		if label not in baseline:
+			print("%-8s (no baseline)"%(label))
+			continue
+		stages = results[label]['stages']
+		bases = baseline[label]['stages']
+		for name in sorted(stages.keys()):
+			if name not in bases:
+				continue
+			new, old = stages[name], bases[name]
+			tratio = new['wall'] / old['wall'] if old['wall'] > 0 else 1.0
+			mratio = float(new['maxrss']) / old['maxrss'] if old['maxrss'] > 0 else 1.0
+			flags = []
+			if old['wall'] >= MIN_WALL and tratio > 1 + tolerance:
+				flags.append("time")
+			if mratio > 1 + tolerance:
+				flags.append("memory")
+			nregress += len(flags)
+			print("%-8s %-36s %10.1f %10.1f %8.2f %10.1f %10.1f %8.2f %s"%(label, name, new['wall'], old['wall'], tratio,
+					new['maxrss'] / 1024.0, old['maxrss'] / 1024.0, mratio, "REGRESSION(%s)"%(",".join(flags)) if flags else ""))
+	return nregress
+
+if __name__ == "__main__":
+	if len(sys.argv) == 6 and sys.argv[1] == 'collect':
+		results = collect(load(sys.argv[2]), sys.argv[3], int(sys.argv[4]), sys.argv[5])
+		with open(sys.argv[2], 'w') as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+	elif len(sys.argv) in [4, 5] and sys.argv[1] == 'compare':
+		tolerance = float(sys.argv[4]) if len(sys.argv) == 5 else 0.2
+		nregress = compare(load(sys.argv[2]), load(sys.argv[3]), tolerance)
+		if nregress > 0:
+			print("%d regression(s) beyond %d%% of the baseline"%(nregress, tolerance * 100))
+			sys.exit(1)
+	else:
+		sys.stderr.write(__doc__.split("\n\n")[1] + "\n")
+		sys.exit(1)
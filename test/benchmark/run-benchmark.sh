@@ -0,0 +1,70 @@
+#!/bin/bash
+# Benchmark the pipeline on the bundled E. coli dataset and on scaled-up copies of it,
+# then compare the per-stage time and memory against the stored baseline
+
+usage(){
+	echo "Usage: $0 [-n scales] [-o outdir] [-t nthreads] [-x tolerance] [-u]";
+	echo "	-n  the comma-separated scaling factors of the dataset (default: 1,4)";
+	echo "	-o  the folder of the runs (default: ./output)";
+	echo "	-t  the number of threads of each run (default: 8)";
+	echo "	-x  the relative growth of time or memory reported as a regression (default: 0.2)";
+	echo "	-u  store the results as the new baseline instead of comparing";
+	exit 1;
+}
+
+DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+moms="$DIR/../../moms.py"
+scaler="$DIR/scale-inputs.pl"
+bench="$DIR/benchmark.py"
+baseline="$DIR/baseline.json"
+dataset="$DIR/../test-TGH"
+
+scales="1,4"
+outdir="./output"
+nthreads=8
+tolerance=0.2
+update=0
+while getopts "n:o:t:x:uh" opt; do
+	case $opt in
+		n) scales=$OPTARG;;
+		o) outdir=$OPTARG;;
+		t) nthreads=$OPTARG;;
+		x) tolerance=$OPTARG;;
+		u) update=1;;
+		*) usage;;
+	esac
+done
+
+mkdir -p $outdir
+results="$outdir/results.json"
+rm -f $results
+
+for n in ${scales//,/ }; do
+	label="x$n"
+	indir="$outdir/$label/input"
+	echo "Scaling the dataset $n times ..."
+	$scaler -f $dataset/ecoli-contigs.fa -b $dataset/EXP_REFINEFINAL1_BSPQI.cmap -b $dataset/EXP_REFINEFINAL1_BSSSI.cmap -n $n -o $indir
+	if [ $? -ne 0 ]; then
+		exit 1
+	fi
+	bases=$(grep -v '^>' $indir/ecoli-contigs.fa | tr -d '\n' | wc -c)
+
+	echo "Running the pipeline on $label ..."
+	$moms -i $indir/ecoli-contigs.fa -b $indir/EXP_REFINEFINAL1_BSPQI.cmap $indir/EXP_REFINEFINAL1_BSSSI.cmap -o $outdir/$label/run -t $nthreads -f yes --profile > $outdir/$label/run.log 2>&1
+	if [ ! -f $outdir/$label/run/profile.jsonl ]; then
+		echo "No profile is recorded for $label, see $outdir/$label/run.log"
+		exit 1
+	fi
+	python $bench collect $results $label $bases $outdir/$label/run/profile.jsonl
+done
+
+if [ $update -eq 1 ]; then
+	cp $results $baseline
+	echo "The baseline is updated in $baseline"
+	exit 0
+fi
+if [ ! -f $baseline ]; then
+	echo "No baseline to compare with, run with -u to store one"
+	exit 0
+fi
+python $bench compare $results $baseline $tolerance
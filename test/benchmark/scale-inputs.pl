@@ -0,0 +1,98 @@
+#!/usr/bin/env perl
+# Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+# MOMS is licensed under the Mulan PSL v1.
+# You can use this software according to the terms and conditions of the Mulan PSL v1.
+# You may obtain a copy of Mulan PSL v1 at:
+#    http://license.coscl.org.cn/MulanPSL
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND, EITHER EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR
+# PURPOSE.
+# See the Mulan PSL v1 for more details.
+use strict;
+use warnings;
+use Getopt::Long;
+use File::Basename;
+use Cwd 'abs_path';
+
+BEGIN{
+	my $progpath = abs_path(dirname(abs_path($0)));
+	unshift(@INC, "$progpath/../../scripts/perl");
+	select(STDERR); $| = 1;
+	select(STDOUT); $| = 1;
+}
+
+use BNG::Utility;
+
+my $program = basename($0);
+my $usage = << "USAGE";
+$program: A perl script for scaling up a dataset N times by replicating its NGS contigs and BNG cmaps under new names/ids
+Copyright (C) 2018-2022 Institute of Chinese Materia Medica, China Academy of Chinese Medical Sciences
+
+Usage: $program [options]
+	-f, --fasta   The input NGS contigs in FASTA format (REQUIRED)
+	-b, --bng     The input BNG cmap file, can be given multiple times (REQUIRED)
+	-n, --times   The scaling factor (default: 2)
+	-o, --output  The output folder (REQUIRED)
+	-h, --help    Help
+
+Example:
+	$program -f ecoli-contigs.fa -b EXP_REFINEFINAL1_BSPQI.cmap -b EXP_REFINEFINAL1_BSSSI.cmap -n 4 -o x4
+USAGE
+
+use vars qw($opt_f @opt_b $opt_n $opt_o $opt_h);
+GetOptions( "f|fasta=s" => \$opt_f,
+			"b|bng=s" => \@opt_b,
+			"n|times=i" => \$opt_n,
+			"o|output=s" => \$opt_o,
+			"h|help" => \$opt_h);
+
+die($usage) if($opt_h);
+
+die("**ERROR: -f option must be specified\n") unless(defined $opt_f);
+die("**ERROR: -b option must be specified\n") unless(scalar(@opt_b));
+die("**ERROR: -o option must be specified\n") unless(defined $opt_o);
+$opt_n = 2 unless(defined $opt_n);
+die("**ERROR: the scaling factor must be positive\n") unless($opt_n > 0);
+
+my $cmd = "mkdir -p $opt_o";
+my $retCode = system($cmd);
+die("**ERROR: can not create directory $opt_o") if($retCode != 0);
+
+# the copy k of a contig is named after the original with the suffix _k
+my $outfile = "$opt_o/" . basename($opt_f);
+$outfile =~ s/\.gz$//;
+for(my $k=0; $k<$opt_n; $k++){
+	my $in = openInput($opt_f);
+	open(OUT, ($k == 0) ? ">$outfile" : ">>$outfile") or die("ERROR: Unable to write to file $outfile: $!\n");
+	while(my $line = <$in>){
+		if($k > 0 and $line =~ /^>(\S+)(.*)$/){
+			$line = ">$1_$k$2\n";
+		}
+		print OUT $line;
+	}
+	close OUT;
+	close $in;
+}
+
+# the copy k of a cmap gets its id shifted by k times a power of 10 above the largest id
+foreach my $cmap_in (@opt_b){
+	my ($cmap) = readCMap($cmap_in);
+	my @ids = keys %{$cmap->{contigs}};
+	my $maxid = 0;
+	foreach (@ids){
+		$maxid = $_ if($_ > $maxid);
+	}
+	my $shift = 10 ** length($maxid);
+	my $contigs = $cmap->{contigs};
+	my $scaled = {};
+	for(my $k=0; $k<$opt_n; $k++){
+		foreach my $id (@ids){
+			$scaled->{$id + $k * $shift} = $contigs->{$id};
+		}
+	}
+	$cmap->{contigs} = $scaled;
+	$cmap->{nContigs} = scalar(keys %$scaled);
+	writeCMapFile($cmap, "$opt_o/" . basename($cmap_in), 1);
+}
+
+exit 0;
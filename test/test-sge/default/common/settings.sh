@@ -0,0 +1,2 @@
+# settings of the local stand-in SGE, the counterpart of $SGE_ROOT/default/common/settings.sh
+export PATH=$SGE_ROOT/bin:$PATH
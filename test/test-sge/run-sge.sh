@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# run the pipeline in cluster mode against the local stand-in of SGE in this folder
+export SGE_ROOT=$(cd `dirname $0`; pwd)
+
+../../moms.py -i ../ecoli-contigs.fa -b ../EXP_REFINEFINAL1_BSPQI.cmap ../EXP_REFINEFINAL1_BSSSI.cmap -o output -t 4 --cluster 2>&1